@@ -31,6 +31,7 @@ from __future__ import with_statement
 from rabbitvcs.util.contextmenuitems import *
 import copy
 from rabbitvcs.services.checkerservice import StatusCheckerStub as StatusChecker
+from rabbitvcs.services.checkerservice import PRIORITY_BACKGROUND
 import rabbitvcs.services.service
 from rabbitvcs.util.settings import SettingsManager
 from rabbitvcs import version as EXT_VERSION
@@ -218,8 +219,15 @@ class RabbitVCS(
 
         self.status_checker.assert_version(EXT_VERSION)
 
+        # Statuses pushed by the checker are handled like any other reply
+        self.status_checker.set_status_changed_callback(self.cb_status)
+
         self.items_cache = {}
 
+        # The directory shown by each window, so that checks still pending for
+        # a directory we navigated away from can be cancelled
+        self.window_directories = {}
+
     def get_columns(self):
         """
         Return all the columns we support.
@@ -285,8 +293,12 @@ class RabbitVCS(
 
         # log.debug("update_file_info() called for %s" % path)
 
+        # There is no need to invalidate a status the checker keeps up to date
+        # by itself.
         invalidate = False
-        if path in self.VFSFile_table:
+        if path in self.VFSFile_table and not self.status_checker.is_watched(
+            os.path.dirname(path)
+        ):
             invalidate = True
 
         # Always replace the item in the table with the one we receive, because
@@ -302,6 +314,9 @@ class RabbitVCS(
         if not is_in_a_or_a_working_copy:
             return Caja.OperationResult.COMPLETE
 
+        # Ask to be told about later changes in this directory
+        self.status_checker.subscribe(os.path.dirname(path))
+
         # Do our magic...
 
         # I have added extra logic in cb_status, using a list
@@ -489,6 +504,7 @@ class RabbitVCS(
             return
         path = self.get_local_path(item)
         self.VFSFile_table[path] = item
+        self.enter_directory(window, path)
 
         # log.debug("get_background_items_full() called")
 
@@ -513,11 +529,27 @@ class RabbitVCS(
             return
         path = self.get_local_path(item)
         self.VFSFile_table[path] = item
+        self.enter_directory(window, path)
 
         # log.debug("get_background_items() called")
 
         return CajaMainContextMenu(self, path, [path]).get_menu()
 
+    def enter_directory(self, window, path):
+        """
+        Records that window now shows the directory path, and cancels the
+        status checks for the directory it showed before unless another window
+        still shows it.
+
+        """
+
+        previous = self.window_directories.get(window)
+        self.window_directories[window] = path
+
+        if previous and previous != path:
+            if previous not in list(self.window_directories.values()):
+                self.status_checker.cancel_status_checks(previous)
+
     def update_background_items(self, provider, base_dir, paths, conditions_dict):
         paths_str = "-".join(paths)
         conditions = CajaMenuConditions(conditions_dict)
@@ -563,6 +595,7 @@ class RabbitVCS(
                     invalidate=True,
                     callback=self.cb_status,
                     summary=True,
+                    priority=PRIORITY_BACKGROUND,
                 )
 
         self.execute_after_process_exit(proc, do_check)
@@ -29,6 +29,7 @@ from __future__ import with_statement
 from rabbitvcs.util.contextmenuitems import *
 import copy
 from rabbitvcs.services.checkerservice import StatusCheckerStub as StatusChecker
+from rabbitvcs.services.checkerservice import PRIORITY_BACKGROUND
 import rabbitvcs.services.service
 from rabbitvcs.util.settings import SettingsManager
 from rabbitvcs import version as EXT_VERSION
@@ -216,11 +217,18 @@ class RabbitVCS(
 
         self.status_checker.assert_version(EXT_VERSION)
 
+        # Statuses pushed by the checker are handled like any other reply
+        self.status_checker.set_status_changed_callback(self.cb_status)
+
         self.items_cache = {}
 
         # Keep track of the emblems that we changed, to prevent double update requests
         self.emblem_mod_cache = {}
 
+        # The directory shown by each window, so that checks still pending for
+        # a directory we navigated away from can be cancelled
+        self.window_directories = {}
+
     def get_columns(self):
         """
         Return all the columns we support.
@@ -286,8 +294,12 @@ class RabbitVCS(
 
         # log.debug("update_file_info() called for %s" % path)
 
+        # There is no need to invalidate a status the checker keeps up to date
+        # by itself.
         invalidate = False
-        if path in self.VFSFile_table:
+        if path in self.VFSFile_table and not self.status_checker.is_watched(
+            os.path.dirname(path)
+        ):
             invalidate = True
 
         # Always replace the item in the table with the one we receive, because
@@ -303,6 +315,9 @@ class RabbitVCS(
         if not is_in_a_or_a_working_copy:
             return Nautilus.OperationResult.COMPLETE
 
+        # Ask to be told about later changes in this directory
+        self.status_checker.subscribe(os.path.dirname(path))
+
         # Do our magic...
 
         # I have added extra logic in cb_status, using a list
@@ -478,20 +493,27 @@ class RabbitVCS(
             return
         path = self.get_local_path(item)
         self.VFSFile_table[path] = item
+        self.enter_directory(window, path)
 
         # Early exit when we are already waiting for new info on a path
         if path in self.items_cache and self.items_cache[path] == "in-progress":
             log.error("Sceduled task already pending, exit early, in progress")
             return ()
 
-        # Schedule menu conditions computation for directory contents.
+        # Schedule menu conditions computation for directory contents. This is
+        # done for the whole directory at once, with a single status check.
+        pending = False
         for file in os.listdir(path):
             subpath = os.path.join(path, file)
             if not subpath in self.items_cache:
                 self.items_cache[subpath] = "in-progress"
-                self.status_checker.generate_menu_conditions_async(
-                    provider, path, [subpath], self.update_background_items
-                )
+                pending = True
+
+        self.status_checker.subscribe(path)
+        if pending:
+            self.status_checker.generate_directory_conditions_async(
+                provider, path, self.update_directory_items
+            )
 
         conditions_dict = None
         if path in self.items_cache:
@@ -511,12 +533,39 @@ class RabbitVCS(
 
         return ()
 
+    def enter_directory(self, window, path):
+        """
+        Records that window now shows the directory path, and cancels the
+        status checks for the directory it showed before unless another window
+        still shows it.
+
+        """
+
+        previous = self.window_directories.get(window)
+        self.window_directories[window] = path
+
+        if previous and previous != path:
+            if previous not in list(self.window_directories.values()):
+                self.status_checker.cancel_status_checks(previous)
+
     def update_background_items(self, provider, base_dir, paths, conditions_dict):
         paths_str = "-".join(paths)
         conditions = NautilusMenuConditions(conditions_dict)
         self.items_cache[paths_str] = conditions_dict
         Nautilus.MenuProvider.emit_items_updated_signal(provider)
 
+    def update_directory_items(self, provider, base_dir, conditions):
+        for path, conditions_dict in list(conditions.items()):
+            self.items_cache[path] = conditions_dict
+
+        # Forget about children we did not get conditions for, so they are
+        # requested again next time
+        for path, conditions_dict in list(self.items_cache.items()):
+            if conditions_dict == "in-progress" and dirname(path) == base_dir:
+                del self.items_cache[path]
+
+        Nautilus.MenuProvider.emit_items_updated_signal(provider)
+
     #
     # Helper functions
     #
@@ -556,6 +605,7 @@ class RabbitVCS(
                     invalidate=True,
                     callback=self.cb_status,
                     summary=True,
+                    priority=PRIORITY_BACKGROUND,
                 )
 
         self.execute_after_process_exit(proc, do_check)
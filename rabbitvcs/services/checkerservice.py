@@ -49,6 +49,9 @@ import os
 import os.path
 import sys
 import json
+from collections import OrderedDict
+
+import six
 
 from gi.repository import GObject
 from gi.repository import GLib
@@ -61,8 +64,18 @@ import rabbitvcs.util.decorators
 import rabbitvcs.util._locale
 from rabbitvcs.util import helper
 from rabbitvcs.util.strings import S
+from rabbitvcs.util.settings import SettingsManager
 import rabbitvcs.services.service
 from rabbitvcs.services.statuschecker import StatusChecker
+from rabbitvcs.services.statuschecker import (
+    PRIORITY_VISIBLE,
+    PRIORITY_MENU,
+    PRIORITY_BACKGROUND,
+    in_directory,
+)
+from rabbitvcs.services.workerpool import JobCancelled
+from rabbitvcs.services import statuscodec
+from rabbitvcs.services.watcher import WorkingCopyWatcher
 
 import rabbitvcs.vcs.status
 
@@ -76,6 +89,18 @@ OBJECT_PATH = "/org/google/code/rabbitvcs/StatusChecker"
 SERVICE = "org.google.code.rabbitvcs.RabbitVCS.Checker"
 TIMEOUT = 60 * 15 * 100  # seconds
 
+# The maximum number of paths sent in a single CheckStatusBatch call
+BATCH_SIZE = 1000
+
+# The number of directories a client stays subscribed to at once
+MAX_SUBSCRIPTIONS = 32
+
+
+class CheckCancelled(dbus.DBusException):
+    """Sent to clients whose request was cancelled by CancelStatusChecks."""
+
+    _dbus_error_name = INTERFACE + ".Cancelled"
+
 
 def find_class(module, name):
     """Given a module name and a class name, return the actual type object."""
@@ -149,6 +174,24 @@ class StatusCheckerService(dbus.service.Object):
         # background
         self.status_checker = StatusChecker()
 
+        # Directories clients want StatusChanged signals for, mapped to the set
+        # of bus names interested in them
+        self.subscriptions = {}
+        self.subscribers = set()
+
+        # The last status published for each path in a subscribed directory,
+        # so that signals are only sent when a status really changes
+        self.published = {}
+
+        # Keeps the statuses we serve up to date without clients having to
+        # invalidate them
+        self.watcher = None
+        settings = SettingsManager()
+        if bool(int(settings.get("general", "watch_working_copies"))):
+            self.watcher = WorkingCopyWatcher(
+                self.working_copy_changed, self.directory_unwatched
+            )
+
     @dbus.service.method(INTERFACE)
     def ExtraInformation(self):
         return self.status_checker.extra_info()
@@ -171,26 +214,368 @@ class StatusCheckerService(dbus.service.Object):
     def CheckerType(self):
         return self.status_checker.CHECKER_NAME
 
-    @dbus.service.method(INTERFACE, in_signature="aybbb", out_signature="s")
-    def CheckStatus(self, path, recurse=False, invalidate=False, summary=False):
+    def _reply_later(self, reply_handler, error_handler, encode, statuses=None):
+        """Returns a (callback, errback) pair for a job run by the status
+        checker's workers. The DBUS reply is encoded in the worker thread but
+        always sent from the main loop.
+
+        If given, statuses(result) returns the statuses in the result, which
+        are then handed to statuses_checked.
+        """
+
+        def callback(result):
+            try:
+                reply = encode(result)
+            except Exception as ex:
+                log.exception(ex)
+                GLib.idle_add(error_handler, ex)
+                return
+            GLib.idle_add(reply_handler, reply)
+            if statuses:
+                GLib.idle_add(self.statuses_checked, statuses(result))
+
+        def errback(ex):
+            if isinstance(ex, JobCancelled):
+                ex = CheckCancelled()
+            GLib.idle_add(error_handler, ex)
+
+        return (callback, errback)
+
+    @dbus.service.method(
+        INTERFACE,
+        in_signature="aybbbi",
+        out_signature="s",
+        async_callbacks=("reply_handler", "error_handler"),
+    )
+    def CheckStatus(
+        self,
+        path,
+        recurse=False,
+        invalidate=False,
+        summary=False,
+        priority=PRIORITY_VISIBLE,
+        reply_handler=None,
+        error_handler=None,
+    ):
         """Requests a status check from the underlying status checker.
         Path is given as an array of bytes instead of a string because
         dbus does not support strings with invalid characters.
+
+        The check is run by a worker thread and the reply is sent when it is
+        done, so a slow check does not block other requests. Checks with a
+        lower priority number (see PRIORITY_*) are run first.
         """
-        status = self.status_checker.check_status(
-            S(bytearray(path)), recurse=recurse, summary=summary, invalidate=invalidate
+        (callback, errback) = self._reply_later(
+            reply_handler,
+            error_handler,
+            self.encoder.encode,
+            statuses=lambda status: [status],
+        )
+        self.status_checker.check_status_async(
+            S(bytearray(path)),
+            recurse=recurse,
+            summary=summary,
+            invalidate=invalidate,
+            callback=callback,
+            errback=errback,
+            priority=priority,
         )
 
-        return self.encoder.encode(status)
+    @dbus.service.method(
+        INTERFACE,
+        in_signature="aaybbbi",
+        out_signature="s",
+        async_callbacks=("reply_handler", "error_handler"),
+    )
+    def CheckStatusBatch(
+        self,
+        paths,
+        recurse=False,
+        invalidate=False,
+        summary=False,
+        priority=PRIORITY_VISIBLE,
+        reply_handler=None,
+        error_handler=None,
+    ):
+        """Requests status checks for many paths in a single call, eg. all the
+        items of a directory listing. The reply is a JSON encoded list of
+        statuses, in the same order as the paths.
+        """
+        (callback, errback) = self._reply_later(
+            reply_handler, error_handler, self.encoder.encode, statuses=list
+        )
+        self.status_checker.check_status_batch_async(
+            [S(bytearray(path)) for path in paths],
+            recurse=recurse,
+            summary=summary,
+            invalidate=invalidate,
+            callback=callback,
+            errback=errback,
+            priority=priority,
+        )
 
-    @dbus.service.method(INTERFACE, in_signature="aay", out_signature="s")
-    def GenerateMenuConditions(self, paths):
+    @dbus.service.method(INTERFACE, out_signature="ai")
+    def StatusEncodings(self):
+        """Returns the versions of the compact status encoding (see
+        statuscodec.py) understood by this service. Clients that can use one
+        of them should prefer the *Compact status methods to the JSON ones.
+        """
+        return statuscodec.VERSIONS
+
+    @dbus.service.method(
+        INTERFACE,
+        in_signature="aybbbii",
+        out_signature="ay",
+        async_callbacks=("reply_handler", "error_handler"),
+    )
+    def CheckStatusCompact(
+        self,
+        path,
+        recurse=False,
+        invalidate=False,
+        summary=False,
+        priority=PRIORITY_VISIBLE,
+        version=statuscodec.VERSIONS[-1],
+        reply_handler=None,
+        error_handler=None,
+    ):
+        """Like CheckStatus, but the reply is a single status encoded with the
+        given version of the compact encoding.
+        """
+        (callback, errback) = self._reply_later(
+            reply_handler,
+            error_handler,
+            lambda status: dbus.ByteArray(
+                statuscodec.encode_statuses([status], version)
+            ),
+            statuses=lambda status: [status],
+        )
+        self.status_checker.check_status_async(
+            S(bytearray(path)),
+            recurse=recurse,
+            summary=summary,
+            invalidate=invalidate,
+            callback=callback,
+            errback=errback,
+            priority=priority,
+        )
+
+    @dbus.service.method(
+        INTERFACE,
+        in_signature="aaybbbii",
+        out_signature="ay",
+        async_callbacks=("reply_handler", "error_handler"),
+    )
+    def CheckStatusBatchCompact(
+        self,
+        paths,
+        recurse=False,
+        invalidate=False,
+        summary=False,
+        priority=PRIORITY_VISIBLE,
+        version=statuscodec.VERSIONS[-1],
+        reply_handler=None,
+        error_handler=None,
+    ):
+        """Like CheckStatusBatch, but the reply is encoded with the given
+        version of the compact encoding.
+        """
+        (callback, errback) = self._reply_later(
+            reply_handler,
+            error_handler,
+            lambda statuses: dbus.ByteArray(
+                statuscodec.encode_statuses(statuses, version)
+            ),
+            statuses=list,
+        )
+        self.status_checker.check_status_batch_async(
+            [S(bytearray(path)) for path in paths],
+            recurse=recurse,
+            summary=summary,
+            invalidate=invalidate,
+            callback=callback,
+            errback=errback,
+            priority=priority,
+        )
+
+    @dbus.service.method(
+        INTERFACE,
+        in_signature="aay",
+        out_signature="s",
+        async_callbacks=("reply_handler", "error_handler"),
+    )
+    def GenerateMenuConditions(self, paths, reply_handler=None, error_handler=None):
         upaths = []
         for path in paths:
             upaths.append(S(bytearray(path)))
 
-        path_dict = self.status_checker.generate_menu_conditions(upaths)
-        return json.dumps(path_dict)
+        (callback, errback) = self._reply_later(
+            reply_handler, error_handler, json.dumps
+        )
+        self.status_checker.generate_menu_conditions_async(upaths, callback, errback)
+
+    @dbus.service.method(
+        INTERFACE,
+        in_signature="ay",
+        out_signature="s",
+        async_callbacks=("reply_handler", "error_handler"),
+    )
+    def GenerateDirectoryConditions(self, path, reply_handler=None, error_handler=None):
+        """Computes the menu conditions of every item in a directory with a
+        single status check. The reply is a JSON object mapping each item's
+        name to an integer with one bit per condition.
+        """
+        (callback, errback) = self._reply_later(
+            reply_handler, error_handler, json.dumps
+        )
+        self.status_checker.generate_directory_conditions_async(
+            S(bytearray(path)), callback, errback
+        )
+
+    @dbus.service.method(INTERFACE, in_signature="ay")
+    def CancelStatusChecks(self, path):
+        """Cancels the queued and running requests about the given directory
+        and the paths directly in it, eg. because the client no longer
+        displays it. They fail with a JobCancelled error."""
+        self.status_checker.cancel(S(bytearray(path)))
+
+    @dbus.service.method(
+        INTERFACE, in_signature="ay", out_signature="b", sender_keyword="sender"
+    )
+    def Subscribe(self, path, sender=None):
+        """Asks for StatusChanged signals about the given directory and its
+        direct children. Subscriptions are dropped when the client disconnects
+        from the bus.
+
+        Returns True if the checker watches the directory for changes by
+        itself, in which case the client does not need to invalidate statuses
+        to see them. Otherwise signals are only sent when some client's request
+        happens to recompute a changed status.
+        """
+        path = S(bytearray(path))
+
+        if sender not in self.subscribers:
+            self.subscribers.add(sender)
+
+            def name_owner_changed(owner):
+                if not owner:
+                    self._drop_subscriber(sender)
+
+            self.connection.watch_name_owner(sender, name_owner_changed)
+
+        self.subscriptions.setdefault(path, set()).add(sender)
+        return self.watcher is not None and self.watcher.watch_directory(path)
+
+    @dbus.service.method(INTERFACE, in_signature="ay", sender_keyword="sender")
+    def Unsubscribe(self, path, sender=None):
+        path = S(bytearray(path))
+        subscribers = self.subscriptions.get(path, set())
+        subscribers.discard(sender)
+        if not subscribers:
+            self._forget_directory(path)
+
+    @dbus.service.signal(INTERFACE, signature="aayay")
+    def StatusChanged(self, paths, statuses):
+        """Emitted when the status of a path in a subscribed directory changes.
+        The statuses are sent with the newest compact encoding (statuscodec.py).
+        """
+        pass
+
+    @dbus.service.signal(INTERFACE, signature="ay")
+    def Unwatched(self, path):
+        """Emitted when the checker stops watching a directory that Subscribe
+        said it watched, so that clients invalidate its statuses again."""
+        pass
+
+    def directory_unwatched(self, path):
+        """Called by the watcher when it stops watching a directory."""
+        if path in self.subscriptions:
+            self.Unwatched(bytearray(S(path).bytes()))
+
+    def _drop_subscriber(self, sender):
+        self.subscribers.discard(sender)
+        for path, subscribers in list(self.subscriptions.items()):
+            subscribers.discard(sender)
+            if not subscribers:
+                self._forget_directory(path)
+
+    def _forget_directory(self, path):
+        self.subscriptions.pop(path, None)
+        for published_path in list(self.published.keys()):
+            if published_path == path or os.path.dirname(published_path) == path:
+                del self.published[published_path]
+
+    def is_subscribed(self, path):
+        return path in self.subscriptions or os.path.dirname(path) in self.subscriptions
+
+    def statuses_checked(self, statuses):
+        """Called from the main loop with the statuses computed for a client.
+        Their directories are watched from now on."""
+        if self.watcher:
+            for directory in set(os.path.dirname(status.path) for status in statuses):
+                self.watcher.watch_directory(directory)
+
+        return self.publish_statuses(statuses)
+
+    def working_copy_changed(self, root, paths):
+        """Called by the watcher when the given paths in the working copy at
+        root have changed, or paths is None if all of it may have. The cached
+        statuses of the changed paths and their parent directories are
+        dropped, and those clients are subscribed to are checked again."""
+        self.status_checker.invalidate_async(root, paths)
+
+        if paths is None:
+            prefix = os.path.join(root, "")
+            affected = [
+                path
+                for path in self.published
+                if path == root or path.startswith(prefix)
+            ]
+        else:
+            changed = set()
+            for path in paths:
+                changed.add(path)
+                while path != root and path.startswith(root):
+                    path = os.path.dirname(path)
+                    changed.add(path)
+            affected = [path for path in changed if path in self.published]
+
+        if affected:
+            self.status_checker.check_status_batch_async(
+                affected,
+                recurse=True,
+                summary=True,
+                invalidate=False,
+                callback=lambda statuses: GLib.idle_add(
+                    self.publish_statuses, statuses
+                ),
+                priority=PRIORITY_BACKGROUND,
+            )
+
+    def publish_statuses(self, statuses):
+        """Emits StatusChanged for the given statuses that are in a subscribed
+        directory and differ from the last ones published. The first status
+        seen for a path is only remembered, since whoever asked for it got it
+        as a reply.
+        """
+        changed = []
+        for status in statuses:
+            if not self.is_subscribed(status.path):
+                continue
+
+            state = (status.content, status.metadata, status.summary)
+            if status.path in self.published and self.published[status.path] != state:
+                changed.append(status)
+            self.published[status.path] = state
+
+        if changed:
+            self.StatusChanged(
+                [dbus.ByteArray(S(status.path).bytes()) for status in changed],
+                dbus.ByteArray(statuscodec.encode_statuses(changed)),
+            )
+
+        # Only run once per idle_add
+        return False
 
     @dbus.service.method(INTERFACE)
     def CheckVersionOrDie(self, version):
@@ -231,6 +616,8 @@ class StatusCheckerService(dbus.service.Object):
         If calling this programmatically, then you can do "os.waitpid(pid, 0)"
         on the returned PID to prevent a zombie process.
         """
+        if self.watcher:
+            self.watcher.quit()
         self.status_checker.quit()
         log.debug("Quitting main loop...")
         self.mainloop.quit()
@@ -258,6 +645,41 @@ class StatusCheckerStub(object):
         self.session_bus = dbus.SessionBus()
         self.decoder = json.JSONDecoder(object_hook=decode_status)
         self.status_checker = None
+
+        # The compact status encoding version agreed with the checker, or None
+        # to use JSON
+        self.status_version = None
+
+        # Status checks requested with a callback are queued here, keyed by
+        # their (recurse, invalidate, summary) flags, and sent together as
+        # CheckStatusBatch calls once the main loop is idle.
+        self.pending_checks = {}
+        self.pending_flush = False
+
+        # Directories subscribed to StatusChanged signals, most recently used
+        # last, mapped to whether the checker watches them by itself.
+        self.subscriptions = OrderedDict()
+        self.status_changed_callback = None
+
+        # The last status state given to our callers for each path in a
+        # subscribed directory, used to drop signals we already know about.
+        self.delivered = {}
+
+        self.session_bus.add_signal_receiver(
+            self._on_status_changed,
+            signal_name="StatusChanged",
+            dbus_interface=INTERFACE,
+            path=OBJECT_PATH,
+            byte_arrays=True,
+        )
+        self.session_bus.add_signal_receiver(
+            self._on_unwatched,
+            signal_name="Unwatched",
+            dbus_interface=INTERFACE,
+            path=OBJECT_PATH,
+            byte_arrays=True,
+        )
+
         self._connect_to_checker()
 
     def _connect_to_checker(self):
@@ -266,6 +688,7 @@ class StatusCheckerStub(object):
         start()
 
         # Try to get a new checker
+        self.status_version = None
         try:
             self.status_checker = self.session_bus.get_object(SERVICE, OBJECT_PATH)
             # Sets the checker locale.
@@ -273,6 +696,44 @@ class StatusCheckerStub(object):
         except dbus.DBusException as ex:
             # There is not much we should do about this...
             log.exception(ex)
+            return
+
+        try:
+            self.status_version = statuscodec.best_version(
+                self.status_checker.StatusEncodings(dbus_interface=INTERFACE)
+            )
+        except dbus.DBusException:
+            # An older checker, which only speaks JSON
+            pass
+
+        # A new checker knows nothing about our subscriptions
+        for path in list(self.subscriptions.keys()):
+            self._subscribe(path)
+
+    def _call_status_method(self, name, *args, **kwargs):
+        """Calls one of the checker's status methods, using its compact
+        variant if we agreed on an encoding version with the checker.
+        """
+        if self.status_version:
+            method = getattr(self.status_checker, name + "Compact")
+            args += (self.status_version,)
+            kwargs["byte_arrays"] = True
+        else:
+            method = getattr(self.status_checker, name)
+
+        return method(*args, dbus_interface=INTERFACE, timeout=TIMEOUT, **kwargs)
+
+    def _decode_statuses(self, data):
+        """Decodes the reply of one of the status methods into a list of
+        statuses. JSON replies are strings, compact ones are byte arrays.
+        """
+        if isinstance(data, six.string_types):
+            statuses = self.decoder.decode(data)
+            if not isinstance(statuses, list):
+                statuses = [statuses]
+            return statuses
+
+        return statuscodec.decode_statuses(data)
 
     def assert_version(self, version):
         """
@@ -305,20 +766,27 @@ class StatusCheckerStub(object):
                     log.exception(ex)
                     self._connect_to_checker()
 
-    def check_status_now(self, path, recurse=False, invalidate=False, summary=False):
+    def check_status_now(
+        self,
+        path,
+        recurse=False,
+        invalidate=False,
+        summary=False,
+        priority=PRIORITY_VISIBLE,
+    ):
 
         status = None
 
         try:
-            json_status = self.status_checker.CheckStatus(
+            reply = self._call_status_method(
+                "CheckStatus",
                 bytearray(S(path).bytes()),
                 recurse,
                 invalidate,
                 summary,
-                dbus_interface=INTERFACE,
-                timeout=TIMEOUT,
+                priority,
             )
-            status = self.decoder.decode(json_status)
+            status = self._decode_statuses(reply)[0]
             # Test client error problems :)
             # raise dbus.DBusException("Test")
         except dbus.DBusException as ex:
@@ -332,18 +800,25 @@ class StatusCheckerStub(object):
         return status
 
     def check_status_later(
-        self, path, callback, recurse=False, invalidate=False, summary=False
+        self,
+        path,
+        callback,
+        recurse=False,
+        invalidate=False,
+        summary=False,
+        priority=PRIORITY_VISIBLE,
     ):
-        def real_reply_handler(json_status):
+        def real_reply_handler(reply):
             # Note that this a closure referring to the outer functions callback
             # parameter
-            status = self.decoder.decode(json_status)
+            status = self._decode_statuses(reply)[0]
             path1 = S(path)
             path2 = S(status.path)
             assert path1 == path2, (
                 "Status check returned the wrong path "
                 "(asked about %s, got back %s)" % (path1.display(), path2.display())
             )
+            self._remember_status(status)
             callback(status)
 
         def reply_handler(*args, **kwargs):
@@ -352,18 +827,20 @@ class StatusCheckerStub(object):
             GLib.idle_add(real_reply_handler, *args, **kwargs)
 
         def error_handler(dbus_ex):
+            if dbus_ex.get_dbus_name() == CheckCancelled._dbus_error_name:
+                return
             log.exception(dbus_ex)
             self._connect_to_checker()
             callback(rabbitvcs.vcs.status.Status.status_error(path))
 
         try:
-            self.status_checker.CheckStatus(
+            self._call_status_method(
+                "CheckStatus",
                 bytearray(S(path).bytes()),
                 recurse,
                 invalidate,
                 summary,
-                dbus_interface=INTERFACE,
-                timeout=TIMEOUT,
+                priority,
                 reply_handler=reply_handler,
                 error_handler=error_handler,
             )
@@ -373,23 +850,239 @@ class StatusCheckerStub(object):
             # Try to reconnect
             self._connect_to_checker()
 
+    def check_status_batch_later(
+        self, requests, recurse, invalidate, summary, priority=PRIORITY_VISIBLE
+    ):
+        """Checks the status of many paths with a single DBUS call.
+
+        @type   requests: list
+        @param  requests: A list of (path, callback) tuples.  Each callback is
+            called with the status of its path.
+        """
+
+        def real_reply_handler(reply):
+            statuses = self._decode_statuses(reply)
+            for (path, callback), status in zip(requests, statuses):
+                path1 = S(path)
+                path2 = S(status.path)
+                assert path1 == path2, (
+                    "Status check returned the wrong path "
+                    "(asked about %s, got back %s)" % (path1.display(), path2.display())
+                )
+                self._remember_status(status)
+                callback(status)
+
+        def reply_handler(*args, **kwargs):
+            # The callbacks should be performed as a low priority task, so we
+            # keep Nautilus as responsive as possible.
+            GLib.idle_add(real_reply_handler, *args, **kwargs)
+
+        def report_errors():
+            for path, callback in requests:
+                callback(rabbitvcs.vcs.status.Status.status_error(path))
+
+        def error_handler(dbus_ex):
+            if dbus_ex.get_dbus_name() == CheckCancelled._dbus_error_name:
+                # Nobody is interested in these paths any more
+                return
+            log.exception(dbus_ex)
+            self._connect_to_checker()
+            report_errors()
+
+        try:
+            self._call_status_method(
+                "CheckStatusBatch",
+                [bytearray(S(path).bytes()) for path, callback in requests],
+                recurse,
+                invalidate,
+                summary,
+                priority,
+                reply_handler=reply_handler,
+                error_handler=error_handler,
+            )
+        except dbus.DBusException as ex:
+            log.exception(ex)
+            report_errors()
+            # Try to reconnect
+            self._connect_to_checker()
+
+    def queue_status_check(
+        self, path, callback, recurse, invalidate, summary, priority=PRIORITY_VISIBLE
+    ):
+        """Queues a status check to be sent with any others requested during
+        this main loop iteration (eg. by Nautilus listing a directory)."""
+        key = (recurse, invalidate, summary, priority)
+        self.pending_checks.setdefault(key, []).append((path, callback))
+
+        if not self.pending_flush:
+            self.pending_flush = True
+            GLib.idle_add(self.flush_status_checks)
+
+    def flush_status_checks(self):
+        pending_checks = self.pending_checks
+        self.pending_checks = {}
+        self.pending_flush = False
+
+        for key, requests in list(pending_checks.items()):
+            (recurse, invalidate, summary, priority) = key
+            for start in range(0, len(requests), BATCH_SIZE):
+                self.check_status_batch_later(
+                    requests[start : start + BATCH_SIZE],
+                    recurse,
+                    invalidate,
+                    summary,
+                    priority,
+                )
+
+        # Only run once per idle_add
+        return False
+
     # @rabbitvcs.util.decorators.deprecated
     # Can't decide whether this should be deprecated or not... -JH
     def check_status(
-        self, path, recurse=False, invalidate=False, summary=False, callback=None
+        self,
+        path,
+        recurse=False,
+        invalidate=False,
+        summary=False,
+        callback=None,
+        priority=PRIORITY_VISIBLE,
     ):
         """Check the VCS status of the given path.
 
         This is a pass-through method to the check_status method of the DBUS
         service (which is, in turn, a wrapper around the real status checker).
+
+        Checks with a callback are coalesced: all of those made in the same main
+        loop iteration are sent together with CheckStatusBatch.
+
+        The priority is one of PRIORITY_VISIBLE (for items on screen) or
+        PRIORITY_BACKGROUND (eg. for rescans after a command).
         """
         if callback:
-            GLib.idle_add(
-                self.check_status_later, path, callback, recurse, invalidate, summary
+            self.queue_status_check(
+                path, callback, recurse, invalidate, summary, priority
             )
             return rabbitvcs.vcs.status.Status.status_calc(path)
         else:
-            return self.check_status_now(path, recurse, invalidate, summary)
+            return self.check_status_now(path, recurse, invalidate, summary, priority)
+
+    def cancel_status_checks(self, path):
+        """Cancels the pending status checks of the directory path and of the
+        paths directly in it, eg. because it is no longer displayed. Their
+        callbacks are not called."""
+        directory = path.rstrip("/") or "/"
+        for key, requests in list(self.pending_checks.items()):
+            self.pending_checks[key] = [
+                (request_path, callback)
+                for (request_path, callback) in requests
+                if not in_directory(request_path, directory)
+            ]
+
+        try:
+            self.status_checker.CancelStatusChecks(
+                bytearray(S(path).bytes()),
+                dbus_interface=INTERFACE,
+                reply_handler=lambda: None,
+                error_handler=log.exception,
+            )
+        except dbus.DBusException as ex:
+            log.exception(ex)
+
+    def set_status_changed_callback(self, callback):
+        """Sets the function called with each status pushed by the checker for
+        a subscribed directory."""
+        self.status_changed_callback = callback
+
+    def subscribe(self, path):
+        """Subscribes to status changes in the directory path. Only the most
+        recently subscribed MAX_SUBSCRIPTIONS directories are kept, so there
+        is no need to unsubscribe from directories no longer displayed."""
+        if path in self.subscriptions:
+            # Mark as recently used
+            self.subscriptions[path] = self.subscriptions.pop(path)
+            return
+
+        self.subscriptions[path] = False
+        while len(self.subscriptions) > MAX_SUBSCRIPTIONS:
+            (old_path, watched) = self.subscriptions.popitem(last=False)
+            self.unsubscribe(old_path)
+
+        self._subscribe(path)
+
+    def _subscribe(self, path):
+        def reply_handler(watched):
+            if path in self.subscriptions:
+                self.subscriptions[path] = bool(watched)
+
+        def error_handler(dbus_ex):
+            log.exception(dbus_ex)
+
+        try:
+            self.status_checker.Subscribe(
+                bytearray(S(path).bytes()),
+                dbus_interface=INTERFACE,
+                reply_handler=reply_handler,
+                error_handler=error_handler,
+            )
+        except dbus.DBusException as ex:
+            log.exception(ex)
+
+    def unsubscribe(self, path):
+        self.subscriptions.pop(path, None)
+        for delivered_path in list(self.delivered.keys()):
+            if os.path.dirname(delivered_path) == path or delivered_path == path:
+                del self.delivered[delivered_path]
+
+        try:
+            self.status_checker.Unsubscribe(
+                bytearray(S(path).bytes()),
+                dbus_interface=INTERFACE,
+                reply_handler=lambda: None,
+                error_handler=log.exception,
+            )
+        except dbus.DBusException as ex:
+            log.exception(ex)
+
+    def is_watched(self, path):
+        """Returns True if the checker pushes status changes in the directory
+        path without being asked, so statuses there need no invalidation."""
+        return self.subscriptions.get(path, False)
+
+    def _on_unwatched(self, path):
+        path = S(bytearray(path))
+        if self.subscriptions.get(path):
+            self.subscriptions[path] = False
+
+    def _is_subscribed(self, path):
+        return path in self.subscriptions or os.path.dirname(path) in self.subscriptions
+
+    def _remember_status(self, status):
+        """Records the status given to our caller for a path in a subscribed
+        directory. Returns False if it is the same as the last one."""
+        if not self._is_subscribed(status.path):
+            return True
+
+        state = (status.content, status.metadata, status.summary)
+        if self.delivered.get(status.path) == state:
+            return False
+
+        self.delivered[status.path] = state
+        return True
+
+    def _on_status_changed(self, paths, data):
+        if not self.status_changed_callback:
+            return
+
+        try:
+            statuses = statuscodec.decode_statuses(data)
+        except statuscodec.StatusDecodeError as ex:
+            log.exception(ex)
+            return
+
+        for status in statuses:
+            if self._is_subscribed(status.path) and self._remember_status(status):
+                self.status_changed_callback(status)
 
     def generate_menu_conditions(self, provider, base_dir, paths, callback):
         def real_reply_handler(obj):
@@ -404,8 +1097,9 @@ class StatusCheckerStub(object):
             GLib.idle_add(real_reply_handler, *args, **kwargs)
 
         def error_handler(dbus_ex):
-            log.exception(dbus_ex)
-            self._connect_to_checker()
+            if dbus_ex.get_dbus_name() != CheckCancelled._dbus_error_name:
+                log.exception(dbus_ex)
+                self._connect_to_checker()
             callback(provider, base_dir, paths, {})
 
         bpaths = [bytearray(S(p).bytes()) for p in paths]
@@ -429,6 +1123,49 @@ class StatusCheckerStub(object):
         )
         return {}
 
+    def generate_directory_conditions(self, provider, base_dir, callback):
+        """Gets the menu conditions of every item in base_dir. callback is
+        called with a dict mapping each item's path to its path dict."""
+        from rabbitvcs.util.contextmenu import decode_path_dict
+
+        def real_reply_handler(obj):
+            # Note that this a closure referring to the outer functions callback
+            # parameter
+            children = json.loads(obj)
+            conditions = {}
+            for name, bits in list(children.items()):
+                conditions[os.path.join(base_dir, name)] = decode_path_dict(bits)
+            callback(provider, base_dir, conditions)
+
+        def reply_handler(*args, **kwargs):
+            # The callback should be performed as a low priority task, so we
+            # keep Nautilus as responsive as possible.
+            GLib.idle_add(real_reply_handler, *args, **kwargs)
+
+        def error_handler(dbus_ex):
+            if dbus_ex.get_dbus_name() != CheckCancelled._dbus_error_name:
+                log.exception(dbus_ex)
+                self._connect_to_checker()
+            callback(provider, base_dir, {})
+
+        try:
+            self.status_checker.GenerateDirectoryConditions(
+                bytearray(S(base_dir).bytes()),
+                dbus_interface=INTERFACE,
+                timeout=TIMEOUT,
+                reply_handler=reply_handler,
+                error_handler=error_handler,
+            )
+        except dbus.DBusException as ex:
+            log.exception(ex)
+            callback(provider, base_dir, {})
+            # Try to reconnect
+            self._connect_to_checker()
+
+    def generate_directory_conditions_async(self, provider, base_dir, callback):
+        GLib.idle_add(self.generate_directory_conditions, provider, base_dir, callback)
+        return {}
+
 
 def start():
     """Starts the checker service, via the utility method in "service.py"."""
@@ -18,12 +18,30 @@
 """
 Very simple status checking class. Useful when you can't get any of the others
 to work, or you need to prototype things.
+
+Checks are run on a small pool of worker threads (see workerpool.py). Each
+worker has its own VCS instance, and all checks for a given working copy go to
+the same worker, so independent working copies are checked in parallel.
+
+Jobs are run by priority (see PRIORITY_*), and those still queued or running
+for a directory can be cancelled when it is no longer displayed.
+
+The statuses cached by the workers are also kept on disk (see statusstore.py)
+and loaded the first time a working copy is checked after a restart.
 """
 from __future__ import absolute_import
+import os.path
+import threading
+from collections import OrderedDict
+
 from rabbitvcs.util.log import Log
+from rabbitvcs.util import helper
+from rabbitvcs.util.settings import SettingsManager
 
 import rabbitvcs.vcs
 import rabbitvcs.vcs.status
+from rabbitvcs.services.workerpool import WorkerPool, JobCancelled, job_cancelled
+from rabbitvcs.services.statusstore import StatusStore
 
 from rabbitvcs import gettext
 
@@ -31,6 +49,24 @@ _ = gettext.gettext
 
 log = Log("rabbitvcs.services.statuschecker")
 
+# Seconds to wait for the workers to save their statuses when quitting
+QUIT_TIMEOUT = 5
+
+# Priorities of the checker's jobs, most urgent first. Clients tag their
+# requests with one of these so that, for example, a recursive check of a big
+# directory does not hold up the emblems of the files being looked at.
+PRIORITY_INVALIDATE = 0
+PRIORITY_VISIBLE = 1
+PRIORITY_MENU = 2
+PRIORITY_BACKGROUND = 3
+
+
+def in_directory(path, directory):
+    """Returns whether path is directory or one of its immediate children,
+    ie. one of the paths shown while directory is displayed. Paths further
+    down are not, since they may be shown by a subdirectory being entered."""
+    return path == directory or os.path.dirname(path) == directory
+
 
 class StatusChecker(object):
     """A class for performing status checks."""
@@ -43,18 +79,390 @@ class StatusChecker(object):
         """Initialises status checker. Obviously."""
         self.vcs_client = rabbitvcs.vcs.create_vcs_instance()
         self.conditions_dict_cache = {}
+        self.pool = WorkerPool(initializer=self._create_worker_client)
 
-    def check_status(self, path, recurse, summary, invalidate):
-        """Performs a status check, blocking until the check is done."""
-        path_status = self.vcs_client.status(path, summary, invalidate)
-        return path_status
+        self.store = None
+        settings = SettingsManager()
+        if bool(int(settings.get("cache", "persist_statuses"))):
+            self.store = StatusStore(helper.get_cache_folder())
 
-    def generate_menu_conditions(self, paths, invalidate=False):
+        # Working copy roots mapped to the StatusCache of the worker client
+        # that checks them, least recently checked first, and to about how
+        # many statuses of theirs it holds. All the caches together are kept
+        # under cache/max_statuses statuses.
+        self.status_caches = OrderedDict()
+        self.repository_sizes = {}
+        self.max_statuses = int(settings.get("cache", "max_statuses"))
+
+        # Working copy roots queued for eviction, mapped to their size
+        self.evicting = {}
+        self.lock = threading.Lock()
+
+    def _create_worker_client(self):
+        vcs_client = rabbitvcs.vcs.create_vcs_instance(isolated=True)
+
+        # Let long checks notice they have been cancelled: pysvn asks its
+        # cancel callback now and then, and gittyup kills the git process.
+        svn = vcs_client.svn()
+        if hasattr(svn, "set_callback_cancel"):
+            svn.set_callback_cancel(job_cancelled)
+
+        def set_callback_get_cancel(client):
+            if hasattr(client, "set_callback_get_cancel"):
+                client.set_callback_get_cancel(job_cancelled)
+
+        vcs_client.configure_clients(set_callback_get_cancel)
+        vcs_client.on_client_dropped(self._client_dropped)
+
+        return vcs_client
+
+    def _client_dropped(self, root, client):
+        """Saves the statuses of a worker's client that was dropped from its
+        pool, which is done from the worker checking root, and forgets them."""
+        cache = getattr(client, "cache", None)
+        with self.lock:
+            if self.status_caches.get(root) is cache:
+                del self.status_caches[root]
+                self.repository_sizes.pop(root, None)
+                self.evicting.pop(root, None)
+
+        if cache is not None and self.store:
+            self.store.save(cache, root)
+            self.store.forget(root)
+
+    def _repository_key(self, path):
+        """Returns the key used to serialize checks on the working copy
+        containing path."""
+        if not path:
+            return ""
+        return rabbitvcs.vcs.guess(path)["repo_path"]
+
+    def _submit(
+        self,
+        key,
+        func,
+        args=(),
+        callback=None,
+        errback=None,
+        priority=PRIORITY_VISIBLE,
+        tag=None,
+    ):
+        """Queues func(vcs_client, *args) on the worker for the working copy
+        given by key. tag is the list of paths the job is about, if it may be
+        cancelled."""
+        self.pool.submit(
+            key, self._run_job, (key, func, args), callback, errback, priority, tag
+        )
+
+    def _run(self, key, func, args=(), priority=PRIORITY_VISIBLE):
+        return self.pool.run(key, self._run_job, (key, func, args), priority)
+
+    def _run_job(self, vcs_client, key, func, args):
+        cache = None
+        if key:
+            # Each repository has its own client, which may have been
+            # replaced since the last check, so look the cache up every time.
+            # Outside of working copies there is no cache, and the key is the
+            # path itself, so only remember the caches we find.
+            cache = vcs_client.status_cache(key)
+
+        if cache is not None:
+            with self.lock:
+                self.status_caches.pop(key, None)
+                self.status_caches[key] = cache
+                self.evicting.pop(key, None)
+
+            cache.use_repository(key)
+            if self.store:
+                self.store.load(cache, key)
+
+        try:
+            return func(vcs_client, *args)
+        finally:
+            if key and job_cancelled():
+                # A check stopped half way may have cached partial results
+                vcs_client.invalidate_statuses(key)
+            if cache is not None:
+                if self.store:
+                    self.store.changed(cache, key)
+                self._evict_repositories(key, cache)
+
+    def _evict_repositories(self, key, cache):
+        """
+        Queues the eviction of the statuses of the least recently checked
+        working copies while all the caches hold more than max_statuses. The
+        caches may belong to other workers, so each working copy is evicted
+        by the worker that checks it.
+        """
+
+        with self.lock:
+            self.repository_sizes[key] = cache.repository_size(key)
+            excess = (
+                sum(self.repository_sizes.values())
+                - sum(self.evicting.values())
+                - self.max_statuses
+            )
+
+            roots = []
+            for root in self.status_caches:
+                if excess <= 0:
+                    break
+                if root == key or root in self.evicting:
+                    continue
+                self.evicting[root] = self.repository_sizes.get(root, 0)
+                excess -= self.evicting[root]
+                roots.append(root)
+
+        for root in roots:
+            self.pool.submit(
+                root, self._evict_repository, (root,), priority=PRIORITY_BACKGROUND
+            )
+
+    def _evict_repository(self, vcs_client, root):
+        with self.lock:
+            if self.evicting.pop(root, None) is None:
+                # Checked again since the eviction was queued
+                return
+            cache = self.status_caches.pop(root, None)
+            self.repository_sizes.pop(root, None)
+
+        if cache is None:
+            return
+
+        if self.store:
+            self.store.save(cache, root)
+            self.store.forget(root)
+        cache.evict_repository(root)
+
+    def _save(self, vcs_client, key):
+        cache = self.status_caches.get(key)
+        if cache is not None:
+            self.store.save(cache, key)
+
+    def _check_status(self, vcs_client, path, recurse, summary, invalidate):
+        return vcs_client.status(path, summary, invalidate)
+
+    def _check_statuses(
+        self, vcs_client, key, paths, recurse, summary, invalidate, moved
+    ):
+        """Checks paths, which were queued for the working copy given by key
+        after the directory containing them. The paths in another working
+        copy (eg. a repository nested in that directory) get a None status,
+        and their positions in paths are passed on to moved, grouped by the
+        key of their working copy."""
+        statuses = []
+        positions = {}
+        for (position, path) in enumerate(paths):
+            if job_cancelled():
+                raise JobCancelled()
+
+            guess = rabbitvcs.vcs.guess(path)
+            if guess["vcs"] != rabbitvcs.vcs.VCS_DUMMY and guess["repo_path"] != key:
+                positions.setdefault(guess["repo_path"], []).append(position)
+                statuses.append(None)
+                continue
+
+            try:
+                statuses.append(vcs_client.status(path, summary, invalidate))
+            except Exception as e:
+                log.exception(e)
+                statuses.append(rabbitvcs.vcs.status.Status.status_error(path))
+
+        if positions:
+            moved(positions)
+        return statuses
+
+    def _invalidate(self, vcs_client, root, paths):
+        vcs_client.invalidate_statuses(root, paths)
+
+    def _generate_menu_conditions(self, vcs_client, paths):
         from rabbitvcs.util.contextmenu import MainContextMenuConditions
 
-        conditions = MainContextMenuConditions(self.vcs_client, paths)
+        conditions = MainContextMenuConditions(vcs_client, paths)
         return conditions.path_dict
 
+    def _generate_directory_conditions(self, vcs_client, path):
+        from rabbitvcs.util.contextmenu import DirectoryContextMenuConditions
+
+        conditions = DirectoryContextMenuConditions(vcs_client, path)
+        return conditions.children
+
+    def check_status(
+        self, path, recurse, summary, invalidate, priority=PRIORITY_VISIBLE
+    ):
+        """Performs a status check, blocking until the check is done."""
+        return self._run(
+            self._repository_key(path),
+            self._check_status,
+            (path, recurse, summary, invalidate),
+            priority,
+        )
+
+    def check_status_async(
+        self,
+        path,
+        recurse,
+        summary,
+        invalidate,
+        callback,
+        errback=None,
+        priority=PRIORITY_VISIBLE,
+    ):
+        """Queues a status check. callback(status) or errback(exception) is
+        called from a worker thread when the check is done, or errback is
+        given a JobCancelled exception if it was cancelled."""
+        self._submit(
+            self._repository_key(path),
+            self._check_status,
+            (path, recurse, summary, invalidate),
+            callback,
+            errback,
+            priority,
+            (path,),
+        )
+
+    def check_status_batch_async(
+        self,
+        paths,
+        recurse,
+        summary,
+        invalidate,
+        callback,
+        errback=None,
+        priority=PRIORITY_VISIBLE,
+    ):
+        """Queues status checks for many paths at once. The paths are grouped
+        by working copy, each group is checked by its own worker, and
+        callback(statuses) is called once with the statuses in the same order
+        as paths. Paths that fail to be checked get an error status. If any
+        of the checks is cancelled, errback is given a JobCancelled exception
+        instead."""
+        if not paths:
+            callback([])
+            return
+
+        # Looking up the working copy of each path is left to the workers;
+        # here each directory's is looked up once, and the paths are queued
+        # for it.
+        directories = {}
+        for index, path in enumerate(paths):
+            directories.setdefault(os.path.dirname(path), []).append(index)
+
+        results = [None] * len(paths)
+        # The groups not done yet, plus one until they have all been queued
+        remaining = [1]
+        cancelled = []
+        lock = threading.Lock()
+
+        def group_done():
+            with lock:
+                remaining[0] -= 1
+                done = remaining[0] == 0
+
+            if not done:
+                return
+
+            if cancelled:
+                if errback:
+                    errback(cancelled[0])
+            else:
+                callback(results)
+
+        def submit_group(key, indexes):
+            with lock:
+                remaining[0] += 1
+
+            def group_callback(statuses):
+                for index, status in zip(indexes, statuses):
+                    if status is not None:
+                        results[index] = status
+                group_done()
+
+            def group_errback(e):
+                if isinstance(e, JobCancelled):
+                    cancelled.append(e)
+                    group_done()
+                else:
+                    group_callback(
+                        [
+                            rabbitvcs.vcs.status.Status.status_error(paths[i])
+                            for i in indexes
+                        ]
+                    )
+
+            def moved(positions):
+                # Queued before this group is done, so the batch is not
+                # finished early
+                for (path_key, group_positions) in list(positions.items()):
+                    submit_group(path_key, [indexes[p] for p in group_positions])
+
+            group_paths = [paths[i] for i in indexes]
+            self._submit(
+                key,
+                self._check_statuses,
+                (key, group_paths, recurse, summary, invalidate, moved),
+                group_callback,
+                group_errback,
+                priority,
+                group_paths,
+            )
+
+        groups = {}
+        for (directory, indexes) in list(directories.items()):
+            groups.setdefault(self._repository_key(directory), []).extend(indexes)
+
+        for (key, indexes) in list(groups.items()):
+            submit_group(key, indexes)
+        group_done()
+
+    def invalidate_async(self, root, paths=None):
+        """Queues dropping the cached statuses of the given paths in the
+        working copy at root, or of the whole working copy if paths is None.
+        This happens before any check of the working copy that has not
+        started yet."""
+        self._submit(
+            root, self._invalidate, (root, paths), priority=PRIORITY_INVALIDATE
+        )
+
+    def cancel(self, directory):
+        """Cancels the queued and running jobs about directory and the paths
+        directly in it, eg. because it is no longer displayed."""
+        directory = directory.rstrip("/") or "/"
+        self.pool.cancel(lambda paths: all(in_directory(p, directory) for p in paths))
+
+    def generate_menu_conditions(self, paths, invalidate=False):
+        return self._run(
+            self._repository_key(paths and paths[0]),
+            self._generate_menu_conditions,
+            (paths,),
+            PRIORITY_MENU,
+        )
+
+    def generate_menu_conditions_async(self, paths, callback, errback=None):
+        self._submit(
+            self._repository_key(paths and paths[0]),
+            self._generate_menu_conditions,
+            (paths,),
+            callback,
+            errback,
+            PRIORITY_MENU,
+            paths,
+        )
+
+    def generate_directory_conditions_async(self, path, callback, errback=None):
+        """Queues the computation of the menu conditions of every item in the
+        directory path. callback is given a dict mapping each item's name to
+        its encoded conditions (see encode_path_dict)."""
+        self._submit(
+            self._repository_key(path),
+            self._generate_directory_conditions,
+            (path,),
+            callback,
+            errback,
+            PRIORITY_MENU,
+            (path,),
+        )
+
     def extra_info(self):
         return None
 
@@ -65,5 +473,12 @@ class StatusChecker(object):
         return 0
 
     def quit(self):
-        # We will exit when the main process does
-        pass
+        if self.store:
+            for key in self.store.dirty_roots():
+                self.pool.submit(
+                    key, self._save, (key,), priority=PRIORITY_BACKGROUND
+                )
+
+        # The workers are daemon threads, so we will exit when the main process
+        # does even if they are busy
+        self.pool.quit(timeout=QUIT_TIMEOUT)
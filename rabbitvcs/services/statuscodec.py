@@ -0,0 +1,219 @@
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+A compact binary encoding for sending lists of statuses over DBUS.
+
+The JSON encoding used by the checker service repeats the class name, module
+name and every attribute name for each status, and every path, author and
+status name in full. This encoding instead sends:
+
+    1. A header: magic, format version, string table size, record count.
+    2. A string table: every distinct string once, NUL separated.
+    3. One fixed-width record per status, holding the status class and
+       indices into the string table, plus the revision and date.
+
+Strings are shared between the decoded statuses, so a big recursive check
+also takes less memory on the client side.
+"""
+from __future__ import absolute_import
+
+import struct
+
+import six
+from six.moves import range
+
+import rabbitvcs.vcs.status
+from rabbitvcs.util.strings import S
+
+# Versions of the encoding this module can read and write, oldest first
+VERSIONS = [1]
+
+MAGIC = b"RVST"
+
+HEADER = struct.Struct("<4sBII")
+
+# class, flags, path, content, metadata, single, summary, remote content,
+# remote metadata, author, revision, date
+RECORD = struct.Struct("<BBIIIIIIIIqq")
+
+# String table index standing in for None
+NO_STRING = 0xFFFFFFFF
+
+FLAG_REVISION_INT = 1
+FLAG_REVISION_STRING = 2
+FLAG_DATE = 4
+
+STRING_FIELDS = (
+    "path",
+    "content",
+    "metadata",
+    "single",
+    "summary",
+    "remote_content",
+    "remote_metadata",
+    "author",
+)
+
+
+class StatusDecodeError(Exception):
+    """Indicates the data is not a status list in a known encoding."""
+
+    def __init__(self, *args, **kwargs):
+        Exception.__init__(self, *args, **kwargs)
+
+
+def best_version(versions):
+    """
+    Returns the newest encoding version that both this module and the peer
+    (which supports the given versions) understand, or None.
+    """
+
+    common = set(VERSIONS) & set(versions or [])
+    if common:
+        return max(common)
+    return None
+
+
+def encode_statuses(statuses, version=VERSIONS[-1]):
+    """
+    Encodes a list of status objects to bytes.
+    """
+
+    if version not in VERSIONS:
+        raise ValueError("Unsupported status encoding version: %s" % version)
+
+    strings = []
+    string_index = {}
+
+    def intern(value):
+        if value is None:
+            return NO_STRING
+        value = six.text_type(value)
+        try:
+            return string_index[value]
+        except KeyError:
+            string_index[value] = len(strings)
+            strings.append(value)
+            return string_index[value]
+
+    type_index = {}
+    for index, cls in enumerate(rabbitvcs.vcs.status.STATUS_TYPES):
+        type_index[cls] = index
+
+    records = []
+    for status in statuses:
+        flags = 0
+
+        revision = status.revision
+        if revision is None:
+            revision = 0
+        elif isinstance(revision, six.integer_types):
+            flags |= FLAG_REVISION_INT
+        else:
+            flags |= FLAG_REVISION_STRING
+            revision = intern(revision)
+
+        date = status.date
+        if date is None:
+            date = 0
+        else:
+            flags |= FLAG_DATE
+            date = int(date)
+
+        records.append(
+            RECORD.pack(
+                type_index.get(type(status), 0),
+                flags,
+                *([intern(getattr(status, field)) for field in STRING_FIELDS]
+                + [revision, date])
+            )
+        )
+
+    string_table = S(six.u("\0").join(strings)).bytes()
+
+    return b"".join(
+        [HEADER.pack(MAGIC, version, len(string_table), len(records)), string_table]
+        + records
+    )
+
+
+def decode_statuses(data):
+    """
+    Decodes bytes made by encode_statuses back into a list of status objects.
+    """
+
+    data = bytes(data)
+    if len(data) < HEADER.size:
+        raise StatusDecodeError("Status data is too short")
+
+    (magic, version, strings_size, count) = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version not in VERSIONS:
+        raise StatusDecodeError("Unknown status encoding")
+
+    # An empty table still holds one string when records refer to it: the
+    # empty string, which encodes to nothing.
+    offset = HEADER.size
+    strings = [
+        str(s) for s in S(data[offset : offset + strings_size]).split(six.u("\0"))
+    ]
+    offset += strings_size
+
+    if len(data) != offset + count * RECORD.size:
+        raise StatusDecodeError("Status data has the wrong size")
+
+    def lookup(index):
+        if index == NO_STRING:
+            return None
+        try:
+            return strings[index]
+        except IndexError:
+            raise StatusDecodeError("Status data has a bad string index")
+
+    types = rabbitvcs.vcs.status.STATUS_TYPES
+    statuses = []
+    for offset in range(offset, len(data), RECORD.size):
+        record = RECORD.unpack_from(data, offset)
+        (type_index, flags) = record[0:2]
+        (revision, date) = record[10:12]
+
+        state = {}
+        for field, index in zip(STRING_FIELDS, record[2:10]):
+            state[field] = lookup(index)
+
+        if flags & FLAG_REVISION_STRING:
+            revision = lookup(revision)
+        elif not flags & FLAG_REVISION_INT:
+            revision = None
+        state["revision"] = revision
+
+        if not flags & FLAG_DATE:
+            date = None
+        state["date"] = date
+
+        cls = types[type_index]
+        status = cls.__new__(cls)
+        for field, value in list(state.items()):
+            setattr(status, field, value)
+        statuses.append(status)
+
+    return statuses
@@ -0,0 +1,240 @@
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Keeps the cached statuses of each working copy on disk, so that a restarted
+checker does not have to check big working copies from scratch.
+
+There is one file per working copy in the user's cache folder, holding:
+
+    1. A header: magic, format version, size of the metadata.
+    2. The metadata, as JSON: the working copy root, the modification time
+       and size of its ADMIN_FILES (eg. .git/index) and the time the file was
+       saved.
+    3. The statuses, in the compact encoding of statuscodec.py.
+
+A file is only used if the working copy's ADMIN_FILES are unchanged since it
+was saved. Working files may still have been changed while the checker was
+not running, so the status of a path that changed since then (or is gone) is
+not loaded, nor are those of the directories above it, whose summaries
+depend on it.
+"""
+from __future__ import absolute_import
+
+import os
+import os.path
+import json
+import struct
+import hashlib
+import tempfile
+import threading
+import time
+
+from rabbitvcs.vcs import ADMIN_FILES
+from rabbitvcs.util.strings import S
+from rabbitvcs.services import statuscodec
+from rabbitvcs.util.log import Log
+
+log = Log("rabbitvcs.services.statusstore")
+
+MAGIC = b"RVSC"
+
+VERSION = 2
+
+HEADER = struct.Struct("<4sBI")
+
+# Seconds between saves of a working copy whose statuses keep changing
+SAVE_INTERVAL = 60
+
+
+class StatusStore(object):
+    """
+    Loads and saves the cached statuses of working copies.
+
+    Every method taking a working copy root must only be called from the
+    worker that checks that working copy (see workerpool.py), so that a file
+    is never read and written at the same time.
+    """
+
+    def __init__(self, folder):
+        """
+        @type   folder: string
+        @param  folder: The folder to keep the status files in.
+
+        """
+
+        self.folder = folder
+
+        # Working copy roots we have tried to load statuses for
+        self.loaded = set()
+
+        # Working copy roots whose statuses changed since they were saved
+        self.dirty = set()
+
+        # Working copy roots mapped to the time they were last saved
+        self.saved = {}
+        self.lock = threading.Lock()
+
+    def filename(self, root):
+        name = hashlib.sha1(S(root).bytes()).hexdigest()
+        return os.path.join(self.folder, name + ".status")
+
+    def stamp(self, root):
+        """
+        Returns the modification time and size of the working copy's
+        ADMIN_FILES, or None if it has none.
+        """
+
+        for name, files in list(ADMIN_FILES.items()):
+            admin_folder = os.path.join(root, name)
+            if not os.path.isdir(admin_folder):
+                continue
+
+            stamp = []
+            for filename in files:
+                try:
+                    st = os.stat(os.path.join(admin_folder, filename))
+                except OSError:
+                    continue
+                stamp.append([filename, st.st_mtime, st.st_size])
+            return stamp or None
+
+        return None
+
+    def load(self, cache, root):
+        """
+        Adds the saved statuses of the working copy at root to cache, the
+        first time it is called for that working copy.
+        """
+
+        if root in self.loaded:
+            return
+        self.loaded.add(root)
+
+        try:
+            with open(self.filename(root), "rb") as f:
+                data = f.read()
+        except IOError:
+            return
+
+        try:
+            (magic, version, meta_size) = HEADER.unpack_from(data, 0)
+            if magic != MAGIC or version != VERSION:
+                return
+
+            meta = json.loads(
+                data[HEADER.size : HEADER.size + meta_size].decode("utf-8")
+            )
+            if meta["root"] != S(root).display() or meta["stamp"] != self.stamp(root):
+                return
+            saved = meta["saved"]
+
+            statuses = statuscodec.decode_statuses(data[HEADER.size + meta_size :])
+        except (struct.error, ValueError, KeyError, statuscodec.StatusDecodeError) as e:
+            log.debug("Ignoring the saved statuses of %s: %s" % (root, e))
+            return
+
+        stale = self.changed_since(root, [status.path for status in statuses], saved)
+        for status in statuses:
+            if status.path not in cache and status.path not in stale:
+                cache[status.path] = status
+
+        log.debug(
+            "Loaded %i saved statuses for %s, %i were stale"
+            % (len(statuses) - len(stale), root, len(stale))
+        )
+
+    def changed_since(self, root, paths, saved):
+        """
+        Returns the set of paths that were changed or removed since the time
+        saved, together with their parent directories up to root.
+        """
+
+        stale = set()
+        for path in paths:
+            try:
+                # A second of slack for file systems with coarse timestamps
+                if os.lstat(path).st_mtime < saved - 1:
+                    continue
+            except OSError:
+                pass
+
+            while path not in stale:
+                stale.add(path)
+                if path == root or not path.startswith(root):
+                    break
+                path = os.path.dirname(path)
+
+        return stale
+
+    def changed(self, cache, root):
+        """
+        Notes that the cached statuses of the working copy at root may have
+        changed, saving them if they were not saved for a while.
+        """
+
+        with self.lock:
+            self.dirty.add(root)
+
+        if time.time() - self.saved.get(root, 0) > SAVE_INTERVAL:
+            self.save(cache, root)
+
+    def forget(self, root):
+        """Lets the statuses of the working copy at root be loaded again, eg.
+        after they were evicted from the cache."""
+        self.loaded.discard(root)
+
+    def dirty_roots(self):
+        with self.lock:
+            return list(self.dirty)
+
+    def save(self, cache, root):
+        with self.lock:
+            if root not in self.dirty:
+                return
+            self.dirty.discard(root)
+            self.saved[root] = time.time()
+
+        stamp = self.stamp(root)
+        if not stamp:
+            # We would never know whether the statuses are still valid
+            return
+
+        statuses = [status for status in cache.find_path_statuses(root) if status]
+        if not statuses:
+            # eg. evicted from the cache, the file we have is as good as it gets
+            return
+
+        meta = json.dumps(
+            {"root": S(root).display(), "stamp": stamp, "saved": time.time()}
+        )
+        meta = meta.encode("utf-8")
+
+        try:
+            (fd, temp_path) = tempfile.mkstemp(dir=self.folder)
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, len(meta)))
+                f.write(meta)
+                f.write(statuscodec.encode_statuses(statuses))
+            os.rename(temp_path, self.filename(root))
+        except (IOError, OSError) as e:
+            log.exception(e)
@@ -0,0 +1,216 @@
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Watches the working copies served by the checker for changes, using GIO file
+monitors (inotify on Linux).
+
+Only the directories that statuses were asked about are watched, along with
+the administrative directory (eg. .git) of their working copy. A change to
+one of the files a VCS rewrites whenever its state changes (ADMIN_FILES, eg.
+.git/index) means any status in the working copy may be stale.
+
+Events are collected for WATCH_DELAY milliseconds and then reported as
+callback(root, paths), where root is the working copy root and paths is the
+set of changed paths, or None if the whole working copy may have changed.
+
+Beyond MAX_WATCHED_DIRECTORIES, directories stop being watched and are
+reported as unwatched_callback(directory), since changes in them are no
+longer seen.
+"""
+from __future__ import absolute_import
+
+import os.path
+from collections import OrderedDict
+
+from gi.repository import Gio
+from gi.repository import GLib
+
+import rabbitvcs.vcs
+import rabbitvcs.vcs.roots
+from rabbitvcs.vcs import ADMIN_FILES
+from rabbitvcs.util.log import Log
+
+log = Log("rabbitvcs.services.watcher")
+
+# Milliseconds to wait for more events before reporting changes
+WATCH_DELAY = 250
+
+# Working directories watched at once. The least recently used ones are
+# dropped beyond that, since each one takes an inotify watch.
+MAX_WATCHED_DIRECTORIES = 512
+
+
+class WorkingCopyWatcher(object):
+    """
+    Monitors directories of working copies and reports changes in them.
+    Must be used from the main loop.
+    """
+
+    def __init__(self, callback, unwatched_callback=None):
+        """
+        @type   callback: callable
+        @param  callback: Called as callback(root, paths) with the changes in
+            the working copy at root.
+
+        @type   unwatched_callback: callable
+        @param  unwatched_callback: Called as unwatched_callback(directory)
+            when a directory stops being watched to make room for others.
+
+        """
+
+        self.callback = callback
+        self.unwatched_callback = unwatched_callback
+
+        # Watched working directories, least recently used first, mapped to
+        # their monitors
+        self.monitors = OrderedDict()
+
+        # Working copy roots mapped to the monitor of their administrative
+        # directory, or None if it cannot be watched
+        self.admin_monitors = {}
+
+        # Working copy roots mapped to the paths changed since the last report
+        self.pending = {}
+        self.flush_id = None
+
+    def watch_directory(self, directory):
+        """
+        Starts watching a directory of a working copy.
+
+        @rtype:     boolean
+        @return:    Whether the directory is watched.
+
+        """
+
+        if directory in self.monitors:
+            self.monitors[directory] = self.monitors.pop(directory)
+            return True
+
+        guess = rabbitvcs.vcs.guess(directory)
+        if guess["vcs"] == rabbitvcs.vcs.VCS_DUMMY or not os.path.isdir(directory):
+            return False
+
+        root = guess["repo_path"]
+        if root not in self.admin_monitors:
+            self.admin_monitors[root] = self._watch_admin_directory(root)
+
+        monitor = self._monitor(directory, self._on_directory_changed, root)
+        if not monitor:
+            return False
+
+        self.monitors[directory] = monitor
+        while len(self.monitors) > MAX_WATCHED_DIRECTORIES:
+            (old_directory, old_monitor) = self.monitors.popitem(last=False)
+            old_monitor.cancel()
+            if self.unwatched_callback:
+                try:
+                    self.unwatched_callback(old_directory)
+                except Exception as e:
+                    log.exception(e)
+
+        return True
+
+    def _watch_admin_directory(self, root):
+        for name, files in list(ADMIN_FILES.items()):
+            admin_directory = os.path.join(root, name)
+            if os.path.isdir(admin_directory):
+                return self._monitor(
+                    admin_directory, self._on_admin_changed, root, files
+                )
+
+        # eg. a git worktree or submodule, where .git is a file
+        return None
+
+    def _monitor(self, directory, handler, *args):
+        try:
+            monitor = Gio.File.new_for_path(directory).monitor_directory(
+                Gio.FileMonitorFlags.WATCH_MOVES, None
+            )
+        except GLib.Error as e:
+            log.exception(e)
+            return None
+
+        monitor.connect("changed", handler, *args)
+        return monitor
+
+    def _on_directory_changed(self, monitor, file, other_file, event_type, root):
+        for changed in (file, other_file):
+            if changed is None:
+                continue
+
+            path = changed.get_path()
+            if not path:
+                continue
+
+            if os.path.basename(path) in ADMIN_FILES:
+                # A working copy may have been created or removed here
+                rabbitvcs.vcs.roots.invalidate(os.path.dirname(path))
+            else:
+                self._queue(root, path)
+
+    def _on_admin_changed(self, monitor, file, other_file, event_type, root, files):
+        # Files like .git/index are replaced by renaming a lock file over them,
+        # so the name we want may be either one of the event's files
+        for changed in (file, other_file):
+            if changed is not None and changed.get_basename() in files:
+                self._queue(root, None)
+
+    def _queue(self, root, path):
+        paths = self.pending.get(root, set())
+        if paths is not None:
+            if path is None:
+                paths = None
+            else:
+                paths.add(path)
+        self.pending[root] = paths
+
+        if self.flush_id is None:
+            self.flush_id = GLib.timeout_add(WATCH_DELAY, self._flush)
+
+    def _flush(self):
+        pending = self.pending
+        self.pending = {}
+        self.flush_id = None
+
+        for root, paths in list(pending.items()):
+            try:
+                self.callback(root, paths)
+            except Exception as e:
+                log.exception(e)
+
+        # Only run once per timeout_add
+        return False
+
+    def quit(self):
+        if self.flush_id is not None:
+            GLib.source_remove(self.flush_id)
+            self.flush_id = None
+
+        for monitor in list(self.monitors.values()) + list(
+            self.admin_monitors.values()
+        ):
+            if monitor:
+                monitor.cancel()
+
+        self.monitors.clear()
+        self.admin_monitors.clear()
@@ -0,0 +1,260 @@
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+A small, bounded pool of worker threads for the checker service.
+
+Jobs are submitted with a key (normally the working copy root). All jobs with
+the same key are run by the same worker, one after the other, so a working
+copy is never checked by two threads at once. Jobs with different keys are
+spread over the workers and run in parallel.
+
+Every worker owns a context object created by the pool's initializer inside
+the worker thread (eg. a private VCS instance), which is passed as the first
+argument to every job it runs.
+
+Each worker runs its most urgent job first (lowest priority number), and jobs
+of the same priority in the order they were submitted. Jobs may be given a
+tag, which is used to find the jobs to cancel. A job cancelled before it
+starts is never run; a running job can check job_cancelled() to stop early.
+"""
+from __future__ import absolute_import
+
+import itertools
+import sys
+import threading
+import multiprocessing
+import time
+
+from six.moves import queue
+from six.moves import range
+
+from rabbitvcs.util.log import Log
+
+log = Log("rabbitvcs.services.workerpool")
+
+# Status checks mostly wait on pysvn or git subprocesses, so a few workers are
+# enough to keep independent working copies from blocking each other.
+MAX_WORKERS = 4
+
+
+class JobCancelled(Exception):
+    """Passed to the errback of a job that was cancelled."""
+
+    def __init__(self, *args, **kwargs):
+        Exception.__init__(self, *args, **kwargs)
+
+
+def job_cancelled():
+    """
+    Returns True if called from a job that has been cancelled while running.
+    """
+
+    worker = threading.current_thread()
+    job = getattr(worker, "current", None)
+    return job is not None and job.cancelled
+
+
+class Job(object):
+    def __init__(self, func, args, callback, errback, priority, tag):
+        self.func = func
+        self.args = args
+        self.callback = callback
+        self.errback = errback
+        self.priority = priority
+        self.tag = tag
+        self.cancelled = False
+
+
+def default_worker_count():
+    try:
+        return max(1, min(MAX_WORKERS, multiprocessing.cpu_count()))
+    except NotImplementedError:
+        return 1
+
+
+class Worker(threading.Thread):
+    """
+    A single worker thread, running the jobs in its queue by priority.
+    """
+
+    def __init__(self, index, initializer=None):
+        threading.Thread.__init__(self, name="rabbitvcs-worker-%i" % index)
+        self.daemon = True
+        self.initializer = initializer
+        self.context = None
+        self.queue = queue.PriorityQueue()
+        self.counter = itertools.count()
+
+        # The jobs queued or running, for cancelling them
+        self.jobs = set()
+        self.current = None
+        self.lock = threading.Lock()
+
+    def put(self, job):
+        with self.lock:
+            self.jobs.add(job)
+        self.queue.put((job.priority, next(self.counter), job))
+
+    def stop(self):
+        # Stop once every job queued so far has been run
+        self.queue.put((sys.maxsize, next(self.counter), None))
+
+    def cancel(self, predicate):
+        """Cancels the queued and running jobs whose tag matches predicate."""
+        with self.lock:
+            for job in self.jobs:
+                if job.tag is not None and predicate(job.tag):
+                    job.cancelled = True
+
+    def run(self):
+        if self.initializer:
+            self.context = self.initializer()
+
+        while True:
+            (priority, count, job) = self.queue.get()
+            if job is None:
+                break
+
+            with self.lock:
+                if job.cancelled:
+                    self.jobs.discard(job)
+                else:
+                    self.current = job
+
+            if job.cancelled:
+                if job.errback:
+                    job.errback(JobCancelled())
+                continue
+
+            try:
+                result = job.func(self.context, *job.args)
+                if job.cancelled:
+                    raise JobCancelled()
+            except JobCancelled as e:
+                if job.errback:
+                    job.errback(e)
+                continue
+            except Exception as e:
+                log.exception(e)
+                if job.errback:
+                    job.errback(e)
+                continue
+            finally:
+                with self.lock:
+                    self.jobs.discard(job)
+                    self.current = None
+
+            if job.callback:
+                job.callback(result)
+
+
+class WorkerPool(object):
+    """
+    Dispatches jobs onto a fixed number of worker threads, serializing the jobs
+    that share a key.
+
+    Usage:
+        pool = WorkerPool(initializer=create_context)
+        pool.submit(repo_path, do_check, (path,), callback, errback)
+
+    """
+
+    def __init__(self, initializer=None, size=None):
+        """
+        @type   initializer: callable
+        @param  initializer: Called once in each worker thread, its return
+            value is passed as the first argument to every job of that worker.
+
+        @type   size: int
+        @param  size: The number of worker threads.  Defaults to the number of
+            processors, up to MAX_WORKERS.
+
+        """
+
+        if not size:
+            size = default_worker_count()
+
+        self.workers = [Worker(i, initializer) for i in range(size)]
+        for worker in self.workers:
+            worker.start()
+
+    def worker_for(self, key):
+        return self.workers[hash(key) % len(self.workers)]
+
+    def submit(
+        self, key, func, args=(), callback=None, errback=None, priority=0, tag=None
+    ):
+        """
+        Queue a job.  func(context, *args) is run in the worker assigned to
+        key, then callback(result) or errback(exception) is called from that
+        same worker thread.  If the job is cancelled, errback is given a
+        JobCancelled exception.
+        """
+
+        self.worker_for(key).put(Job(func, args, callback, errback, priority, tag))
+
+    def cancel(self, predicate):
+        """
+        Cancel the jobs, queued or running, whose tag matches predicate.
+        Jobs without a tag are never cancelled.
+        """
+
+        for worker in self.workers:
+            worker.cancel(predicate)
+
+    def run(self, key, func, args=(), priority=0, tag=None):
+        """
+        Queue a job and block until it has been run, returning its result.
+        """
+
+        done = threading.Event()
+        outcome = {}
+
+        def callback(result):
+            outcome["result"] = result
+            done.set()
+
+        def errback(e):
+            outcome["error"] = e
+            done.set()
+
+        self.submit(key, func, args, callback, errback, priority, tag)
+        done.wait()
+
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
+    def quit(self, timeout=None):
+        """
+        Stops the workers once they have run the jobs already queued, waiting
+        up to timeout seconds for that if given.
+        """
+
+        for worker in self.workers:
+            worker.stop()
+
+        if timeout:
+            deadline = time.time() + timeout
+            for worker in self.workers:
+                worker.join(max(0, deadline - time.time()))
@@ -0,0 +1,82 @@
+from __future__ import absolute_import
+
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Unit tests for rabbitvcs.vcs.clientpool.
+"""
+
+import unittest
+
+from rabbitvcs.vcs.clientpool import ClientPool
+
+
+class TestClientPool(unittest.TestCase):
+    class Client(object):
+        def __init__(self, root):
+            self.root = root
+            self.closed = 0
+
+        def close(self):
+            self.closed += 1
+
+    def setUp(self):
+        self.dropped = []
+        self.pool = ClientPool(
+            self.Client,
+            max_clients=2,
+            idle_timeout=60,
+            on_drop=lambda root, client: self.dropped.append((root, client.closed)),
+        )
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_get(self):
+        a = self.pool.get("/a")
+        self.assertEqual(a.root, "/a")
+        self.assertTrue(self.pool.get("/a") is a)
+        self.assertFalse(self.pool.get("/b") is a)
+
+    def test_evict(self):
+        a = self.pool.get("/a")
+        b = self.pool.get("/b")
+        self.pool.get("/a")
+        self.pool.get("/c")
+        self.assertEqual(b.closed, 1)
+        self.assertEqual(a.closed, 0)
+        self.assertEqual(self.dropped, [("/b", 0)])
+        self.assertEqual(sorted(c.root for c in self.pool.clients()), ["/a", "/c"])
+
+    def test_idle(self):
+        a = self.pool.get("/a")
+        self.pool.entries["/a"][1] -= 60
+        self.pool._reap()
+        self.assertEqual(a.closed, 1)
+        self.assertTrue(self.pool.get("/a") is a)
+        self.pool._reap()
+        self.assertEqual(a.closed, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
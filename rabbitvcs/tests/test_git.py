@@ -0,0 +1,74 @@
+from __future__ import absolute_import
+
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Unit tests for rabbitvcs.vcs.git.
+"""
+
+import unittest
+from datetime import datetime
+
+from rabbitvcs.util.strings import S
+from rabbitvcs.vcs.git import benchmark_decode_log, decode_log
+
+
+class TestDecodeLog(unittest.TestCase):
+    def test_decode(self):
+        items = [
+            {
+                "commit": "b" * 40,
+                "parents": ["a" * 40],
+                "author": "Some One <one@example.com>",
+                "committer": "Some One <one@example.com>",
+                "author_date": "1500000000",
+                "commit_date": "1500000060",
+                "message": "Second",
+            },
+            {
+                "commit": "a" * 40,
+                "parents": [],
+                "author": "Some One <one@example.com>",
+                "commit_date": "1500000000",
+            },
+        ]
+
+        entries = decode_log(items, "b" * 40)
+        self.assertEqual(S(entries[0].revision), "b" * 40)
+        self.assertEqual(entries[0].parents, ["a" * 40])
+        self.assertEqual(entries[0].author, "Some One")
+        self.assertTrue(entries[0].author is entries[1].author)
+        self.assertEqual(entries[0].date, datetime.fromtimestamp(1500000060))
+        self.assertEqual((entries[0].head, entries[1].head), (True, False))
+        self.assertEqual(entries[1].message, "")
+        self.assertEqual(entries[1].changed_paths, None)
+
+    def test_benchmark(self):
+        (seconds, entries) = benchmark_decode_log(1000)
+        self.assertEqual(len(entries), 1000)
+        self.assertEqual([entry.head for entry in entries[:2]], [True, False])
+        self.assertEqual(len(set(id(entry.author) for entry in entries)), 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+from __future__ import absolute_import
+
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Unit tests for rabbitvcs.ui.log.
+"""
+
+import random
+import unittest
+
+try:
+    from rabbitvcs.ui.log import REVISION_LINE_COLOR, RevisionGrapher, revision_grapher
+except ImportError:
+    # The log window needs GTK
+    RevisionGrapher = None
+
+
+@unittest.skipIf(RevisionGrapher is None, "The log window cannot be imported")
+class TestRevisionGrapher(unittest.TestCase):
+    class Item(object):
+        def __init__(self, revision, parents):
+            self.revision = revision
+            self.parents = parents
+
+    def history(self, count, seed=1):
+        """Returns count revisions with branches and merges, newest first."""
+        rng = random.Random(seed)
+        items = []
+        heads = []
+        for i in range(count):
+            revision = "r%i" % i
+            if not heads:
+                parents = []
+            elif len(heads) > 1 and rng.random() < 0.2:
+                parents = rng.sample(heads, 2)
+            else:
+                parents = [rng.choice(heads)]
+
+            for parent in parents:
+                heads.remove(parent)
+            if rng.random() < 0.2 and items:
+                # A branch off an older revision
+                heads.append(rng.choice(items).revision)
+            heads.append(revision)
+            items.append(self.Item(revision, parents))
+
+        items.reverse()
+        return items
+
+    def test_linear(self):
+        items = [self.Item("c", ["b"]), self.Item("b", ["a"]), self.Item("a", [])]
+        rows = revision_grapher(items)
+        self.assertEqual([row[1][0] for row in rows], [0, 0, 0])
+        self.assertEqual(rows[1][2], [(0, 0, REVISION_LINE_COLOR)])
+
+    def test_merge(self):
+        items = [
+            self.Item("m", ["b", "c"]),
+            self.Item("c", ["a"]),
+            self.Item("b", ["a"]),
+            self.Item("a", []),
+        ]
+        grapher = RevisionGrapher()
+        rows = grapher.extend(items)
+        # a stays in the lane c left waiting for it, and b joins it there
+        self.assertEqual([row[1][0] for row in rows], [0, 1, 0, 1])
+        self.assertEqual(
+            rows[2][3], [(1, 1, REVISION_LINE_COLOR), (0, 1, REVISION_LINE_COLOR)]
+        )
+        self.assertEqual(grapher.columns, 2)
+
+    def test_pages(self):
+        # The layout of a page continues that of the previous ones, like the
+        # layout of the whole history at once, however it is split up
+        items = self.history(500)
+        expected = RevisionGrapher().extend(items)
+
+        for limit in (1, 7, 100):
+            grapher = RevisionGrapher()
+            rows = []
+            for start in range(0, len(items), limit):
+                # Pages are loaded with one more revision, laid out apart
+                rows += grapher.extend(items[start : start + limit])
+                grapher.copy().extend(items[start + limit : start + limit + 1])
+            self.assertEqual(rows, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+from __future__ import absolute_import
+
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Unit tests for rabbitvcs.vcs.roots.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from rabbitvcs.vcs.roots import RootResolver
+
+
+class TestRootResolver(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.wc = os.path.join(self.folder, "wc")
+        self.deep = os.path.join(self.wc, "a", "b")
+        os.makedirs(os.path.join(self.wc, ".git"))
+        os.makedirs(self.deep)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_find_root(self):
+        resolver = RootResolver()
+        self.assertEqual(resolver.find_root(self.deep), (self.wc, ".git"))
+        self.assertEqual(
+            resolver.find_root(os.path.join(self.deep, "file")), (self.wc, ".git")
+        )
+        self.assertEqual(resolver.find_root(self.deep, (".svn",)), (None, None))
+        self.assertEqual(resolver.find_root(self.folder, (".git",)), (None, None))
+
+    def test_cached(self):
+        resolver = RootResolver(check_interval=3600)
+        self.assertEqual(resolver.find_root(self.deep)[0], self.wc)
+
+        os.makedirs(os.path.join(self.deep, ".svn"))
+        self.assertEqual(resolver.find_root(self.deep)[0], self.wc)
+
+        resolver.invalidate(self.deep)
+        self.assertEqual(resolver.find_root(self.deep), (self.deep, ".svn"))
+
+    def test_ctime(self):
+        resolver = RootResolver(check_interval=0)
+        self.assertEqual(resolver.find_root(self.deep)[0], self.wc)
+
+        os.makedirs(os.path.join(self.deep, ".hg"))
+        self.assertEqual(resolver.find_root(self.deep), (self.deep, ".hg"))
+
+
+    def test_outside(self):
+        resolver = RootResolver(check_interval=3600)
+        self.assertEqual(resolver.find_root(self.folder), (None, None))
+        self.assertTrue(self.folder in resolver.entries)
+
+        os.makedirs(os.path.join(self.folder, ".git"))
+        self.assertEqual(resolver.find_root(self.folder), (None, None))
+        resolver.invalidate(self.folder)
+        self.assertEqual(resolver.find_root(self.deep), (self.wc, ".git"))
+        self.assertEqual(resolver.find_root(self.folder), (self.folder, ".git"))
+
+    def test_ancestors(self):
+        # A directory whose ctime is unchanged keeps its roots, without
+        # looking at the directories above it
+        resolver = RootResolver(check_interval=0)
+        middle = os.path.dirname(self.deep)
+        self.assertEqual(resolver.find_root(self.deep)[0], self.wc)
+
+        os.makedirs(os.path.join(middle, ".svn"))
+        self.assertEqual(resolver.find_root(self.deep)[0], self.wc)
+
+        # Until the directory that changed is looked up, or invalidated
+        self.assertEqual(resolver.find_root(middle), (middle, ".svn"))
+        self.assertEqual(resolver.find_root(self.deep), (middle, ".svn"))
+        self.assertEqual(resolver.find_root(self.deep, (".git",))[0], self.wc)
+
+    def test_invalidate(self):
+        resolver = RootResolver(check_interval=3600)
+        middle = os.path.dirname(self.deep)
+        resolver.find_root(self.deep)
+        resolver.find_root(self.folder)
+
+        resolver.invalidate(middle)
+        self.assertFalse(middle in resolver.entries)
+        self.assertFalse(self.deep in resolver.entries)
+        self.assertTrue(self.wc in resolver.entries)
+        self.assertTrue(self.folder in resolver.entries)
+
+    def test_least_recently_used(self):
+        resolver = RootResolver(check_interval=3600, max_entries=3)
+        resolver.find_root(self.deep)
+        self.assertEqual(
+            list(resolver.entries), [self.wc, os.path.dirname(self.deep), self.deep]
+        )
+
+        # A file takes the roots of its directory, which is then used last
+        resolver.find_root(self.wc)
+        resolver.find_root(os.path.join(self.deep, "file"))
+        self.assertEqual(
+            list(resolver.entries),
+            [self.wc, os.path.join(self.deep, "file"), self.deep],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+from __future__ import absolute_import
+
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Unit tests for rabbitvcs.vcs.status.
+"""
+
+import unittest
+
+from rabbitvcs.vcs.status import (
+    Status,
+    StatusCache,
+    SVNStatus,
+    status_complicated,
+    status_error,
+    status_modified,
+    status_normal,
+)
+
+
+class TestStatusCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = StatusCache()
+        for path in ["/r", "/r/a", "/r/a/b", "/r/a/b/c", "/r/a-b", "/r/ab", "/s"]:
+            self.cache[path] = Status(path, status_normal)
+
+    def test_subtree(self):
+        self.assertEqual(
+            self.cache.subtree_paths("/r/a"), ["/r/a", "/r/a/b", "/r/a/b/c"]
+        )
+        self.assertEqual(self.cache.subtree_paths("/r/ab"), ["/r/ab"])
+        self.assertEqual(self.cache.subtree_paths("/t"), [])
+
+    def test_children(self):
+        self.assertEqual(
+            self.cache.child_paths("/r"), ["/r", "/r/a", "/r/a-b", "/r/ab"]
+        )
+
+    def test_records(self):
+        status = SVNStatus.__new__(SVNStatus)
+        Status.__init__(status, "/r/x", "modified", "normal", revision=3, date=10)
+        self.cache["/r/x"] = status
+        cached = self.cache["/r/x"]
+        self.assertEqual(type(cached), SVNStatus)
+        self.assertEqual(cached.single, status_modified)
+        self.assertEqual((cached.revision, cached.date), (3, 10))
+        self.assertEqual(self.cache["/s"].date, None)
+
+    def test_unknown(self):
+        # A status that cannot be simplified is still cached, as an error
+        status = SVNStatus.__new__(SVNStatus)
+        Status.__init__(status, "/r/x", "none", "normal")
+        self.cache["/r/x"] = status
+        self.assertTrue("/r/x" in self.cache)
+        self.assertEqual(self.cache["/r/x"].content, status_error)
+        self.assertEqual(self.cache["/r/x"].single, status_error)
+
+    def test_evict(self):
+        self.cache.use_repository("/s")
+        self.cache.use_repository("/r")
+        self.assertEqual(self.cache.repository_size("/s"), 1)
+        self.cache.evict_repository("/s")
+        self.assertFalse("/s" in self.cache)
+        self.assertEqual(self.cache.repository_size("/s"), 0)
+        self.assertTrue("/r/a" in self.cache)
+
+    def test_summary(self):
+        self.cache["/r/a/b/c"] = Status("/r/a/b/c", status_modified)
+        self.assertEqual(self.cache.summary("/r"), status_modified)
+        self.assertEqual(self.cache.summary("/r/ab"), status_normal)
+
+        self.cache["/r/a/b/c"] = Status("/r/a/b/c", status_normal)
+        self.assertEqual(self.cache.summary("/r"), status_normal)
+
+        self.cache["/r/a/b/c"] = Status("/r/a/b/c", status_complicated)
+        del self.cache["/r/a"]
+        self.assertEqual(self.cache.summary("/r"), status_complicated)
+        self.cache.remove_path_statuses("/r/a")
+        self.assertEqual(self.cache.summary("/r"), status_normal)
+
+    def test_remove(self):
+        self.cache.remove_path_statuses("/r/a")
+        self.cache["/r/a/d"] = Status("/r/a/d", status_normal)
+        self.assertEqual(self.cache.subtree_paths("/r/a"), ["/r/a/d"])
+        self.assertEqual(
+            self.cache.child_paths("/r"), ["/r", "/r/a-b", "/r/ab"]
+        )
+
+    def test_remove_counts(self):
+        # /r/a/b is not cached, but still counts the statuses under it
+        del self.cache["/r/a/b"]
+        self.cache["/r/a/b/c"] = Status("/r/a/b/c", status_modified)
+        self.cache.remove_path_statuses("/r/a")
+        self.assertEqual(self.cache.descendant_counts.get("/r/a/b"), None)
+
+        self.cache["/r/a/b"] = Status("/r/a/b", status_normal)
+        self.assertEqual(self.cache.summary("/r/a/b"), status_normal)
+        self.assertEqual(self.cache.summary("/r"), status_normal)
+
+
+if __name__ == "__main__":
+    unittest.main()
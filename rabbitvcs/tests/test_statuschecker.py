@@ -0,0 +1,209 @@
+from __future__ import absolute_import
+
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Unit tests for rabbitvcs.services.statuschecker.
+"""
+
+import os
+import threading
+import unittest
+from collections import OrderedDict
+
+import rabbitvcs.vcs
+import rabbitvcs.vcs.status
+from rabbitvcs.services.statuschecker import StatusChecker, in_directory
+
+
+class TestCancel(unittest.TestCase):
+    class Pool(object):
+        def __init__(self):
+            self.tags = []
+
+        def cancel(self, predicate):
+            self.tags = [tag for tag in self.tags if not predicate(tag)]
+
+    def setUp(self):
+        self.checker = StatusChecker.__new__(StatusChecker)
+        self.checker.pool = self.Pool()
+
+    def test_in_directory(self):
+        self.assertTrue(in_directory("/a", "/a"))
+        self.assertTrue(in_directory("/a/b", "/a"))
+        self.assertFalse(in_directory("/a/b/c", "/a"))
+        self.assertFalse(in_directory("/ab", "/a"))
+        self.assertFalse(in_directory("/", "/a"))
+
+    def test_enter_subdirectory(self):
+        # Going from /a to /a/sub keeps the checks of what /a/sub shows
+        self.checker.pool.tags = [
+            ["/a"],
+            ["/a/file", "/a/sub"],
+            ["/a/sub/file"],
+            ["/a/sub/deeper/file"],
+            ["/a/file", "/b/file"],
+        ]
+        self.checker.cancel("/a/")
+        self.assertEqual(
+            self.checker.pool.tags,
+            [["/a/sub/file"], ["/a/sub/deeper/file"], ["/a/file", "/b/file"]],
+        )
+
+
+class TestEviction(unittest.TestCase):
+    class Pool(object):
+        def submit(self, key, func, args=(), *rest, **kwargs):
+            func(None, *args)
+
+    class Client(object):
+        def __init__(self):
+            self.cache = rabbitvcs.vcs.status.StatusCache()
+
+    class VCS(object):
+        def __init__(self):
+            self.clients = {}
+
+        def status_cache(self, root):
+            return self.clients[root].cache
+
+    def setUp(self):
+        self.checker = StatusChecker.__new__(StatusChecker)
+        self.checker.pool = self.Pool()
+        self.checker.store = None
+        self.checker.status_caches = OrderedDict()
+        self.checker.repository_sizes = {}
+        self.checker.evicting = {}
+        self.checker.lock = threading.Lock()
+        self.checker.max_statuses = 5
+        self.vcs = self.VCS()
+
+    def check(self, root, count):
+        def fill(vcs_client):
+            cache = vcs_client.status_cache(root)
+            for i in range(count):
+                path = os.path.join(root, str(i))
+                cache[path] = rabbitvcs.vcs.status.Status(path, "normal")
+
+        self.vcs.clients.setdefault(root, self.Client())
+        self.checker._run_job(self.vcs, root, fill, ())
+
+    def test_bound(self):
+        # Each repository has its own client and cache
+        self.check("/a", 3)
+        self.check("/b", 2)
+        self.assertEqual(len(self.vcs.clients["/a"].cache), 3)
+
+        self.check("/c", 2)
+        self.assertEqual(len(self.vcs.clients["/a"].cache), 0)
+        self.assertEqual(len(self.vcs.clients["/b"].cache), 2)
+        self.assertEqual(list(self.checker.status_caches), ["/b", "/c"])
+
+    def test_dropped(self):
+        self.check("/a", 3)
+        self.checker._client_dropped("/a", self.vcs.clients.pop("/a"))
+        self.assertEqual(list(self.checker.status_caches), [])
+        self.assertEqual(self.checker.repository_sizes, {})
+
+
+class TestBatch(unittest.TestCase):
+    # The working copies, with a repository nested in /a
+    ROOTS = ["/a/nested", "/a", "/b"]
+
+    class Pool(object):
+        def __init__(self):
+            self.jobs = []
+
+        def submit(self, key, func, args=(), callback=None, *rest):
+            self.jobs.append((key, func, args, callback))
+
+        def run(self, key=None):
+            """Runs the queued jobs for key, or all of them."""
+            for job in list(self.jobs):
+                if key is None or job[0] == key:
+                    self.jobs.remove(job)
+                    job[3](job[1](TestBatch.VCS(), *job[2]))
+            if key is None and self.jobs:
+                self.run()
+
+    class VCS(object):
+        def status_cache(self, root):
+            return None
+
+        def status(self, path, summary, invalidate):
+            return rabbitvcs.vcs.status.Status(path, "normal")
+
+    def setUp(self):
+        self.checker = StatusChecker.__new__(StatusChecker)
+        self.checker.pool = self.Pool()
+        self.checker.store = None
+        self.guessed = []
+
+        guess = rabbitvcs.vcs.guess
+        rabbitvcs.vcs.guess = self.guess
+        self.addCleanup(setattr, rabbitvcs.vcs, "guess", guess)
+
+    def guess(self, path):
+        self.guessed.append(path)
+        for root in self.ROOTS:
+            if path == root or path.startswith(root + "/"):
+                return {"vcs": rabbitvcs.vcs.VCS_GIT, "repo_path": root}
+        return {"vcs": rabbitvcs.vcs.VCS_DUMMY, "repo_path": path}
+
+    def queued(self):
+        # The working copy and paths of each queued check
+        return sorted(
+            (key, args[2][1]) for (key, func, args, callback) in self.checker.pool.jobs
+        )
+
+    def test_batch(self):
+        paths = ["/a/x", "/a/nested", "/b/y", "/a/z", "/c/w", "/c/v"]
+        results = []
+        self.checker.check_status_batch_async(
+            paths, False, False, False, results.append
+        )
+
+        # Only the working copy of each directory is looked up
+        self.assertEqual(sorted(self.guessed), ["/a", "/b", "/c"])
+        self.assertEqual(
+            self.queued(),
+            [
+                ("/a", ["/a/x", "/a/nested", "/a/z"]),
+                ("/b", ["/b/y"]),
+                ("/c", ["/c/w", "/c/v"]),
+            ],
+        )
+
+        # The nested repository is passed on to its own worker
+        self.checker.pool.run("/a")
+        self.assertEqual(
+            self.queued(),
+            [("/a/nested", ["/a/nested"]), ("/b", ["/b/y"]), ("/c", ["/c/w", "/c/v"])],
+        )
+
+        self.checker.pool.run()
+        self.assertEqual(len(results), 1)
+        self.assertEqual([status.path for status in results[0]], paths)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+from __future__ import absolute_import
+
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Unit tests for rabbitvcs.services.statuscodec.
+"""
+
+import unittest
+
+import rabbitvcs.vcs.status
+from rabbitvcs.services.statuscodec import (
+    HEADER,
+    MAGIC,
+    NO_STRING,
+    RECORD,
+    STRING_FIELDS,
+    VERSIONS,
+    StatusDecodeError,
+    best_version,
+    decode_statuses,
+    encode_statuses,
+)
+from rabbitvcs.util.strings import S
+
+
+class TestStatusCodec(unittest.TestCase):
+    def test_roundtrip(self):
+        Status = rabbitvcs.vcs.status.Status
+        statuses = [
+            Status("/path/to/test", "modified", "normal", revision=12, date=1000),
+            Status(
+                S(b"/path/to/test/caf\xc3\xa9\xff"), "normal", author="somebody"
+            ),
+            Status("/path/to/test/b", "added", revision="a1b2c3"),
+            Status.status_error("/path/to/test/c"),
+        ]
+        statuses[0].summary = "modified"
+
+        decoded = decode_statuses(encode_statuses(statuses))
+        self.assertEqual(len(decoded), len(statuses))
+        for before, after in zip(statuses, decoded):
+            self.assertEqual(type(before), type(after))
+            self.assertEqual(before.__getstate__(), after.__getstate__())
+
+    def test_empty_strings(self):
+        Status = rabbitvcs.vcs.status.Status
+        status = Status("", "", "", revision="")
+        for field in STRING_FIELDS:
+            setattr(status, field, "")
+
+        data = encode_statuses([status])
+        self.assertEqual(HEADER.unpack_from(data, 0)[2], 0)
+        decoded = decode_statuses(data)
+        self.assertEqual(decoded[0].__getstate__(), status.__getstate__())
+        self.assertEqual(decode_statuses(encode_statuses([])), [])
+
+    def test_bad_data(self):
+        self.assertRaises(StatusDecodeError, decode_statuses, b"RVST")
+        self.assertRaises(
+            StatusDecodeError, decode_statuses, HEADER.pack(b"JUNK", 1, 0, 0)
+        )
+        data = HEADER.pack(MAGIC, VERSIONS[-1], 0, 1) + RECORD.pack(
+            0, 0, *([3] + [NO_STRING] * 7 + [0, 0])
+        )
+        self.assertRaises(StatusDecodeError, decode_statuses, data)
+
+    def test_best_version(self):
+        self.assertEqual(best_version([1, 99]), 1)
+        self.assertEqual(best_version([]), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
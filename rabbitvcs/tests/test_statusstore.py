@@ -0,0 +1,92 @@
+from __future__ import absolute_import
+
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Unit tests for rabbitvcs.services.statusstore.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import rabbitvcs.vcs.status
+from rabbitvcs.services.statusstore import StatusStore
+
+
+class TestStatusStore(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.root = os.path.join(self.folder, "wc")
+        os.makedirs(os.path.join(self.root, ".git"))
+        with open(os.path.join(self.root, ".git", "index"), "wb") as f:
+            f.write(b"index")
+
+        self.cache = rabbitvcs.vcs.status.StatusCache()
+        for name in ("a", "b"):
+            path = os.path.join(self.root, name)
+            with open(path, "w") as f:
+                f.write(name)
+            self.cache[path] = rabbitvcs.vcs.status.Status(path, "normal")
+        self.cache[self.root] = rabbitvcs.vcs.status.Status(self.root, "modified")
+
+        # Leave the files alone since long enough to tell changes apart
+        past = time.time() - 10
+        for name in ("a", "b", ""):
+            os.utime(os.path.join(self.root, name), (past, past))
+
+        self.store = StatusStore(self.folder)
+        self.store.dirty.add(self.root)
+        self.store.save(self.cache, self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_load(self):
+        cache = rabbitvcs.vcs.status.StatusCache()
+        StatusStore(self.folder).load(cache, self.root)
+        self.assertTrue(os.path.join(self.root, "a") in cache)
+        self.assertEqual(cache[self.root].content, "modified")
+
+    def test_stale(self):
+        with open(os.path.join(self.root, ".git", "index"), "ab") as f:
+            f.write(b"changed")
+
+        cache = rabbitvcs.vcs.status.StatusCache()
+        StatusStore(self.folder).load(cache, self.root)
+        self.assertFalse(self.root in cache)
+
+    def test_changed_offline(self):
+        os.remove(os.path.join(self.root, "b"))
+
+        cache = rabbitvcs.vcs.status.StatusCache()
+        StatusStore(self.folder).load(cache, self.root)
+        self.assertTrue(os.path.join(self.root, "a") in cache)
+        self.assertFalse(os.path.join(self.root, "b") in cache)
+        self.assertFalse(self.root in cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -35,6 +35,7 @@ from rabbitvcs.ui.action import SVNAction, GitAction, vcs_action_factory
 from rabbitvcs.ui import InterfaceView
 from gi.repository import Gtk, GObject, Gdk
 import six
+import heapq
 import threading
 from locale import strxfrm
 
@@ -57,54 +58,117 @@ DATE_LABEL = _("Date")
 AUTHOR_LABEL = _("Author")
 
 
-def revision_grapher(history):
-    """
-    Expects a list of revision items like so:
-    [
-        item.commit = "..."
-        item.parents = ["...", "..."]
-    ]
+# Rows around the selected ones whose changed paths are loaded in advance
+PREFETCH_ROWS = 10
 
-    Output can be put directly into the CellRendererGraph
+REVISION_LINE_COLOR = "#d3b9d3"
+REVISION_NODE_COLOR = "#a9f9d2"
+
+
+class RevisionGrapher(object):
     """
-    items = []
-    revisions = []
-    last_lines = []
-    color = "#d3b9d3"
-    for item in history:
-        commit = S(item.revision)
-        parents = []
-        for parent in item.parents:
-            parents.append(S(parent))
+    Lays out the revision graph drawn by CellRendererGraph, one revision at a
+    time, newest first.
+
+    Each lane (graph column) waits for one revision: the next parent of the
+    line of history drawn in it. A revision takes the lane waiting for it, or
+    the first free one, and hands it on to its first parent, while its other
+    parents get lanes of their own. Lanes never move while in use, so each
+    revision only costs a line per lane in use, and the layout can be
+    continued with more revisions later.
+    """
+
+    def __init__(self):
+        # Lanes mapped to the revision they wait for, or None if free
+        self.lanes = []
 
-        if commit not in revisions:
-            revisions.append(commit)
+        # Revisions mapped to the lane waiting for them
+        self.waiting = {}
 
-        index = revisions.index(commit)
-        next_revisions = revisions[:]
+        # Free lanes, as a heap
+        self.free = []
 
-        parents_to_add = []
-        for parent in parents:
-            if parent not in next_revisions:
-                parents_to_add.append(parent)
+        self.last_lines = []
+        self.columns = 1
 
-        next_revisions[index : index + 1] = parents_to_add
+    def copy(self):
+        grapher = RevisionGrapher()
+        grapher.lanes = list(self.lanes)
+        grapher.waiting = dict(self.waiting)
+        grapher.free = list(self.free)
+        grapher.last_lines = self.last_lines
+        grapher.columns = self.columns
+        return grapher
+
+    def _take_lane(self):
+        while self.free:
+            lane = heapq.heappop(self.free)
+            if lane < len(self.lanes) and self.lanes[lane] is None:
+                return lane
+
+        self.lanes.append(None)
+        return len(self.lanes) - 1
+
+    def add(self, item):
+        """
+        Lays out the next revision, an item with a revision and parents.
+
+        @rtype:     tuple
+        @return:    (item, node, in_lines, out_lines), as expected by
+            CellRendererGraph.
+
+        """
+
+        commit = S(item.revision)
+
+        lane = self.waiting.pop(commit, None)
+        if lane is None:
+            lane = self._take_lane()
 
         lines = []
-        for i, revision in enumerate(revisions):
-            if revision in next_revisions:
-                lines.append((i, next_revisions.index(revision), color))
-            elif revision == commit:
-                for parent in parents:
-                    lines.append((i, next_revisions.index(parent), color))
+        for i, revision in enumerate(self.lanes):
+            if revision is not None and i != lane:
+                lines.append((i, i, REVISION_LINE_COLOR))
+
+        self.lanes[lane] = None
+        for parent in item.parents:
+            parent = S(parent)
+            target = self.waiting.get(parent)
+            if target is None:
+                if self.lanes[lane] is None:
+                    target = lane
+                else:
+                    target = self._take_lane()
+                self.lanes[target] = parent
+                self.waiting[parent] = target
+            lines.append((lane, target, REVISION_LINE_COLOR))
+
+        if self.lanes[lane] is None:
+            heapq.heappush(self.free, lane)
+        while self.lanes and self.lanes[-1] is None:
+            self.lanes.pop()
 
-        node = (index, "#a9f9d2")
+        self.columns = max(self.columns, len(self.lanes), lane + 1)
 
-        items.append((item, node, last_lines, lines))
-        revisions = next_revisions
-        last_lines = lines
+        row = (item, (lane, REVISION_NODE_COLOR), self.last_lines, lines)
+        self.last_lines = lines
+        return row
+
+    def extend(self, items):
+        return [self.add(item) for item in items]
+
+
+def revision_grapher(history):
+    """
+    Expects a list of revision items like so:
+    [
+        item.commit = "..."
+        item.parents = ["...", "..."]
+    ]
 
-    return items
+    Output can be put directly into the CellRendererGraph
+    """
+    return RevisionGrapher().extend(history)
 
 
 class Log(InterfaceView):
@@ -721,9 +785,24 @@ class GitLog(Log):
             flags={"sortable": False},
         )
         self.start_point = 0
+
+        # The graph of the loaded revisions, and the number of columns it uses
+        self.graph_rows = []
+        self.graph_columns = 1
+
+        # Start points of pages mapped to the graph layout up to them
+        self.graph_states = {}
+
+        # The selected rows whose changed paths are being loaded
+        self.changed_paths_rows = None
+
         self.initialize_root_url()
         self.load_or_refresh()
 
+    def on_refresh_clicked(self, widget):
+        self.graph_states = {}
+        Log.on_refresh_clicked(self, widget)
+
     #
     # Log-loading callback methods
     #
@@ -788,15 +867,14 @@ class GitLog(Log):
             if should_add:
                 self.display_items.append(item)
 
-        grapher = revision_grapher(self.display_items)
-        max_columns = 1
-        for (item, node, in_lines, out_lines) in grapher:
-            if max_columns < len(out_lines):
-                max_columns = len(out_lines)
+        if self.filter_text:
+            # The graph is not drawn for a filtered list
+            rows = [(item, None, [], []) for item in self.display_items]
+        else:
+            rows = self.graph_rows
 
-        # Set the graph column width
-        if not self.filter_text:
-            graph_width = 21 * max_columns
+            # Set the graph column width
+            graph_width = 21 * self.graph_columns
             if graph_width < 55:
                 graph_width = 55
 
@@ -804,7 +882,7 @@ class GitLog(Log):
             graph_column.set_fixed_width(graph_width)
 
         index = 0
-        for (item, node, in_lines, out_lines) in grapher:
+        for (item, node, in_lines, out_lines) in rows:
             revision = S(item.revision)
             msg = helper.html_escape(
                 helper.format_long_text(item.message, cols=80, line1only=True)
@@ -865,9 +943,32 @@ class GitLog(Log):
         self.action.append(
             self.git.log, path=self.path, skip=self.start_point, limit=self.limit + 1
         )
+        self.action.append(self.layout_graph)
         self.action.append(self.refresh)
         self.action.schedule()
 
+    def layout_graph(self):
+        """
+        Lays out the revision graph of the loaded revisions, continuing the
+        layout of the previous page if it was laid out.
+        """
+
+        items = self.action.get_result(0) or []
+
+        grapher = self.graph_states.get(self.start_point)
+        if grapher is None:
+            grapher = RevisionGrapher()
+        else:
+            grapher = grapher.copy()
+
+        # One more revision than a page is loaded, to know if there are more
+        rows = grapher.extend(items[: self.limit])
+        self.graph_states[self.start_point + self.limit] = grapher.copy()
+        rows += grapher.extend(items[self.limit :])
+
+        self.graph_rows = rows
+        self.graph_columns = grapher.columns
+
     def copy_revision_text(self):
         text = ""
         for selected_row in self.revisions_table.get_selected_rows():
@@ -881,14 +982,12 @@ class GitLog(Log):
         self.revision_clipboard.set_text(text, -1)
 
     def update_revision_message(self):
-        combined_paths = []
-        subitems = []
-
-        for selected_row in self.revisions_table.get_selected_rows():
+        selected_rows = self.revisions_table.get_selected_rows()
+        for selected_row in selected_rows:
             item = self.display_items[selected_row]
             msg = S(item.message).display()
 
-            if len(self.revisions_table.get_selected_rows()) == 1:
+            if len(selected_rows) == 1:
                 self.message.set_text(msg)
             else:
                 indented_message = msg.replace("\n", "\n\t")
@@ -896,8 +995,41 @@ class GitLog(Log):
                     "%s %s:\n\t%s\n" % (REVISION_LABEL, item.revision.short(), msg)
                 )
 
-            for subitem in item.changed_paths:
+        # The paths shown once loaded, unless the selection changes first
+        self.changed_paths_rows = selected_rows
+
+        # The changed paths of the rows around the selected ones are loaded
+        # along with them, so that they show at once when selected
+        items = []
+        for row in selected_rows:
+            first = max(0, row - PREFETCH_ROWS)
+            items += self.display_items[first : row + PREFETCH_ROWS + 1]
+        items = [item for item in items if item.changed_paths is None]
 
+        loaded = all(
+            self.display_items[row].changed_paths is not None for row in selected_rows
+        )
+        if loaded:
+            self.update_changed_paths(selected_rows)
+        if not items:
+            return
+
+        self.paths_action = GitAction(self.git, notification=False, run_in_thread=True)
+        self.paths_action.append(self.git.load_changed_paths, items, self.path)
+        if not loaded:
+            self.paths_action.append(self.update_changed_paths, selected_rows)
+        self.paths_action.schedule()
+
+    @gtk_unsafe
+    def update_changed_paths(self, rows):
+        if rows is not self.changed_paths_rows:
+            return
+        self.changed_paths_rows = None
+
+        combined_paths = []
+        subitems = []
+        for row in rows:
+            for subitem in self.display_items[row].changed_paths:
                 if subitem.path not in combined_paths:
                     combined_paths.append(subitem.path)
 
@@ -59,6 +59,60 @@ _ = gettext.gettext
 
 settings = SettingsManager()
 
+# The boolean conditions computed by ContextMenuConditions.generate_path_dict,
+# in the order of their bits when a path dict is encoded as an integer.
+CONDITION_KEYS = (
+    "is_svn",
+    "is_git",
+    "is_mercurial",
+    "is_dir",
+    "is_file",
+    "exists",
+    "is_working_copy",
+    "is_in_a_or_a_working_copy",
+    "is_versioned",
+    "is_normal",
+    "is_added",
+    "is_modified",
+    "is_deleted",
+    "is_ignored",
+    "is_locked",
+    "is_missing",
+    "is_conflicted",
+    "is_obstructed",
+    "has_unversioned",
+    "has_added",
+    "has_modified",
+    "has_deleted",
+    "has_ignored",
+    "has_missing",
+    "has_conflicted",
+    "has_obstructed",
+)
+
+
+def encode_path_dict(path_dict):
+    """
+    Packs the boolean conditions of a single path dict into an integer.
+    """
+
+    bits = 0
+    for index, key in enumerate(CONDITION_KEYS):
+        if path_dict.get(key):
+            bits |= 1 << index
+    return bits
+
+
+def decode_path_dict(bits):
+    """
+    Unpacks an integer made by encode_path_dict into a single path dict.
+    """
+
+    path_dict = {"length": 1}
+    for index, key in enumerate(CONDITION_KEYS):
+        path_dict[key] = bool(bits & (1 << index))
+    return path_dict
+
 
 class MenuBuilder(object):
     """
@@ -1353,6 +1407,64 @@ class MainContextMenuConditions(ContextMenuConditions):
         ]
 
 
+class DirectoryContextMenuConditions(ContextMenuConditions):
+    """
+    Computes the conditions for every item in a directory at once, from a
+    single recursive status check of the directory, instead of one
+    MainContextMenuConditions (and one status check) per item.
+
+    """
+
+    def __init__(self, vcs_client, path):
+        """
+        @param  vcs_client: The vcs client to be used
+        @type   vcs_client: rabbitvcs.vcs.create_vcs_instance()
+
+        @param  path: The directory whose children are examined
+        @type   path: string
+
+        """
+
+        self.vcs_client = vcs_client
+        self.path = path
+
+        #: Maps each child's name to its conditions, encoded by encode_path_dict
+        self.children = {}
+
+        child_statuses = self.generate_child_statuses(path)
+        for name in os.listdir(path):
+            child = os.path.join(path, name)
+
+            self.statuses = child_statuses.get(child, {})
+            self.text_statuses = [
+                st.simple_content_status() for st in list(self.statuses.values())
+            ]
+            self.prop_statuses = [
+                st.simple_metadata_status() for st in list(self.statuses.values())
+            ]
+
+            self.generate_path_dict([child])
+            self.children[name] = encode_path_dict(self.path_dict)
+
+    def generate_child_statuses(self, path):
+        """
+        Groups the recursive statuses of path by the child of path they belong
+        to, ie. {child_path: {status_path: status}}.
+        """
+
+        prefix = path.rstrip("/") + "/"
+        child_statuses = {}
+        for status in self.vcs_client.statuses(path):
+            if not status.path.startswith(prefix):
+                continue
+
+            name = status.path[len(prefix) :].split("/", 1)[0]
+            child = prefix + name
+            child_statuses.setdefault(child, {})[status.path] = status
+
+        return child_statuses
+
+
 class MainContextMenu(object):
     """
     Defines and composes the main context menu.
@@ -278,6 +278,28 @@ def get_home_folder():
     return config_home
 
 
+def get_cache_folder():
+    """
+    Returns the location of the folder we keep cached data in, which can be
+    deleted at any time without losing anything.
+
+    @rtype:     string
+    @return:    The location of our cache folder.
+
+    """
+
+    # $XDG_CACHE_HOME if set, by default ~/.cache
+    xdg_cache_home = os.environ.get(
+        "XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")
+    )
+    cache_home = os.path.join(xdg_cache_home, "rabbitvcs")
+
+    if not os.path.isdir(cache_home):
+        os.makedirs(cache_home, 0o700)
+
+    return cache_home
+
+
 def get_user_path():
     """
     Returns the location of the user's home directory.
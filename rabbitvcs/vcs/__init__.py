@@ -32,6 +32,8 @@ from rabbitvcs.util.log import Log
 logger = Log("rabbitvcs.vcs")
 
 from rabbitvcs.util.helper import get_exclude_paths
+from rabbitvcs.vcs.clientpool import ClientPool
+from rabbitvcs.vcs import roots
 from rabbitvcs.util.settings import SettingsManager
 
 settings = SettingsManager()
@@ -49,18 +51,21 @@ if not settings.get("HideItem", "svn"):
 if not settings.get("HideItem", "git"):
     VCS_FOLDERS[".git"] = VCS_GIT
 
+# Files in each VCS's administrative folder that are rewritten whenever the
+# state of the working copy changes (eg. something is added or committed)
+ADMIN_FILES = {
+    ".git": ("index", "HEAD"),
+    ".svn": ("wc.db",),
+    ".hg": ("dirstate",),
+}
+
 
 def _guess(path):
     # Determine the VCS instance based on the path
     if path:
-        path_to_check = path.split("@")[0]
-
-        while path_to_check != "/" and path_to_check != "":
-            for folder, client in list(VCS_FOLDERS.items()):
-                if os.path.isdir(os.path.join(path_to_check, folder)):
-                    cache = {"vcs": client, "repo_path": path_to_check}
-                    return cache
-            path_to_check = os.path.split(path_to_check)[0]
+        (root, folder) = roots.find_root(path.split("@")[0], list(VCS_FOLDERS))
+        if root:
+            return {"vcs": VCS_FOLDERS[folder], "repo_path": root}
 
     return {"vcs": VCS_DUMMY, "repo_path": path}
 
@@ -77,11 +82,22 @@ def guess(path):
 
 class VCS(object):
     clients = {}
+    pools = {}
+    client_setup = []
+    drop_hooks = []
     exclude_paths = []
 
-    def __init__(self):
+    def __init__(self, isolated=False):
         self.exclude_paths = get_exclude_paths()
 
+        # An isolated instance gets its own backend clients rather than the
+        # class-wide ones, so that it can safely be used from its own thread.
+        if isolated:
+            self.clients = {}
+            self.pools = {}
+            self.client_setup = []
+            self.drop_hooks = []
+
     def dummy(self):
         if VCS_DUMMY in self.clients:
             return self.clients[VCS_DUMMY]
@@ -113,75 +129,106 @@ class VCS(object):
         if settings.get("HideItem", "git"):
             return self.dummy()
 
-        if VCS_GIT in self.clients:
-            git = self.clients[VCS_GIT]
-            if git.__class__.__name__ == "Dummy":
-                return self.dummy()
-
-            if path:
-                if is_repo_path:
-                    git.set_repository(path)
-                else:
-                    repo_path = git.find_repository_path(path)
-                    git.set_repository(repo_path)
-
-            return git
-        else:
+        if VCS_GIT not in self.clients:
             try:
                 from rabbitvcs.vcs.git import Git
 
-                git = Git()
-
-                if path:
-                    if is_repo_path:
-                        git.set_repository(path)
-                    else:
-                        repo_path = git.find_repository_path(path)
-                        git.set_repository(repo_path)
-
-                self.clients[VCS_GIT] = git
-                return self.clients[VCS_GIT]
+                self.clients[VCS_GIT] = self._setup_client(Git())
             except Exception as e:
                 logger.debug("Unable to load Git module: %s" % e)
                 logger.exception(e)
                 self.clients[VCS_GIT] = self.dummy()
-                return self.clients[VCS_GIT]
+
+        return self._repository_client(VCS_GIT, path, is_repo_path)
 
     def mercurial(self, path=None, is_repo_path=False):
         if settings.get("HideItem", "hg"):
             return self.dummy()
 
-        if VCS_MERCURIAL in self.clients:
-            mercurial = self.clients[VCS_MERCURIAL]
-
-            if path:
-                if is_repo_path:
-                    mercurial.set_repository(path)
-                else:
-                    repo_path = mercurial.find_repository_path(path)
-                    mercurial.set_repository(repo_path)
-
-            return mercurial
-        else:
+        if VCS_MERCURIAL not in self.clients:
             try:
                 from rabbitvcs.vcs.mercurial import Mercurial
 
-                mercurial = Mercurial()
-
-                if path:
-                    if is_repo_path:
-                        mercurial.set_repository(path)
-                    else:
-                        repo_path = mercurial.find_repository_path(path)
-                        mercurial.set_repository(repo_path)
-
-                self.clients[VCS_MERCURIAL] = mercurial
-                return self.clients[VCS_MERCURIAL]
+                self.clients[VCS_MERCURIAL] = self._setup_client(Mercurial())
             except Exception as e:
                 logger.debug("Unable to load Mercurial module: %s" % e)
                 logger.exception(e)
                 self.clients[VCS_MERCURIAL] = self.dummy()
-                return self.clients[VCS_MERCURIAL]
+
+        return self._repository_client(VCS_MERCURIAL, path, is_repo_path)
+
+    def _repository_client(self, vcs, path, is_repo_path):
+        """
+        Returns the client of the given kind for the repository containing
+        path (or at path, if is_repo_path). Without a path, or outside of a
+        repository, returns the client not bound to any repository.
+        """
+
+        client = self.clients[vcs]
+        if not path or client is self.clients.get(VCS_DUMMY):
+            return client
+
+        if is_repo_path:
+            repo_path = path
+        else:
+            repo_path = client.find_repository_path(path)
+        if not repo_path:
+            return client
+
+        factory = client.__class__
+        pool = self.pools.get(vcs)
+        if pool is None:
+            pool = self.pools.setdefault(
+                vcs,
+                ClientPool(
+                    lambda root: self._setup_client(factory(root)),
+                    on_drop=self._client_dropped,
+                ),
+            )
+
+        try:
+            return pool.get(repo_path)
+        except Exception as e:
+            logger.debug("Unable to open repository %s: %s" % (repo_path, e))
+            logger.exception(e)
+            return self.dummy()
+
+    def _setup_client(self, client):
+        for func in self.client_setup:
+            func(client)
+        return client
+
+    def configure_clients(self, func):
+        """
+        Calls func(client) with each Git and Mercurial client of this
+        instance, including those created later.
+        """
+
+        self.client_setup.append(func)
+
+        for vcs in (VCS_GIT, VCS_MERCURIAL):
+            client = self.clients.get(vcs)
+            if client is not None and client is not self.clients.get(VCS_DUMMY):
+                func(client)
+
+            pool = self.pools.get(vcs)
+            if pool is not None:
+                for client in pool.clients():
+                    func(client)
+
+    def on_client_dropped(self, func):
+        """
+        Calls func(root, client) when the Git or Mercurial client of the
+        repository at root is dropped to make room for others, before it is
+        closed. A new client, with an empty status cache, is created if the
+        repository is used again.
+        """
+
+        self.drop_hooks.append(func)
+
+    def _client_dropped(self, root, client):
+        for func in self.drop_hooks:
+            func(root, client)
 
     def client(self, path, vcs=None):
         if self.should_exclude(path):
@@ -227,6 +274,31 @@ class VCS(object):
         client = self.client(path)
         return client.status(path, summarize, invalidate)
 
+    def status_cache(self, path):
+        """Returns the StatusCache of the client for path, if it has one."""
+        return getattr(self.client(path), "cache", None)
+
+    def invalidate_statuses(self, root, paths=None):
+        """
+        Drops cached statuses in the working copy at root: those of the given
+        paths, of everything under them and of their parent directories (whose
+        summaries depend on them), or all of them if paths is None.
+        """
+        cache = self.status_cache(root)
+        if cache is None:
+            return
+
+        if paths is None:
+            cache.remove_path_statuses(root)
+            return
+
+        for path in paths:
+            cache.remove_path_statuses(path)
+            while path != root and path.startswith(root):
+                path = os.path.dirname(path)
+                if path in cache:
+                    del cache[path]
+
     def is_working_copy(self, path):
         client = self.client(path)
         return client.is_working_copy(path)
@@ -261,11 +333,11 @@ class VCS(object):
         return client.STATUSES_FOR_REVERT
 
 
-def create_vcs_instance(path=None, vcs=None):
+def create_vcs_instance(path=None, vcs=None, isolated=False):
     """
     Create a VCS instance based on the working copy path
     """
-    return VCS()
+    return VCS(isolated)
 
 
 def guess_vcs(path):
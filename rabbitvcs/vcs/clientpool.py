@@ -0,0 +1,170 @@
+from __future__ import absolute_import
+
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Keeps one backend client per repository, so that each repository keeps its
+open handles, configuration and cached statuses between calls, and different
+repositories can be used from different threads at once.
+
+At most MAX_CLIENTS clients are kept, and the least recently used one is
+dropped to make room for a new one. Clients left unused for IDLE_TIMEOUT
+seconds are closed, which releases their open files and processes but keeps
+them (and their caches) in the pool: a closed client reopens what it needs
+the next time it is used.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from rabbitvcs.util.log import Log
+
+log = Log("rabbitvcs.vcs.clientpool")
+
+# Repositories whose clients are kept by a pool
+MAX_CLIENTS = 16
+
+# Seconds after which an unused client is closed
+IDLE_TIMEOUT = 300
+
+
+def close_client(client):
+    close = getattr(client, "close", None)
+    if close is None:
+        return
+
+    try:
+        close()
+    except Exception as e:
+        log.exception(e)
+
+
+class ClientPool(object):
+    """The clients of one kind of repository, by repository root."""
+
+    def __init__(
+        self,
+        factory,
+        max_clients=MAX_CLIENTS,
+        idle_timeout=IDLE_TIMEOUT,
+        on_drop=None,
+    ):
+        """
+        @type   factory: callable
+        @param  factory: Called with a repository root to create its client.
+
+        @type   on_drop: callable
+        @param  on_drop: Called as on_drop(root, client) when a client is
+            dropped to make room for another, before it is closed.
+
+        """
+
+        self.factory = factory
+        self.on_drop = on_drop
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.timer = None
+
+        # Roots mapped to [client, last used, open], least recently used
+        # first
+        self.entries = OrderedDict()
+
+    def get(self, root):
+        """Returns the client of the repository at root, creating it if
+        needed."""
+        with self.lock:
+            entry = self.entries.pop(root, None)
+            if entry is not None:
+                entry[1:] = [time.time(), True]
+                self.entries[root] = entry
+                self._schedule_reap()
+                return entry[0]
+
+        # Opening a repository may take a while, so do not hold up the others
+        client = self.factory(root)
+
+        unused = None
+        dropped = []
+        with self.lock:
+            entry = self.entries.pop(root, None)
+            if entry is not None:
+                # Another thread got there first
+                unused = client
+                client = entry[0]
+            self.entries[root] = [client, time.time(), True]
+
+            while len(self.entries) > self.max_clients:
+                (dropped_root, dropped_entry) = self.entries.popitem(last=False)
+                dropped.append((dropped_root, dropped_entry[0]))
+            self._schedule_reap()
+
+        if unused is not None:
+            close_client(unused)
+
+        for (dropped_root, dropped_client) in dropped:
+            if self.on_drop:
+                try:
+                    self.on_drop(dropped_root, dropped_client)
+                except Exception as e:
+                    log.exception(e)
+            close_client(dropped_client)
+
+        return client
+
+    def clients(self):
+        with self.lock:
+            return [entry[0] for entry in self.entries.values()]
+
+    def _schedule_reap(self):
+        if self.timer is None:
+            self.timer = threading.Timer(self.idle_timeout, self._reap)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _reap(self):
+        idle = []
+        with self.lock:
+            self.timer = None
+            deadline = time.time() - self.idle_timeout
+            for entry in self.entries.values():
+                if entry[2] and entry[1] <= deadline:
+                    entry[2] = False
+                    idle.append(entry[0])
+            if any(entry[2] for entry in self.entries.values()):
+                self._schedule_reap()
+
+        for client in idle:
+            close_client(client)
+
+    def close(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            clients = [entry[0] for entry in self.entries.values()]
+            self.entries = OrderedDict()
+
+        for client in clients:
+            close_client(client)
@@ -28,20 +28,26 @@ from __future__ import absolute_import
 import os.path
 from datetime import datetime
 
+from six.moves import intern
+
 from .gittyup.client import GittyupClient
 from .gittyup import objects
 
 from rabbitvcs.util import helper
 from rabbitvcs.util.strings import S
+from rabbitvcs.util.settings import SettingsManager
 
 import rabbitvcs.vcs
 import rabbitvcs.vcs.status
 import rabbitvcs.vcs.log
+import rabbitvcs.vcs.roots
 from rabbitvcs.vcs.branch import BranchEntry
 from rabbitvcs.util.log import Log
 
 log = Log("rabbitvcs.vcs.git")
 
+settings = SettingsManager()
+
 from rabbitvcs import gettext
 
 _ = gettext.gettext
@@ -83,6 +89,84 @@ class Revision(object):
         return self.value
 
 
+def decode_log(items, head=None):
+    """
+    Turns the commits returned by GittyupClient.log() into log entries, with
+    the parents as commit ids.
+
+    @type   items: list
+    @param  items: The commits, as dicts.
+
+    @type   head: string
+    @param  head: The id of the HEAD commit, to mark it.
+
+    """
+
+    fromtimestamp = datetime.fromtimestamp
+    LogEntry = rabbitvcs.vcs.log.Log
+
+    # Authors as given by git mapped to their names. There are few of them,
+    # so each is only parsed once and all the entries share its name.
+    authors = {}
+
+    entries = []
+    for item in items:
+        raw_author = item.get("author") or item.get("committer")
+        author = authors.get(raw_author)
+        if author is None:
+            if raw_author is None:
+                author = _("(no author)")
+            else:
+                pos = raw_author.find("<")
+                if pos != -1:
+                    author = raw_author[0:pos]
+                else:
+                    author = raw_author
+                author = intern(str(author.strip()))
+            authors[raw_author] = author
+
+        commit = item["commit"]
+        entries.append(
+            LogEntry(
+                fromtimestamp(int(item["commit_date"])),
+                Revision("hash", commit),
+                author,
+                item.get("message", ""),
+                None,
+                item.get("parents", []),
+                commit == head,
+            )
+        )
+
+    return entries
+
+
+def benchmark_decode_log(count=100000):
+    """Returns (seconds, entries): the seconds decode_log() takes for count
+    made up commits, and the log entries it returns."""
+    import hashlib
+    import time
+
+    items = []
+    for i in range(count):
+        commit = hashlib.sha1(str(i).encode("ascii")).hexdigest()
+        items.append(
+            {
+                "commit": commit,
+                "parents": [commit[::-1]],
+                "author": "Author %i <author%i@example.com>" % (i % 50, i % 50),
+                "committer": "Committer <committer@example.com>",
+                "author_date": "%i" % (1500000000 + i),
+                "commit_date": "%i" % (1500000000 + i),
+                "message": "Commit %i\n\nSome details" % i,
+            }
+        )
+
+    start = time.time()
+    entries = decode_log(items, items[0]["commit"])
+    return (time.time() - start, entries)
+
+
 class Git(object):
     STATUS = {
         "normal": gittyup.objects.NormalStatus,
@@ -131,12 +215,21 @@ class Git(object):
         else:
             self.client = GittyupClient()
 
+        self.client.set_status_engine(settings.get("git", "status_engine"))
+
         self.cache = rabbitvcs.vcs.status.StatusCache()
 
+        # Cached directories whose contents are not cached, because they
+        # were only listed by a non-recursive status check
+        self.unlisted_directories = set()
+
     def set_repository(self, path):
         self.client.set_repository(path)
         self.config = self.client.config
 
+    def close(self):
+        self.client.close()
+
     def config_get(self, key1, key2):
         return self.client._config_get(key1, key2)
 
@@ -144,7 +237,7 @@ class Git(object):
         return self.client.get_repository()
 
     def find_repository_path(self, path):
-        return self.client.find_repository_path(path)
+        return rabbitvcs.vcs.roots.find_repository_path(path, ".git")
 
     #
     # Status Methods
@@ -163,10 +256,13 @@ class Git(object):
         if path in self.cache:
             if invalidate:
                 del self.cache[path]
-            else:
-                return self.cache.find_path_statuses(path)
+            elif self._contents_cached(path, recurse):
+                if recurse:
+                    return self.cache.find_path_statuses(path)
+                return self.cache.find_child_statuses(path)
 
-        gittyup_statuses = self.client.status(path)
+        gittyup_statuses = self.client.status(path, recurse=recurse)
+        self._listed(path, recurse)
 
         if not len(gittyup_statuses):
             return [rabbitvcs.vcs.status.Status.status_unknown(path)]
@@ -186,10 +282,35 @@ class Git(object):
                 rabbitvcs_status = rabbitvcs.vcs.status.GitStatus(st)
                 self.cache[st.path] = rabbitvcs_status
 
+                if not recurse and st.path != path and os.path.isdir(st.path):
+                    self.unlisted_directories.add(st.path)
+
                 statuses.append(rabbitvcs_status)
 
             return statuses
 
+    def _contents_cached(self, path, recurse):
+        if path in self.unlisted_directories:
+            return False
+
+        if recurse:
+            prefix = path + "/"
+            for directory in self.unlisted_directories:
+                if directory.startswith(prefix):
+                    return False
+
+        return True
+
+    def _listed(self, path, recurse):
+        self.unlisted_directories.discard(path)
+        if recurse:
+            prefix = path + "/"
+            self.unlisted_directories = set(
+                directory
+                for directory in self.unlisted_directories
+                if not directory.startswith(prefix)
+            )
+
     def status(self, path, summarize=True, invalidate=False):
         if path in self.cache:
             if invalidate:
@@ -227,7 +348,7 @@ class Git(object):
         if self.is_working_copy(path):
             return True
 
-        return self.find_repository_path(os.path.split(path)[0]) != ""
+        return self.find_repository_path(os.path.split(path)[0]) is not None
 
     def is_versioned(self, path):
         if self.is_working_copy(path):
@@ -772,70 +893,56 @@ class Git(object):
         @type   showtype Determines which revisions to show.  "all" shows all revisions,
             "branch" shows just the branch given in refspec
 
-        @returns    A list of commits
+        @returns    A list of commits, whose changed_paths are None until
+                    they are loaded with load_changed_paths()
 
         """
 
-        # The strptime method relies on locales to work, and may not work with non en_US locales
-        # Temporarily change the locale to en_US so strptime can work consistently
-        # Then change it back at the end of the method
-        import locale
+        items = self.client.log(path, skip, limit, revision.primitive(), showtype)
 
-        current_locale = locale.getlocale()
-        if current_locale[0] is not None:
-            locale.setlocale(locale.LC_ALL, "C")
+        try:
+            head = S(self.client.head())
+        except KeyError:
+            # No commits yet
+            head = None
 
-        items = self.client.log(path, skip, limit, revision.primitive(), showtype)
-        returner = []
-        for item in items:
-            revision = self.revision(item["commit"])
-            date = datetime.strptime(item["commit_date"][0:-6], "%a %b %d %H:%M:%S %Y")
-
-            try:
-                author = item.get("author", False) or item["committer"]
-                pos = author.find("<")
-                if pos != -1:
-                    author = author[0:pos]
-                author = author.strip()
-            except KeyError:
-                author = _("(no author)")
+        return decode_log(items, head)
 
-            message = ""
-            if "message" in item:
-                message = item["message"]
+    def load_changed_paths(self, items, path=None):
+        """
+        Loads the changed_paths of log items returned by log(), for those
+        that do not have them yet.
 
-            changed_paths = []
-            if "changed_paths" in item:
-                for changed_path in item["changed_paths"]:
-                    action = "+%s/-%s" % (
-                        changed_path["additions"],
-                        changed_path["removals"],
-                    )
+        @type   items: list
+        @param  items: rabbitvcs.vcs.log.Log items
 
-                    changed_paths.append(
-                        rabbitvcs.vcs.log.LogChangedPath(
-                            changed_path["path"], action, "", ""
-                        )
-                    )
+        @type   path: string
+        @param  path: The path given to log(), to only load the paths changed
+                      under it
 
-            parents = []
-            if "parents" in item:
-                for parent in item["parents"]:
-                    parents.append(self.revision(parent))
+        """
 
-            head = False
-            if item["commit"] == self.client.head():
-                head = True
+        missing = [item for item in items if item.changed_paths is None]
+        if not missing:
+            return
 
-            returner.append(
-                rabbitvcs.vcs.log.Log(
-                    date, revision, author, message, changed_paths, parents, head
+        changes = self.client.changed_paths(
+            [S(item.revision) for item in missing], path or ""
+        )
+        for item in missing:
+            changed_paths = []
+            for changed_path in changes.get(S(item.revision), []):
+                action = "+%s/-%s" % (
+                    changed_path["additions"],
+                    changed_path["removals"],
                 )
-            )
-
-        locale.setlocale(locale.LC_ALL, current_locale)
 
-        return returner
+                changed_paths.append(
+                    rabbitvcs.vcs.log.LogChangedPath(
+                        changed_path["path"], action, "", ""
+                    )
+                )
+            item.changed_paths = changed_paths
 
     def diff_summarize(self, path1, revision_obj1, path2=None, revision_obj2=None):
         """
@@ -0,0 +1,225 @@
+from __future__ import absolute_import
+
+#
+# catfile.py
+#
+
+"""
+Reads objects from a repository through long-running "git cat-file --batch"
+and "git cat-file --batch-check" processes, so that fetching a file at some
+revision does not start a new git process each time.
+
+Each repository gets a CatFilePool holding up to MAX_READERS processes of
+each kind, so that a few threads can read at once. Processes left unused
+for IDLE_TIMEOUT seconds are stopped.
+"""
+
+import os
+import subprocess
+import threading
+import time
+
+from rabbitvcs.util.strings import S
+
+# Processes of each kind kept per repository
+MAX_READERS = 2
+
+# Seconds after which an unused process is stopped
+IDLE_TIMEOUT = 60
+
+
+class CatFile(object):
+    """A single "git cat-file" process, used by one thread at a time."""
+
+    def __init__(self, cwd, mode):
+        """
+        @type   mode: string
+        @param  mode: "--batch" to read objects, or "--batch-check" to only
+            read their type and size.
+
+        """
+
+        self.cwd = cwd
+        self.mode = mode
+        self.proc = None
+        self.last_used = time.time()
+
+    def _start(self):
+        env = os.environ.copy()
+        env["LANG"] = "C"
+        env["GIT_TERMINAL_PROMPT"] = "0"
+        devnull = open(os.devnull, "wb")
+        try:
+            self.proc = subprocess.Popen(
+                ["git", "cat-file", self.mode],
+                cwd=self.cwd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=devnull,
+                env=env,
+                close_fds=True,
+            )
+        finally:
+            devnull.close()
+
+    def _request(self, name):
+        if self.proc is None or self.proc.poll() is not None:
+            self._start()
+
+        self.proc.stdin.write(S(name).bytes() + b"\n")
+        self.proc.stdin.flush()
+
+        header = self.proc.stdout.readline()
+        if not header:
+            raise IOError("git cat-file exited")
+
+        fields = header.split()
+        if len(fields) != 3:
+            # "<name> missing" or "<name> ambiguous"
+            return None
+
+        return (S(fields[0]), S(fields[1]), int(fields[2]))
+
+    def query(self, name):
+        """
+        Returns (sha, type, size) for --batch-check, or (sha, type, data)
+        for --batch, or None if name does not name an object.
+        """
+
+        self.last_used = time.time()
+        try:
+            result = self._request(name)
+            if result is None or self.mode != "--batch":
+                return result
+
+            (sha, kind, size) = result
+            data = self.proc.stdout.read(size + 1)[:size]
+            return (sha, kind, data)
+        except (IOError, OSError, ValueError):
+            # The process is not in a known state any more
+            self.close()
+            raise
+
+    def close(self):
+        if self.proc is None:
+            return
+
+        try:
+            self.proc.stdin.close()
+            self.proc.wait()
+        except (IOError, OSError):
+            self.proc.kill()
+        self.proc = None
+
+
+class CatFilePool(object):
+    """The cat-file processes of one repository."""
+
+    def __init__(self, cwd):
+        self.cwd = cwd
+        self.lock = threading.Lock()
+
+        # Modes mapped to the idle processes
+        self.idle = {"--batch": [], "--batch-check": []}
+        self.timer = None
+
+    def _query(self, mode, name):
+        if "\n" in name:
+            # It would be read as two requests
+            raise ValueError("git cat-file cannot look up %r" % name)
+
+        with self.lock:
+            if self.idle[mode]:
+                reader = self.idle[mode].pop()
+            else:
+                reader = CatFile(self.cwd, mode)
+
+        try:
+            result = reader.query(name)
+        except (IOError, OSError, ValueError):
+            # Try once more with a new process
+            result = reader.query(name)
+
+        with self.lock:
+            if len(self.idle[mode]) < MAX_READERS:
+                self.idle[mode].append(reader)
+                reader = None
+            self._schedule_reap()
+
+        if reader is not None:
+            reader.close()
+
+        return result
+
+    def read(self, name):
+        """
+        Returns (sha, type, data) for the object name (eg. "HEAD:README"),
+        or None if there is no such object.
+        """
+
+        return self._query("--batch", name)
+
+    def info(self, name):
+        """
+        Returns (sha, type, size) for the object name, or None if there is no
+        such object.
+        """
+
+        return self._query("--batch-check", name)
+
+    def _schedule_reap(self):
+        if self.timer is None:
+            self.timer = threading.Timer(IDLE_TIMEOUT, self._reap)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _reap(self):
+        stale = []
+        with self.lock:
+            self.timer = None
+            deadline = time.time() - IDLE_TIMEOUT
+            for mode, readers in list(self.idle.items()):
+                self.idle[mode] = []
+                for reader in readers:
+                    if reader.last_used > deadline:
+                        self.idle[mode].append(reader)
+                    else:
+                        stale.append(reader)
+            if any(self.idle.values()):
+                self._schedule_reap()
+
+        for reader in stale:
+            reader.close()
+
+    def close(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            readers = sum(list(self.idle.values()), [])
+            self.idle = {"--batch": [], "--batch-check": []}
+
+        for reader in readers:
+            reader.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool_for(path):
+    """Returns the CatFilePool of the repository at path."""
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = CatFilePool(path)
+        return pool
+
+
+def close_pool(path):
+    """Stops the cat-file processes of the repository at path."""
+    with _pools_lock:
+        pool = _pools.pop(path, None)
+
+    if pool is not None:
+        pool.close()
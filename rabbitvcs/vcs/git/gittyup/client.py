@@ -8,10 +8,14 @@ from __future__ import print_function
 import os, errno
 import os.path
 import re
+import stat
 import shutil
 import fnmatch
 import time
 import struct
+import itertools
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from mimetypes import guess_type
 import time
@@ -28,6 +32,9 @@ from dulwich.index import write_index_dict, SHA1Writer
 
 from .exceptions import *
 from . import util
+from . import hashing
+from . import catfile
+from .ignore import IgnoreMatcher
 from .objects import *
 from .command import GittyupCommand
 
@@ -42,6 +49,61 @@ ENCODING = "UTF-8"
 
 RE_STATUS = re.compile("^([\sA-Z\?]+)\s(?:\S+\s->\s)?(.*?)$")
 
+# The first git version with "git status --porcelain=v2"
+PORCELAIN_V2_VERSION = [2, 11]
+
+# The number of fields before the path in "git status --porcelain=v2" entries
+PORCELAIN_V2_FIELDS = {"1": 8, "2": 9, "u": 10}
+
+# Flattened trees kept by _get_tree_index
+TREE_INDEX_CACHE_SIZE = 8
+
+# Commits whose changed paths are kept by changed_paths()
+CHANGED_PATHS_CACHE_SIZE = 1024
+
+# A commit in the output of "git show -m --pretty=oneline", naming the parent
+# it is compared with if it is a merge
+CHANGED_PATHS_HEADER = re.compile(
+    r"([0-9a-f]{40,64})(?: \(from ([0-9a-f]{40,64})\))?( |$)"
+)
+
+# The fields of a commit in the output of log(), separated by NULs
+LOG_FORMAT = "%H%x00%P%x00%an <%ae>%x00%at%x00%cn <%ce>%x00%ct%x00%B"
+LOG_FIELDS = (
+    "commit",
+    "parents",
+    "author",
+    "author_date",
+    "committer",
+    "commit_date",
+    "message",
+)
+
+# Ways of getting statuses: by running git, or in process with dulwich
+# Environment of the git commands finding statuses. Refreshing the index is
+# an optional lock that they skip, so that checking statuses does not rewrite
+# .git/index, which the status checker watches to know when to check again.
+STATUS_COMMAND_ENV = {"GIT_OPTIONAL_LOCKS": "0"}
+
+STATUS_ENGINE_PORCELAIN = "porcelain"
+STATUS_ENGINE_DULWICH = "dulwich"
+
+
+def index_time(value):
+    """Returns a time from an index entry as (seconds, nanoseconds)."""
+    if isinstance(value, tuple):
+        return (int(value[0]), int(value[1]))
+    seconds = int(value)
+    return (seconds, int(round((value - seconds) * 1000000000)))
+
+
+def stat_time(st, name):
+    """Returns the mtime or ctime of a stat result as (seconds, nanoseconds)."""
+    nanoseconds = getattr(st, "st_%s_ns" % name, None)
+    if nanoseconds is None:
+        return index_time(getattr(st, "st_%s" % name))
+    return (nanoseconds // 1000000000, nanoseconds % 1000000000)
+
 
 def callback_notify_null(val):
     pass
@@ -92,6 +154,16 @@ class GittyupClient(object):
         self.global_ignore_patterns = []
 
         self.git_version = None
+        self.status_engine = STATUS_ENGINE_PORCELAIN
+        self.ignore_matcher = None
+
+        # (tree id, path) mapped to flattened trees, least recently used first
+        self.tree_indexes = OrderedDict()
+
+        # (path, commit id) mapped to the files the commit changed under
+        # path, oldest first. The log window loads them from several threads.
+        self.changed_paths_cache = {}
+        self.changed_paths_lock = threading.Lock()
 
         self.numberOfCommandStages = 0
         self.numberOfCommandStagesExecuted = 0
@@ -142,17 +214,56 @@ class GittyupClient(object):
     def _get_tree_from_sha1(self, sha1):
         return self.repo[self.repo[sha1].tree]
 
-    def _get_tree_index(self, tree=None):
+    def _get_tree_index(self, tree=None, path=""):
+        """
+        Returns a dict mapping the paths of the files in tree (HEAD by
+        default), or only of those under path, to their (mode, sha).
+
+        Trees are immutable, so the result is cached by tree id, and must not
+        be modified.
+        """
+
         if tree is None:
             tree = self._get_tree_at_head()
+        if not tree:
+            return {}
+
+        key = (tree.id, path)
+        tree_index = self.tree_indexes.pop(key, None)
+        if tree_index is None:
+            tree_index = self._flatten_tree(tree, path)
+
+        self.tree_indexes[key] = tree_index
+        while len(self.tree_indexes) > TREE_INDEX_CACHE_SIZE:
+            self.tree_indexes.popitem(last=False)
 
+        return tree_index
+
+    def _flatten_tree(self, tree, path):
         tree_index = {}
-        if tree:
-            for item in self.repo.object_store.iter_tree_contents(tree.id):
-                tree_index[item[0].decode(self.UTF8)] = (
-                    item[1],
-                    item[2].decode(self.UTF8),
+        tree_id = tree.id
+        prefix = ""
+        if path:
+            # Only read the subtree at path
+            try:
+                (mode, sha) = tree.lookup_path(
+                    self.repo.object_store.__getitem__, S(path).bytes()
                 )
+            except (KeyError, dulwich.errors.NotTreeError):
+                return tree_index
+
+            if not stat.S_ISDIR(mode):
+                tree_index[path] = (mode, sha.decode(self.UTF8))
+                return tree_index
+
+            tree_id = sha
+            prefix = path + "/"
+
+        for item in self.repo.object_store.iter_tree_contents(tree_id):
+            tree_index[prefix + item[0].decode(self.UTF8)] = (
+                item[1],
+                item[2].decode(self.UTF8),
+            )
 
         return tree_index
 
@@ -265,7 +376,7 @@ class GittyupClient(object):
 
         return False
 
-    def _read_directory_tree(self, path, show_ignored_files=False):
+    def _read_directory_tree(self, path, show_ignored_files=False, recurse=True):
         files = []
         directories = []
         for root, dirs, filenames in os.walk(path, topdown=True):
@@ -289,6 +400,9 @@ class GittyupClient(object):
 
             directories.append(rel_root)
 
+            if not recurse:
+                break
+
         # Remove duplicates in list
         directories = list(set(directories))
         return (sorted(files), directories)
@@ -381,6 +495,18 @@ class GittyupClient(object):
     def get_repository(self):
         return self.repo.path
 
+    def close(self):
+        """
+        Releases the open files and processes of the repository. They are
+        opened again if the client is used afterwards.
+        """
+
+        if self.repo is None:
+            return
+
+        self.repo.close()
+        catfile.close_pool(self.repo.path)
+
     def find_repository_path(self, path):
         path_to_check = S(path)
         while path_to_check != "/" and path_to_check != "":
@@ -497,8 +623,7 @@ class GittyupClient(object):
                     # If the file is locally modified, set these vars to 0
                     # I'm not sure yet why this needs to happen, but it does
                     # in order for the file to appear modified and not normal
-                    blob = self._get_blob_from_file(path)
-                    if blob.id != blob_id:
+                    if hashing.blob_id(path) != S(blob_id):
                         ctime = 0
                         mtime = 0
                         dev = 0
@@ -1540,9 +1665,9 @@ class GittyupClient(object):
 
         return tags
 
-    def status_porcelain(self, path):
+    def status_porcelain(self, path, recurse=True):
         if os.path.isdir(path):
-            (files, directories) = self._read_directory_tree(path)
+            (files, directories) = self._read_directory_tree(path, recurse=recurse)
         else:
             files = [self.get_relative_path(path)]
             directories = []
@@ -1552,12 +1677,7 @@ class GittyupClient(object):
             files_hash[file] = True
 
         cmd = ["git", "status", "--porcelain", path]
-        try:
-            (status, stdout, stderr) = GittyupCommand(
-                cmd, cwd=self.repo.path, notify=self.notify
-            ).execute()
-        except GittyupCommandError as e:
-            self.callback_notify(e)
+        stdout = self._stream(cmd, cancel=self.get_cancel(), env=STATUS_COMMAND_ENV)
 
         statuses = []
         modified_files = []
@@ -1566,35 +1686,30 @@ class GittyupClient(object):
             if components:
                 status = components.group(1)
                 strip_status = status.strip()
-                path = self.string_unescape(components.group(2))
-                if path[0] == '"' and path[-1] == '"':
-                    path = path[1:-1]
+                status_path = self.string_unescape(components.group(2))
+                if status_path[0] == '"' and status_path[-1] == '"':
+                    status_path = status_path[1:-1]
 
                 if status == " D":
-                    statuses.append(MissingStatus(path))
+                    statuses.append(MissingStatus(status_path))
                 elif any(c in strip_status for c in ["M", "R", "U"]):
-                    statuses.append(ModifiedStatus(path))
+                    statuses.append(ModifiedStatus(status_path))
                 elif strip_status in ["A", "C"]:
-                    statuses.append(AddedStatus(path))
+                    statuses.append(AddedStatus(status_path))
                 elif strip_status == "D":
-                    statuses.append(RemovedStatus(path))
+                    statuses.append(RemovedStatus(status_path))
                 elif strip_status == "??":
-                    statuses.append(UntrackedStatus(path))
+                    statuses.append(UntrackedStatus(status_path))
 
-                modified_files.append(path)
+                modified_files.append(status_path)
                 try:
-                    del files_hash[path]
+                    del files_hash[status_path]
                 except Exception as e:
                     pass
 
         # Determine untracked directories
-        cmd = ["git", "clean", "-nd", self.repo.path]
-        try:
-            (status, stdout, stderr) = GittyupCommand(
-                cmd, cwd=self.repo.path, notify=self.notify
-            ).execute()
-        except GittyupCommandError as e:
-            self.callback_notify(e)
+        cmd = ["git", "clean", "-nd", path]
+        stdout = self._stream(cmd, cancel=self.get_cancel())
 
         untracked_directories = []
         for line in stdout:
@@ -1604,14 +1719,9 @@ class GittyupClient(object):
                 if untracked_path[-1] == "/":
                     untracked_directories.append(untracked_path[:-1])
 
-        # Determine the ignored files and directories in Repo
-        cmd = ["git", "clean", "-ndX", self.repo.path]
-        try:
-            (status, stdout, stderr) = GittyupCommand(
-                cmd, cwd=self.repo.path, notify=self.notify
-            ).execute()
-        except GittyupCommandError as e:
-            self.callback_notify(e)
+        # Determine the ignored files and directories under path
+        cmd = ["git", "clean", "-ndX", path]
+        stdout = self._stream(cmd, cancel=self.get_cancel())
         ignored_directories = []
         for line in stdout:
             components = re.match("^(Would remove)\s(.*?)$", line)
@@ -1626,17 +1736,11 @@ class GittyupClient(object):
                     del files_hash[ignored_path]
                 except Exception as e:
                     pass
+        untracked_directories = set(untracked_directories)
+        ignored_directories = set(ignored_directories)
         for file, data in list(files_hash.items()):
-            ignore_file = False
-            untracked_file = False
-            for ignored_path in ignored_directories:
-                if S(ignored_path) in file:
-                    ignore_file = True
-                    break
-            for untracked_path in untracked_directories:
-                if S(untracked_path) in file:
-                    untracked_file = True
-                    break
+            ignore_file = self._inside_directories(file, ignored_directories)
+            untracked_file = self._inside_directories(file, untracked_directories)
             if untracked_file == True:
                 statuses.append(UntrackedStatus(file))
                 if ignore_file == True:
@@ -1647,153 +1751,649 @@ class GittyupClient(object):
             else:
                 statuses.append(NormalStatus(file))
 
-        # Determine status of folders based on child contents
+        # Determine status of folders based on child contents, marking the
+        # parents of each modified file until one is already marked
+        modified_directories = set()
+        for file in modified_files:
+            # Untracked directories are listed as "dir/"
+            for d in self._parent_directories(file.rstrip("/"), ""):
+                if d in modified_directories:
+                    break
+                modified_directories.add(d)
+
         for d in directories:
-            d_status = NormalStatus(d)
+            if self._inside_directories(d, ignored_directories):
+                d_status = IgnoredStatus(d)
+            elif d in modified_directories:
+                d_status = ModifiedStatus(d)
+            elif self._inside_directories(d, untracked_directories):
+                d_status = UntrackedStatus(d)
+            else:
+                d_status = NormalStatus(d)
+            statuses.append(d_status)
 
-            # Check if directory is untracked or a sub-directory of an untracked directory
-            for untracked_path in untracked_directories:
-                if untracked_path in d:
-                    d_status = UntrackedStatus(d)
-                    break
+        return statuses
+
+    def _stream(self, cmd, separator=None, **kwargs):
+        """
+        Runs a git command with GittyupCommand.stream() and yields its lines
+        or records. As with execute(), a command exiting with a non-zero
+        status (eg. git log in a repository without commits) just yields
+        what it printed.
+        """
+
+        return GittyupCommand(
+            cmd, cwd=self.repo.path, notify=self.notify, **kwargs
+        ).stream(separator)
+
+    def _git_records(self, cmd):
+        """
+        Runs a git command printing NUL separated records (eg. with -z) and
+        returns the records. It is run as a status command, without taking
+        optional locks.
+        """
+
+        try:
+            (returncode, stdout, stderr) = GittyupCommand(
+                cmd,
+                cwd=self.repo.path,
+                notify=self.notify,
+                cancel=self.get_cancel(),
+                env=STATUS_COMMAND_ENV,
+            ).execute_raw()
+        except GittyupCommandError as e:
+            self.callback_notify(e)
+            return []
+
+        if returncode and stderr:
+            self.callback_notify(S(stderr))
+
+        return [S(record) for record in stdout.split(b"\0") if record]
+
+    def _porcelain_status(self, xy, path):
+        # Same classification as status_porcelain, where XY has spaces for "."
+        strip_status = xy.strip()
+        if xy == " D":
+            return MissingStatus(path)
+        elif any(c in strip_status for c in ["M", "R", "U"]):
+            return ModifiedStatus(path)
+        elif strip_status in ["A", "C"]:
+            return AddedStatus(path)
+        elif strip_status == "D":
+            return RemovedStatus(path)
+        return None
+
+    def _parent_directories(self, name, top):
+        """Yields the directories containing name, up to and including top."""
+        while name and name != top:
+            name = os.path.dirname(name)
+            yield name
+
+    def _inside_directories(self, name, directories):
+        """Returns whether name is one of directories or is inside one."""
+        while name:
+            if name in directories:
+                return True
+            name = os.path.dirname(name)
+        return False
+
+    def status_porcelain_v2(self, path, recurse=True):
+        """
+        Gets the statuses of path, and of everything under it if it is a
+        directory, from a single "git status --porcelain=v2" run, plus a
+        "git ls-files" run to find the unchanged files of a directory.
+
+        Untracked and ignored directories are derived from the files git
+        lists, instead of asking "git clean" and walking the working tree.
+        The contents of ignored directories are not listed.
+
+        If recurse is False, only the statuses of path and of its immediate
+        children are returned, and git lists untracked directories instead
+        of every file in them.
+        """
+
+        relative_path = self.get_relative_path(path)
+        if relative_path == ".":
+            relative_path = ""
+
+        cmd = [
+            "git",
+            "status",
+            "--porcelain=v2",
+            "-z",
+            "--ignored=matching",
+            "--untracked-files=%s" % ("all" if recurse else "normal"),
+            "--",
+            path,
+        ]
+
+        statuses = []
+        seen = set()
+
+        # Paths that make the directories containing them modified
+        changed = []
+        untracked = []
+        untracked_directories = []
+        ignored = []
+        ignored_directories = []
+
+        records = iter(self._git_records(cmd))
+        for record in records:
+            kind = record[0:1]
+            if kind in PORCELAIN_V2_FIELDS:
+                fields = record.split(" ", PORCELAIN_V2_FIELDS[kind])
+                name = fields[-1]
+                if kind == "2":
+                    # Renames and copies are followed by the original path
+                    next(records, None)
+
+                if kind == "u":
+                    status = ModifiedStatus(name)
+                else:
+                    status = self._porcelain_status(fields[1].replace(".", " "), name)
+                if status:
+                    statuses.append(status)
+                changed.append(name)
+            elif kind == "?":
+                name = record[2:]
+                if name.endswith("/"):
+                    name = name.rstrip("/")
+                    untracked_directories.append(name)
+                else:
+                    statuses.append(UntrackedStatus(name))
+                changed.append(name)
+                untracked.append(name)
+            elif kind == "!":
+                name = record[2:]
+                if name.endswith("/"):
+                    ignored_directories.append(name.rstrip("/"))
+                    continue
+                statuses.append(IgnoredStatus(name))
+                self.ignored_paths.append(name)
+                ignored.append(name)
+            else:
+                continue
+
+            seen.add(name)
+
+        # The path itself may be inside an ignored or untracked directory,
+        # which git lists instead of the path
+        ignored_directories = [
+            relative_path if relative_path.startswith(name + "/") else name
+            for name in ignored_directories
+        ]
+        untracked_directories = [
+            relative_path if relative_path.startswith(name + "/") else name
+            for name in untracked_directories
+        ]
 
-            dirPattern = "/%s/" % d
-            if len(d) == 0:
-                dirPattern = "/"
+        if not os.path.isdir(path):
+            if relative_path not in seen and os.path.lexists(path):
+                if relative_path in ignored_directories:
+                    statuses.append(IgnoredStatus(relative_path))
+                    self.ignored_paths.append(relative_path)
+                else:
+                    statuses.append(NormalStatus(relative_path))
+            return statuses
+
+        # Tracked files without a status are unchanged. Even if recurse is
+        # False, the files below the children of path are listed, to tell
+        # tracked directories from untracked ones.
+        tracked = self._git_records(["git", "ls-files", "-z", "--", path])
+        for name in tracked:
+            if name in seen:
+                continue
+            if recurse or os.path.dirname(name) == relative_path:
+                statuses.append(NormalStatus(name))
+
+        directories = {}
+        for name in ignored_directories:
+            directories[name] = IgnoredStatus
+            self.ignored_paths.append(name)
 
-            # Check if directory includes modified files
-            for file in modified_files:
-                if ("/%s" % file).startswith(
-                    dirPattern
-                ):  # fix, when file startwith same prefix as directory, fix status for root repo path ""
-                    d_status = ModifiedStatus(d)
+        for name in untracked_directories:
+            directories.setdefault(name, UntrackedStatus)
+
+        for name in tracked:
+            for d in self._parent_directories(name, relative_path):
+                if d in directories:
                     break
+                directories[d] = NormalStatus
 
-            # Check if directory is ignored
-            for ignored_path in ignored_directories:
-                if ignored_path in d:
-                    d_status = IgnoredStatus(d)
+        # Directories without tracked files are untracked
+        for name in untracked:
+            for d in self._parent_directories(name, relative_path):
+                if d in directories:
                     break
-            statuses.append(d_status)
+                directories[d] = UntrackedStatus
+
+        # A changed tracked file makes the directories containing it modified,
+        # even those only thought untracked from the untracked files in them
+        untracked = set(untracked)
+        untracked_directories = set(untracked_directories)
+        for name in changed:
+            is_untracked = name in untracked
+            for d in self._parent_directories(name, relative_path):
+                status = directories.get(d)
+                if status is ModifiedStatus:
+                    break
+                if status is not UntrackedStatus or (
+                    not is_untracked and d not in untracked_directories
+                ):
+                    directories[d] = ModifiedStatus
+
+        for name in ignored + ignored_directories:
+            for d in self._parent_directories(name, relative_path):
+                if d in directories:
+                    break
+                directories[d] = NormalStatus
+
+        if not recurse:
+            # Directories without files are not listed by git, and git did
+            # not list the contents of path if it is untracked
+            if relative_path in untracked_directories:
+                status = UntrackedStatus
+            else:
+                status = NormalStatus
+
+            for name in os.listdir(path):
+                if name == ".git":
+                    continue
+
+                child = os.path.join(relative_path, name)
+                if os.path.isdir(os.path.join(path, name)):
+                    directories.setdefault(child, status)
+                elif status is UntrackedStatus and child not in seen:
+                    statuses.append(UntrackedStatus(child))
+
+        if relative_path not in directories:
+            directories[relative_path] = NormalStatus
+
+        for d, status in list(directories.items()):
+            statuses.append(status(d))
+
+        if not recurse:
+            statuses = [
+                st
+                for st in statuses
+                if relative_path in (st.path, os.path.dirname(st.path))
+            ]
 
         return statuses
 
-    def status_dulwich(self, path):
-        tree = self._get_tree_index()
+    def _index_stat(self, entry):
+        """
+        Returns the (ctime, mtime, ino, mode, size) stat data of an index
+        entry, with times as (seconds, nanoseconds), or None for a conflicted
+        entry.
+        """
+
+        if isinstance(entry, tuple) and not hasattr(entry, "mtime"):
+            # Older dulwich versions use plain tuples
+            (ctime, mtime, dev, ino, mode, uid, gid, size) = entry[:8]
+        elif hasattr(entry, "mtime"):
+            (ctime, mtime, ino, mode, size) = (
+                entry.ctime,
+                entry.mtime,
+                entry.ino,
+                entry.mode,
+                entry.size,
+            )
+        else:
+            return None
+
+        return (index_time(ctime), index_time(mtime), ino, mode, size)
+
+    def _index_sha(self, entry):
+        if isinstance(entry, tuple) and not hasattr(entry, "sha"):
+            return S(entry[8])
+        return S(entry.sha)
+
+    def _stat_matches_index(self, st, entry_stat, index_mtime):
+        """
+        Returns whether a file is known to match its index entry from its
+        stat data alone, like git's ie_match_stat().
+
+        A file whose index entry is not older than the index itself is
+        "racily clean": it may have changed again in the same timestamp
+        granularity after the index was written, without its stat data
+        showing it, so it has to be read.
+        """
+
+        if entry_stat is None:
+            return False
+
+        (ctime, mtime, ino, mode, size) = entry_stat
+        if index_mtime is None or mtime >= index_mtime:
+            return False
+
+        if (st.st_size & 0xFFFFFFFF) != size or (ino and st.st_ino != ino):
+            return False
+
+        if stat.S_IFMT(st.st_mode) != stat.S_IFMT(mode):
+            return False
+        if stat.S_ISREG(mode) and (st.st_mode & 0o100) != (mode & 0o100):
+            return False
+
+        for (entry_time, st_time) in (
+            (mtime, stat_time(st, "mtime")),
+            (ctime, stat_time(st, "ctime")),
+        ):
+            if entry_time[0] != st_time[0]:
+                return False
+            # Nanoseconds are not stored by every index writer
+            if entry_time[1] and entry_time[1] != st_time[1]:
+                return False
+
+        return True
+
+    def _get_ignore_matcher(self):
+        matcher = self.ignore_matcher
+        if matcher is None or matcher.root != self.repo.path:
+            # The matcher takes the lowest priority first, and git's own
+            # exclude file wins over core.excludesfile
+            global_files = [
+                os.path.expanduser(S(path))
+                for path in reversed(self.get_global_ignore_files())
+            ]
+            matcher = self.ignore_matcher = IgnoreMatcher(self.repo.path, global_files)
+        else:
+            matcher.refresh()
+
+        return matcher
+
+    def _read_working_tree(self, path, recurse, matcher, tracked_directories):
+        """
+        Like _read_directory_tree, but keeps the ignored files apart, and does
+        not walk into ignored directories unless they hold tracked files.
+
+        Returns (files, directories, ignored), where ignored holds the ignored
+        files and the topmost ignored directories.
+        """
+
+        files = []
+        directories = []
+        ignored = []
+
+        # Ignored directories that are walked anyway
+        ignored_directories = set()
+        top = self.get_relative_path(path)
+        if top != "." and matcher.is_ignored(top, True):
+            ignored_directories.add(top)
+
+        for root, dirs, filenames in os.walk(path, topdown=True):
+            if ".git" in dirs:
+                dirs.remove(".git")
+
+            if root == self.repo.path:
+                rel_root = ""
+            else:
+                rel_root = self.get_relative_path(root)
+            in_ignored = rel_root in ignored_directories
+            if in_ignored and rel_root not in tracked_directories:
+                # The path itself is ignored
+                ignored.append(rel_root)
+            else:
+                directories.append(rel_root)
+
+            for filename in filenames:
+                name = os.path.join(rel_root, filename)
+                if in_ignored or matcher.match(name):
+                    ignored.append(name)
+                else:
+                    files.append(name)
+
+            for d in list(dirs):
+                name = os.path.join(rel_root, d)
+                if in_ignored or matcher.match(name, True):
+                    if name in tracked_directories:
+                        ignored_directories.add(name)
+                    else:
+                        dirs.remove(d)
+                        ignored.append(name)
+
+            if not recurse:
+                directories.extend(os.path.join(rel_root, d) for d in dirs)
+                break
+
+        return (files, directories, ignored)
+
+    def _holds_untracked_files(self, name, matcher, tracked):
+        """Returns whether the directory name holds, at any depth, files that
+        are neither in tracked nor ignored."""
+        for root, dirs, filenames in os.walk(self.get_absolute_path(name)):
+            if ".git" in dirs:
+                dirs.remove(".git")
+
+            rel_root = self.get_relative_path(root)
+            for filename in filenames:
+                child = os.path.join(rel_root, filename)
+                if child not in tracked and not matcher.match(child):
+                    return True
+
+            dirs[:] = [
+                d for d in dirs if not matcher.match(os.path.join(rel_root, d), True)
+            ]
+
+        return False
+
+    def status_dulwich(self, path, recurse=True):
+        """
+        Gets the statuses of path, and of everything under it if it is a
+        directory, without running git: the working tree is compared with the
+        index and the HEAD tree read by dulwich.
+
+        Only files whose stat data differs from their index entry, or which
+        are racily clean (see _stat_matches_index), are read and hashed, and
+        only when their index entry matches HEAD. They are hashed together
+        at the end, in parallel.
+        """
+
+        relative_path = self.get_relative_path(path)
+        if relative_path == ".":
+            relative_path = ""
+
+        tree = self._get_tree_index(path=relative_path)
         index = self._get_index()
 
+        try:
+            index_mtime = stat_time(os.stat(self.repo.index_path()), "mtime")
+        except OSError:
+            index_mtime = None
+
+        def in_scope(name):
+            return (
+                not relative_path
+                or name == relative_path
+                or name.startswith(relative_path + "/")
+            )
+
+        entries = {}
+        for name in index:
+            decoded = S(name)
+            if in_scope(decoded):
+                entries[decoded] = index[name]
+
+        names = set(entries)
+        names.update(name for name in tree if in_scope(name))
+
+        # Directories holding files in the index or in HEAD
+        tracked_directories = set()
+        for name in names:
+            for d in self._parent_directories(name, relative_path):
+                if d in tracked_directories:
+                    break
+                tracked_directories.add(d)
+
+        matcher = self._get_ignore_matcher()
         if os.path.isdir(path):
-            (files, directories) = self._read_directory_tree(path)
-        else:
-            files = [self.get_relative_path(path)]
-            directories = []
 
-        files_hash = {}
-        for file in files:
-            files_hash[file] = True
+            (files, directories, ignored) = self._read_working_tree(
+                path, recurse, matcher, tracked_directories
+            )
+        elif matcher.is_ignored(relative_path):
+            (files, directories, ignored) = ([], [], [relative_path])
+        else:
+            (files, directories, ignored) = ([relative_path], [], [])
 
         statuses = []
-        # Calculate statuses for files in the current HEAD
-        modified_files = []
-        for name in tree:
-            try:
-                if index[name]:
-                    inIndex = True
-            except Exception as e:
-                inIndex = False
-
-            if inIndex:
-                absolute_path = self.get_absolute_path(name)
-                if os.path.isfile(absolute_path):
-                    # Cached, determine if modified or not
-                    blob = self._get_blob_from_file(absolute_path)
-                    if blob.id == tree[name][1]:
-                        statuses.append(NormalStatus(name))
-                    else:
-                        modified_files.append(name)
-                        statuses.append(ModifiedStatus(name))
-                else:
-                    modified_files.append(name)
-                    statuses.append(MissingStatus(name))
-            else:
-                modified_files.append(name)
-                statuses.append(RemovedStatus(name))
+        changed = []
 
-            try:
-                del files_hash[name]
-            except Exception as e:
-                pass
+        # Files to hash, mapped to their name and index sha
+        unknown = {}
 
-        # Calculate statuses for untracked files
-        for name, data in list(files_hash.items()):
-            try:
-                inTreeIndex = tree[name]
-            except Exception as e:
-                inTreeIndex = False
+        for name in names:
+            entry = entries.get(name)
+            if entry is None:
+                changed.append(name)
+                statuses.append(RemovedStatus(name))
+                continue
 
+            if name not in tree:
+                changed.append(name)
+                statuses.append(AddedStatus(name))
+                continue
+
+            absolute_path = self.get_absolute_path(name)
             try:
-                inIndex = index[name]
-            except Exception as e:
-                inIndex = False
+                st = os.lstat(absolute_path)
+            except OSError:
+                changed.append(name)
+                statuses.append(MissingStatus(name))
+                continue
 
-            if inIndex and not inTreeIndex:
-                modified_files.append(name)
-                statuses.append(AddedStatus(name))
+            entry_stat = self._index_stat(entry)
+            index_sha = self._index_sha(entry)
+            if entry_stat is None or index_sha != tree[name][1]:
+                # Conflicted or staged
+                modified = True
+            elif stat.S_ISDIR(st.st_mode):
+                # A submodule, its own status is not checked here
+                modified = False
+            elif self._stat_matches_index(st, entry_stat, index_mtime):
+                modified = False
+            elif stat.S_ISLNK(st.st_mode):
+                modified = hashing.symlink_blob_id(absolute_path) != index_sha
+            else:
+                unknown[absolute_path] = (name, index_sha)
                 continue
 
-            # Generate a list of appropriate ignore patterns
-            patterns = []
-            path_to_check = os.path.dirname(self.get_absolute_path(name))
-            while path_to_check != self.repo.path:
-                patterns += self.get_ignore_patterns_from_file(
-                    self.get_local_ignore_file(path_to_check)
-                )
-                path_to_check = os.path.split(path_to_check)[0]
+            if modified:
+                changed.append(name)
+                statuses.append(ModifiedStatus(name))
+            else:
+                statuses.append(NormalStatus(name))
 
-            patterns += self.get_ignore_patterns_from_file(
-                self.get_local_ignore_file(self.repo.path)
-            )
-            patterns += self.global_ignore_patterns
+        for absolute_path, sha in list(hashing.blob_ids(unknown).items()):
+            (name, index_sha) = unknown[absolute_path]
+            if sha != index_sha:
+                changed.append(name)
+                statuses.append(ModifiedStatus(name))
+            else:
+                statuses.append(NormalStatus(name))
 
-            if not self._ignore_file(patterns, os.path.basename(name)):
+        # Calculate statuses for untracked files
+        untracked_directories = set()
+        for name in files:
+            if name not in names:
+                changed.append(name)
                 statuses.append(UntrackedStatus(name))
-            else:
+                for d in self._parent_directories(name, relative_path):
+                    if d in untracked_directories:
+                        break
+                    untracked_directories.add(d)
+
+        for name in ignored:
+            if name not in names:
+                statuses.append(IgnoredStatus(name))
                 self.ignored_paths.append(name)
 
-        # Determine status of folders based on child contents
-        for d in directories:
-            d_status = NormalStatus(d)
-
-            for file in modified_files:
-                if os.path.join(d, os.path.basename(file)) == file:
-                    d_status = ModifiedStatus(d)
+        # Determine status of folders based on child contents. Directories
+        # without tracked files are untracked if they hold untracked files.
+        modified_directories = set()
+        if not recurse:
+            # Only the files directly in path were read, so look for untracked
+            # files further down, as git does
+            for d in directories:
+                if d == relative_path or d in untracked_directories:
+                    continue
+                if self._holds_untracked_files(d, matcher, names):
+                    changed.append(d)
+                    untracked_directories.update([d, relative_path])
+                    modified_directories.add(d)
+
+        for name in changed:
+            for d in self._parent_directories(name, relative_path):
+                if d in modified_directories:
                     break
+                modified_directories.add(d)
 
-            statuses.append(d_status)
+        for d in directories:
+            if d not in tracked_directories and d in untracked_directories:
+                statuses.append(UntrackedStatus(d))
+            elif d in modified_directories:
+                statuses.append(ModifiedStatus(d))
+            else:
+                statuses.append(NormalStatus(d))
+
+        if not recurse:
+            statuses = [
+                st
+                for st in statuses
+                if relative_path in (st.path, os.path.dirname(st.path))
+            ]
 
         return statuses
 
+    def set_status_engine(self, engine):
+        """
+        Chooses how statuses are found: STATUS_ENGINE_PORCELAIN runs git,
+        STATUS_ENGINE_DULWICH reads the repository in process.
+        """
+
+        if engine not in (STATUS_ENGINE_PORCELAIN, STATUS_ENGINE_DULWICH):
+            raise ValueError("Unknown status engine: %s" % engine)
+        self.status_engine = engine
+
     def get_all_ignore_file_paths(self, path):
         return self.ignored_paths
 
-    def status(self, path):
+    def status(self, path, recurse=True):
+        """
+        Returns the statuses of path and, if it is a directory, of the paths
+        under it, or only of its immediate children if recurse is False.
+        """
+
         # TODO - simply get this from the status implementation / avoid global state
         self.ignored_paths = []
 
-        return self.status_porcelain(path)
+        if self.status_engine == STATUS_ENGINE_DULWICH:
+            return self.status_dulwich(path, recurse)
+
+        version = self._get_git_version()
+        if version and version < PORCELAIN_V2_VERSION:
+            return self.status_porcelain(path, recurse)
+
+        return self.status_porcelain_v2(path, recurse)
 
     def log(self, path="", skip=0, limit=None, revision="", showtype="all"):
+        """
+        Returns a list of commits, as dicts with the LOG_FIELDS as keys. The
+        parents are a list of commit ids, and the dates are seconds since the
+        epoch. The files changed by the commits are not listed, they can be
+        fetched with changed_paths().
+        """
 
         cmd = [
             "git",
             "--no-pager",
             "log",
-            "--numstat",
-            "--parents",
-            "--pretty=fuller",
+            "-z",
+            "--format=%s" % LOG_FORMAT,
             "--date-order",
-            "--date=default",
-            "-m",
+            # Give the parents of the commits as simplified for the path, so
+            # that a path's log is connected
+            "--parents",
         ]
 
         if showtype == "all":
@@ -1814,92 +2414,115 @@ class GittyupClient(object):
         if path:
             cmd += ["--", path]
 
-        try:
-            (status, stdout, stderr) = GittyupCommand(
-                cmd, cwd=self.repo.path, notify=self.notify
-            ).execute()
-        except GittyupCommandError as e:
-            self.callback_notify(e)
-            return []
+        fields = self._stream(cmd, separator="\0")
 
         revisions = []
-        revision = {}
-        changed_file = {}
-        pattern_from = re.compile(r" \(from (.*)\)")
-        last_commitId = ""
-        for line in stdout:
-            if line == "":
-                continue
+        count = len(LOG_FIELDS)
+        for commit in fields:
+            values = [commit] + list(itertools.islice(fields, count - 1))
+            if len(values) < count:
+                break
+
+            revision = dict(zip(LOG_FIELDS, values))
+            revision["parents"] = revision["parents"].split()
+            revision["message"] = revision["message"].rstrip("\n")
+            revisions.append(revision)
 
-            if line[0:6] == "commit":
-                match = pattern_from.search(line)
-                commit_line = re.sub(" \(from.*\)", "", line).split(" ")
-                fromPath = ""
-                if match:
-                    fromPath = match.group(1)
-                if revision:
-                    if "changed_paths" not in revision:
-                        revision["changed_paths"] = {}
-                    if last_commitId != commit_line[1]:
-                        revisions.append(revision)
-                        revision = {}
-                    else:
-                        del revision["message"]
-
-                if len(fromPath) > 0:
-                    if "changed_paths" not in revision:
-                        revision["changed_paths"] = []
-                    changed_file = {
-                        "additions": "-",
-                        "removals": "-",
-                        "path": "Diff with parent : %s " % fromPath,
-                    }
-                    revision["changed_paths"].append(changed_file)
-
-                changed_file = {}
-                revision["commit"] = commit_line[1]
-                last_commitId = revision["commit"]
-                revision["parents"] = []
-                for parent in commit_line[2:]:
-                    revision["parents"].append(parent)
-            elif line[0:7] == "Author:":
-                revision["author"] = line[7:].strip()
-            elif line[0:11] == "AuthorDate:":
-                revision["author_date"] = line[11:].strip()
-            elif line[0:7] == "Commit:":
-                revision["committer"] = line[7:].strip()
-            elif line[0:11] == "CommitDate:":
-                revision["commit_date"] = line[11:].strip()
-            elif line[0:4] == "    ":
-                message = line[4:]
-                if "message" not in revision:
-                    revision["message"] = ""
+        return revisions
+
+    def changed_paths(self, commits, path=""):
+        """
+        Returns a dict mapping the given commit ids to the files they changed,
+        as lists of dicts with additions, removals and path. The changes of a
+        merge commit from each of its parents follow one another, each after
+        an entry naming the parent.
+
+        If path is given, only the files changed under it are listed, as in
+        the log of path.
+        """
+
+        if path == self.repo.path:
+            path = ""
+
+        changes = {}
+        missing = []
+        with self.changed_paths_lock:
+            for commit in commits:
+                paths = self.changed_paths_cache.get((path, commit))
+                if paths is None:
+                    missing.append(commit)
                 else:
-                    revision["message"] += "\n"
+                    changes[commit] = paths
 
-                revision["message"] = revision["message"] + message
-            elif line[0].isdigit() or line[0] in "-":
-                file_line = line.split("\t")
-                if "changed_paths" not in revision:
-                    revision["changed_paths"] = []
+        if not missing:
+            return changes
+
+        cmd = [
+            "git",
+            "--no-pager",
+            "show",
+            "-m",
+            "--numstat",
+            "--pretty=oneline",
+            "--no-abbrev-commit",
+            "--no-color",
+        ] + missing
+        if path:
+            cmd += ["--", path]
+
+        # A failed command must not leave its partial result in the cache
+        stdout = GittyupCommand(cmd, cwd=self.repo.path, notify=self.notify).stream(
+            check=True
+        )
+        try:
+            paths = None
+            for line in stdout:
+                header = CHANGED_PATHS_HEADER.match(line)
+                if header:
+                    (commit, parent) = header.group(1, 2)
+                    # With -m, a merge commit comes once for each parent it
+                    # differs from under path
+                    paths = changes.setdefault(commit, [])
+                    if parent:
+                        paths.append(
+                            {
+                                "additions": "-",
+                                "removals": "-",
+                                "path": "Diff with parent : %s " % parent,
+                            }
+                        )
+                    continue
 
-                if len(file_line) == 3:
-                    changed_file = {
+                file_line = line.split("\t")
+                if paths is None or len(file_line) != 3:
+                    continue
+
+                changed_path = self.string_unescape(file_line[2])
+                if changed_path[0] == '"' and changed_path[-1] == '"':
+                    changed_path = changed_path[1:-1]
+                paths.append(
+                    {
                         "additions": file_line[0],
                         "removals": file_line[1],
-                        "path": self.string_unescape(file_line[2]),
+                        "path": changed_path,
                     }
-                    if (
-                        changed_file["path"][0] == '"'
-                        and changed_file["path"][-1] == '"'
-                    ):
-                        changed_file["path"] = changed_file["path"][1:-1]
-                    revision["changed_paths"].append(changed_file)
+                )
+        except GittyupCommandError as e:
+            # Do not cache what a failed command left out
+            self.callback_notify(e)
+            return changes
 
-        if revision:
-            revisions.append(revision)
+        with self.changed_paths_lock:
+            for commit in missing:
+                # A commit that changed nothing under path is not listed
+                changes.setdefault(commit, [])
+                self.changed_paths_cache[(path, commit)] = changes[commit]
 
-        return revisions
+            while len(self.changed_paths_cache) > CHANGED_PATHS_CACHE_SIZE:
+                oldest = next(iter(self.changed_paths_cache))
+                del self.changed_paths_cache[oldest]
+
+        return changes
 
     def annotate(self, path, revision_obj="HEAD"):
         """
@@ -1917,13 +2540,7 @@ class GittyupClient(object):
 
         cmd = ["git", "annotate", "-l", revision_obj, relative_path]
 
-        try:
-            (status, stdout, stderr) = GittyupCommand(
-                cmd, cwd=self.repo.path, notify=self.notify, cancel=self.get_cancel()
-            ).execute()
-        except GittyupCommandError as e:
-            self.callback_notify(e)
-            stdout = []
+        stdout = self._stream(cmd, cancel=self.get_cancel())
 
         returner = []
         for line in stdout:
@@ -1965,17 +2582,71 @@ class GittyupClient(object):
             revision_obj = "HEAD"
 
         relative_path = self.get_relative_path(path)
+        name = "%s:%s" % (revision_obj, relative_path)
+
+        if "\n" in name:
+            # Cannot be asked of git cat-file
+            cmd = ["git", "show", name]
+            stdout = self._stream(cmd, cancel=self.get_cancel())
+
+            return "\n".join(stdout)
+
+        data = self._cat_file(relative_path, revision_obj)
+        if data is None:
+            return ""
+        return S(data)
+
+    def _cat_file(self, relative_path, revision_obj):
+        """
+        Returns the contents of a file at a given revision, as bytes read by
+        the repository's cat-file processes, or None if it cannot be read.
+        """
 
-        cmd = ["git", "show", "%s:%s" % (revision_obj, relative_path)]
         try:
-            (status, stdout, stderr) = GittyupCommand(
-                cmd, cwd=self.repo.path, notify=self.notify, cancel=self.get_cancel()
-            ).execute()
-        except GittyupCommandError as e:
+            result = catfile.pool_for(self.repo.path).read(
+                "%s:%s" % (revision_obj, relative_path)
+            )
+        except (IOError, OSError, ValueError) as e:
             self.callback_notify(e)
-            stdout = []
+            return None
 
-        return "\n".join(stdout)
+        if result is None:
+            self.callback_notify(
+                "fatal: path '%s' does not exist in '%s'"
+                % (relative_path, revision_obj)
+            )
+            return None
+
+        return result[2]
+
+    def object_info(self, path, revision_obj="HEAD"):
+        """
+        Returns the type (eg. "blob" or "tree") and size of a path at a given
+        revision, or None if it does not exist there.
+
+        @type   path: string
+        @param  path: The absolute path to a file
+
+        @type   revision_obj: string
+        @param  revision_obj: HEAD or a sha1 hash
+
+        """
+
+        relative_path = self.get_relative_path(path)
+        if relative_path == ".":
+            relative_path = ""
+
+        try:
+            result = catfile.pool_for(self.repo.path).info(
+                "%s:%s" % (revision_obj, relative_path)
+            )
+        except (IOError, OSError, ValueError) as e:
+            self.callback_notify(e)
+            return None
+
+        if result is None:
+            return None
+        return (result[1], result[2])
 
     def diff(
         self, path1, revision_obj1, path2=None, revision_obj2=None, summarize=False
@@ -2017,13 +2688,7 @@ class GittyupClient(object):
         if relative_path2 and relative_path2 != relative_path1:
             cmd += [relative_path2]
 
-        try:
-            (status, stdout, stderr) = GittyupCommand(
-                cmd, cwd=self.repo.path, notify=self.notify, cancel=self.get_cancel()
-            ).execute()
-        except GittyupCommandError as e:
-            self.callback_notify(e)
-            stdout = []
+        stdout = self._stream(cmd, cancel=self.get_cancel())
 
         return "".join(x + "\n" for x in stdout)
 
@@ -2054,12 +2719,28 @@ class GittyupClient(object):
 
         """
 
+        mkdir_p(dest_path)
+
+        # A single file, eg. one opened at some revision, is read through the
+        # cat-file processes rather than made into an archive
+        relative_path = self.get_relative_path(path)
+        info = None
+        if "\n" not in relative_path:
+            info = self.object_info(path, revision)
+        if info is not None and info[0] == "blob":
+            data = self._cat_file(relative_path, revision)
+            if data is not None:
+                file_path = os.path.join(dest_path, relative_path)
+                mkdir_p(os.path.dirname(file_path))
+                with open(file_path, "wb") as f:
+                    f.write(data)
+                self.notify("%s at %s exported to %s" % (path, revision, dest_path))
+                return ""
+
         tmp_file = get_tmp_path("rabbitvcs-git-export.tar")
         cmd1 = ["git", "archive", "--format", "tar", "-o", tmp_file, revision, path]
         cmd2 = ["tar", "-xf", tmp_file, "-C", dest_path]
 
-        mkdir_p(dest_path)
-
         try:
             (status, stdout, stderr) = GittyupCommand(
                 cmd1, cwd=self.repo.path, notify=self.notify, cancel=self.get_cancel()
@@ -9,12 +9,22 @@ import fcntl
 import select
 import codecs
 import os
+import tempfile
+import threading
+import time
 
 from .exceptions import GittyupCommandError
 
 from rabbitvcs.util.strings import *
 
 
+# Seconds between checks of whether a command without output was cancelled
+CANCEL_POLL_INTERVAL = 0.1
+
+# Bytes read at once by GittyupCommand.stream()
+STREAM_CHUNK_SIZE = 1 << 16
+
+
 def notify_func(data):
     pass
 
@@ -24,9 +34,12 @@ def cancel_func():
 
 
 class GittyupCommand(object):
-    def __init__(self, command, cwd=None, notify=None, cancel=None):
+    def __init__(self, command, cwd=None, notify=None, cancel=None, env=None):
         self.command = command
 
+        # Environment variables set for the command on top of the usual ones
+        self.env = env or {}
+
         self.notify = notify_func
         if notify:
             self.notify = notify
@@ -39,6 +52,9 @@ class GittyupCommand(object):
         if not self.cwd:
             self.cwd = os.getcwd()
 
+        # The exit status of the last command run by stream()
+        self.returncode = None
+
     def get_lines(self, val):
         returner = []
         lines = val.rstrip("\n").split("\n")
@@ -47,23 +63,143 @@ class GittyupCommand(object):
 
         return returner
 
-    def execute(self):
+    def _kill_when_cancelled(self, proc):
+        # Commands like "git status" print nothing until they are done, so
+        # checking for cancellation between output lines is not enough
+        while proc.poll() is None:
+            if self.cancel():
+                proc.kill()
+                break
+            time.sleep(CANCEL_POLL_INTERVAL)
+
+    def _start(self, stderr):
         env = os.environ.copy()
         env["LANG"] = "C"
         env["PYTHONIOENCODING"] = "UTF-8"
         env["GIT_TERMINAL_PROMPT"] = "0"
         env["GIT_SSL_CERT_PASSWORD_PROTECTED"] = ""
+        env.update(self.env)
         proc = subprocess.Popen(
             self.command,
             cwd=self.cwd,
             stdin=None,
-            stderr=subprocess.STDOUT,
+            stderr=stderr,
             stdout=subprocess.PIPE,
             env=env,
             close_fds=True,
             preexec_fn=os.setsid,
         )
 
+        if self.cancel is not cancel_func:
+            watchdog = threading.Thread(target=self._kill_when_cancelled, args=(proc,))
+            watchdog.daemon = True
+            watchdog.start()
+
+        return proc
+
+    def execute_raw(self):
+        """
+        Runs the command and returns (returncode, stdout, stderr), with the
+        output as bytes, for commands whose output is not line based (eg.
+        NUL separated with -z).
+        """
+
+        proc = self._start(subprocess.PIPE)
+        (stdout, stderr) = proc.communicate()
+        return (proc.returncode, stdout, stderr)
+
+    def stream(self, separator=None, chunk_size=STREAM_CHUNK_SIZE, check=False):
+        """
+        Runs the command and yields its output as it arrives, instead of
+        collecting it like execute() does.
+
+        Yields lines without their line endings, with stderr mixed in, or if
+        separator is given (eg. "\0" for commands run with -z), the records
+        it separates, without stderr. Output is read in chunks of up to
+        chunk_size bytes, and whether the command was cancelled is checked
+        every CANCEL_POLL_INTERVAL seconds. The command is killed if the
+        caller stops iterating early.
+
+        Like execute(), a command exiting with a non-zero status is not an
+        error by itself: its exit status is left in self.returncode. With
+        check=True, GittyupCommandError is raised once the output is exhausted
+        if the command failed, with its stderr (or its last line of output)
+        as the message.
+        """
+
+        stderr = None
+        if separator is None:
+            proc = self._start(subprocess.STDOUT)
+            sep = b"\n"
+        else:
+            # A file rather than a pipe, so that a command writing a lot to
+            # stderr does not block while we only read stdout
+            stderr = tempfile.TemporaryFile()
+            proc = self._start(stderr)
+            sep = S(separator).bytes()
+
+        fd = proc.stdout.fileno()
+
+        # The chunks read of the record not complete yet, joined once it is
+        pending = []
+        last_record = ""
+        last_check = time.time()
+        try:
+            while True:
+                chunk = os.read(fd, chunk_size)
+                if not chunk:
+                    break
+
+                pending.append(chunk)
+                if sep not in chunk:
+                    continue
+
+                records = b"".join(pending).split(sep)
+                pending = [records.pop()]
+                for record in records:
+                    if separator is None:
+                        record = record.rstrip(b"\r")
+                    last_record = record = S(record)
+                    self.notify(record)
+                    yield record
+
+                if time.time() - last_check >= CANCEL_POLL_INTERVAL:
+                    last_check = time.time()
+                    if self.cancel():
+                        proc.kill()
+                        return
+
+            record = b"".join(pending)
+            if record:
+                last_record = record = S(
+                    record.rstrip(b"\r") if separator is None else record
+                )
+                self.notify(record)
+                yield record
+
+            proc.stdout.close()
+            self.returncode = proc.wait()
+            if check and self.returncode != 0:
+                message = last_record
+                if stderr is not None:
+                    stderr.seek(0)
+                    message = S(stderr.read()).strip()
+                raise GittyupCommandError(
+                    message
+                    or "%s exited with status %i"
+                    % (" ".join(self.command), self.returncode)
+                )
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+            if stderr is not None:
+                stderr.close()
+
+    def execute(self):
+        proc = self._start(subprocess.STDOUT)
+
         out = codecs.getreader(UTF8_ENCODING)(proc.stdout, SURROGATE_ESCAPE)
         stdout = []
 
@@ -0,0 +1,94 @@
+from __future__ import absolute_import
+
+#
+# hashing.py
+#
+
+"""
+Computes git blob ids of working tree files.
+
+Files are read in chunks of HASH_CHUNK_SIZE bytes, so big files are never
+held in memory, and several files are hashed at once by a pool of threads
+(reading files and hashing big buffers both release the GIL).
+"""
+
+import os
+import hashlib
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+HASH_CHUNK_SIZE = 1 << 16
+
+# Files hashed at once by blob_ids()
+MAX_HASH_WORKERS = 8
+
+
+def hash_workers():
+    try:
+        return max(1, min(MAX_HASH_WORKERS, multiprocessing.cpu_count()))
+    except NotImplementedError:
+        return 1
+
+
+def _blob_hash(size):
+    sha = hashlib.sha1()
+    sha.update(("blob %i\0" % size).encode("ascii"))
+    return sha
+
+
+def blob_id(path):
+    """
+    Returns the hex id of the blob git would store for the file at path, or
+    None if it cannot be read or changes while it is read.
+    """
+
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            sha = _blob_hash(size)
+            read = 0
+            while True:
+                chunk = f.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                read += len(chunk)
+                sha.update(chunk)
+    except (IOError, OSError):
+        return None
+
+    if read != size:
+        return None
+    return sha.hexdigest()
+
+
+def symlink_blob_id(path):
+    """Returns the hex id of the blob git would store for a symbolic link."""
+    try:
+        target = os.readlink(path)
+    except OSError:
+        return None
+
+    if not isinstance(target, bytes):
+        target = os.fsencode(target)
+
+    sha = _blob_hash(len(target))
+    sha.update(target)
+    return sha.hexdigest()
+
+
+def blob_ids(paths):
+    """
+    Returns a dict mapping each of the given file paths to its blob id (see
+    blob_id), hashing files in parallel.
+    """
+
+    paths = list(paths)
+    if len(paths) < 2:
+        return dict((path, blob_id(path)) for path in paths)
+
+    pool = ThreadPool(min(hash_workers(), len(paths)))
+    try:
+        return dict(zip(paths, pool.map(blob_id, paths)))
+    finally:
+        pool.close()
+        pool.join()
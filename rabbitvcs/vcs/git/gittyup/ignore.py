@@ -0,0 +1,222 @@
+from __future__ import absolute_import
+
+#
+# ignore.py
+#
+
+"""
+Decides which paths of a working tree git ignores.
+
+Each ignore file is parsed once, its patterns compiled to regular
+expressions, and kept until the file's modification time or size changes.
+Files are only checked for changes again after refresh(), which is meant to
+be called once per status check.
+
+Patterns follow gitignore(5): "#" comments, "!" negation, trailing "/" for
+directories only, patterns containing a "/" anchored to the directory of
+their file, and "**" matching any number of directories. Later patterns
+win over earlier ones, and deeper ignore files over shallower ones. A path
+inside an ignored directory is ignored whatever the patterns say about it.
+"""
+
+import os
+import re
+
+from rabbitvcs.util.strings import S
+
+
+class IgnorePattern(object):
+    __slots__ = ("regex", "negated", "directory_only")
+
+    def __init__(self, regex, negated, directory_only):
+        self.regex = regex
+        self.negated = negated
+        self.directory_only = directory_only
+
+    def matches(self, name, is_directory):
+        if self.directory_only and not is_directory:
+            return False
+        return self.regex.match(name) is not None
+
+
+def translate(pattern):
+    """Returns the regular expression for a gitignore glob."""
+    i = 0
+    n = len(pattern)
+    result = []
+    while i < n:
+        at_start = i == 0 or pattern[i - 1] == "/"
+        if at_start and pattern.startswith("**/", i):
+            result.append("(?:.*/)?")
+            i += 3
+            continue
+        if at_start and pattern.startswith("**", i) and i + 2 == n:
+            result.append(".*")
+            i += 2
+            continue
+
+        c = pattern[i]
+        i += 1
+        if c == "*":
+            result.append("[^/]*")
+        elif c == "?":
+            result.append("[^/]")
+        elif c == "\\" and i < n:
+            result.append(re.escape(pattern[i]))
+            i += 1
+        elif c == "[":
+            j = i
+            if j < n and pattern[j] in "!^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            j = pattern.find("]", j)
+            if j == -1:
+                result.append(re.escape(c))
+                continue
+
+            chars = pattern[i:j].replace("\\", "\\\\")
+            i = j + 1
+            if chars[0:1] in ("!", "^"):
+                result.append("[^/%s]" % chars[1:])
+            else:
+                result.append("[%s]" % chars)
+        else:
+            result.append(re.escape(c))
+
+    return "".join(result)
+
+
+def compile_pattern(line, base=""):
+    """
+    Compiles a line of an ignore file found in the directory base (relative
+    to the working tree root), or returns None if it holds no pattern.
+    """
+
+    line = line.rstrip("\r\n")
+    if not line or line.startswith("#"):
+        return None
+
+    # Trailing spaces are ignored unless escaped
+    while line.endswith(" ") and not line.endswith("\\ "):
+        line = line[:-1]
+
+    negated = line.startswith("!")
+    if negated:
+        line = line[1:]
+
+    directory_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+
+    if "/" in line:
+        # Anchored to base
+        prefix = ""
+        line = line.lstrip("/")
+    else:
+        prefix = "(?:.*/)?"
+
+    if base:
+        prefix = re.escape(base + "/") + prefix
+
+    regex = re.compile("^%s%s$" % (prefix, translate(line)), re.DOTALL)
+    return IgnorePattern(regex, negated, directory_only)
+
+
+class IgnoreMatcher(object):
+    """
+    Matches paths relative to the root of a working tree against its
+    ignore files.
+    """
+
+    def __init__(self, root, global_files=()):
+        """
+        @type   root: string
+        @param  root: The root of the working tree.
+
+        @type   global_files: list
+        @param  global_files: Ignore files that apply to the whole working
+            tree, lowest priority first (eg. $GIT_DIR/info/exclude).
+
+        """
+
+        self.root = root
+        self.global_files = list(global_files)
+
+        # Ignore file paths mapped to (stamp, patterns)
+        self.files = {}
+
+        # Directories mapped to the patterns for their entries, since the
+        # last refresh
+        self.directories = {}
+
+    def refresh(self):
+        """Makes the next matches notice changed ignore files."""
+        self.directories = {}
+
+    def _patterns(self, path, base):
+        try:
+            st = os.stat(path)
+            stamp = (st.st_mtime, st.st_size)
+        except OSError:
+            stamp = None
+
+        cached = self.files.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        patterns = []
+        if stamp is not None:
+            try:
+                with open(path, "rb") as f:
+                    lines = S(f.read()).split("\n")
+            except IOError:
+                lines = []
+            for line in lines:
+                pattern = compile_pattern(line, base)
+                if pattern is not None:
+                    patterns.append(pattern)
+
+        self.files[path] = (stamp, patterns)
+        return patterns
+
+    def _patterns_for(self, directory):
+        """Returns the patterns applying to the entries of directory, in
+        order of increasing priority."""
+        patterns = self.directories.get(directory)
+        if patterns is not None:
+            return patterns
+
+        if directory:
+            patterns = list(self._patterns_for(os.path.dirname(directory)))
+        else:
+            patterns = []
+            for path in self.global_files:
+                patterns += self._patterns(path, "")
+
+        patterns += self._patterns(
+            os.path.join(self.root, directory, ".gitignore"), directory
+        )
+
+        self.directories[directory] = patterns
+        return patterns
+
+    def match(self, name, is_directory=False):
+        """
+        Returns whether the patterns ignore name, without looking at the
+        directories containing it.
+        """
+
+        for pattern in reversed(self._patterns_for(os.path.dirname(name))):
+            if pattern.matches(name, is_directory):
+                return not pattern.negated
+        return False
+
+    def is_ignored(self, name, is_directory=False):
+        """Returns whether name, relative to the root, is ignored."""
+        parts = name.split("/")
+        for i in range(1, len(parts)):
+            if self.match("/".join(parts[:i]), True):
+                return True
+        return self.match(name, is_directory)
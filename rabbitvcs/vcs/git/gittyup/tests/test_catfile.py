@@ -0,0 +1,38 @@
+from __future__ import absolute_import
+
+#
+# tests/test_catfile.py
+#
+
+import unittest
+
+from rabbitvcs.vcs.git.gittyup.catfile import CatFilePool
+
+from .util import RepositoryTestCase
+
+
+class TestCatFile(RepositoryTestCase):
+    def populate(self):
+        self.write("file", content=b"line\n\0binary")
+        self.git("add", "file")
+
+    def setUp(self):
+        RepositoryTestCase.setUp(self)
+        self.pool = CatFilePool(self.path)
+        self.addCleanup(self.pool.close)
+
+    def test_read(self):
+        (sha, kind, data) = self.pool.read(":file")
+        self.assertEqual(kind, "blob")
+        self.assertEqual(data, b"line\n\0binary")
+        self.assertEqual(self.pool.info(":file")[1:], ("blob", 12))
+        self.assertEqual(self.pool.read(":missing"), None)
+        self.assertEqual(self.pool.read(":file")[2], data)
+
+        # A newline would end the request early
+        self.assertRaises(ValueError, self.pool.read, ":file\n:file")
+        self.assertEqual(self.pool.read(":file")[2], data)
+
+
+if __name__ == "__main__":
+    unittest.main()
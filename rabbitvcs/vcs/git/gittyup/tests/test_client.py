@@ -0,0 +1,325 @@
+from __future__ import absolute_import
+
+#
+# tests/test_client.py
+#
+
+import os
+import unittest
+
+from rabbitvcs.vcs.git.gittyup.client import GittyupClient, TREE_INDEX_CACHE_SIZE
+
+from .util import IDENTITY, RepositoryTestCase
+
+
+class ClientTestCase(RepositoryTestCase):
+    """Runs each test in a new repository, with a client for it."""
+
+    def setUp(self):
+        RepositoryTestCase.setUp(self)
+        self.client = GittyupClient(self.path)
+        self.addCleanup(self.client.close)
+
+
+class TestStatusEngines(ClientTestCase):
+    ENGINES = ["status_porcelain", "status_porcelain_v2", "status_dulwich"]
+    maxDiff = None
+
+    def populate(self):
+        self.write("top", "src/lib/f", "src/lib/g", "t2/x/y", "ign/z")
+        self.write("gone/a", "gone/b", "staged/old", "staged/removed")
+        self.write(".gitignore", content="*.o\n")
+        self.commit("initial")
+
+        self.write("src/lib/f", content="changed\n")
+        self.write("t2/sub/new", "untr/n", "untr/deep/m", "ign/z.o", "top.o")
+
+        # Missing, staged and removed files
+        os.remove(self.abspath("gone/a"))
+        self.write("staged/added")
+        self.write("staged/old", content="changed\n")
+        self.git("add", "staged/added", "staged/old")
+        self.git("rm", "-q", "staged/removed")
+
+    def statuses(self, engine, path, recurse):
+        """Returns the statuses of an engine as a dict of paths and status
+        names, keeping only path and its immediate children if recurse is
+        False."""
+        relative_path = self.client.get_relative_path(path)
+        if relative_path == ".":
+            relative_path = ""
+
+        self.client.ignored_paths = []
+        statuses = {}
+        for st in getattr(self.client, engine)(path, recurse=recurse):
+            name = st.path.rstrip("/")
+            if recurse or relative_path in (name, os.path.dirname(name)):
+                statuses[name] = st.identifier
+        return statuses
+
+    def assertEnginesAgree(self, path, recurse):
+        expected = self.statuses("status_porcelain", path, recurse)
+        for engine in self.ENGINES[1:]:
+            self.assertEqual(
+                self.statuses(engine, path, recurse), expected, (engine, path, recurse)
+            )
+        return expected
+
+    def test_recurse(self):
+        for name in ("", "src", "t2", "untr", "untr/deep", "src/lib/f", "gone/a"):
+            self.assertEnginesAgree(self.abspath(name), True)
+
+        statuses = self.assertEnginesAgree(self.path, True)
+        self.assertEqual(statuses["gone/a"], "missing")
+        self.assertEqual(statuses["gone"], "modified")
+        self.assertEqual(statuses["staged/added"], "added")
+        self.assertEqual(statuses["staged/old"], "modified")
+        self.assertEqual(statuses["staged/removed"], "removed")
+        self.assertEqual(statuses["untr/deep"], "untracked")
+        self.assertEqual(statuses["ign/z.o"], "ignored")
+
+    def test_directories(self):
+        # Directories are modified if they hold changes, and untracked if they
+        # only hold untracked files
+        statuses = self.assertEnginesAgree(self.path, True)
+        directories = dict(
+            (name, status)
+            for (name, status) in statuses.items()
+            if os.path.isdir(self.abspath(name))
+        )
+        self.assertEqual(
+            directories,
+            {
+                "": "modified",
+                "gone": "modified",
+                "ign": "normal",
+                "src": "modified",
+                "src/lib": "modified",
+                "staged": "modified",
+                "t2": "modified",
+                "t2/sub": "untracked",
+                "t2/x": "normal",
+                "untr": "untracked",
+                "untr/deep": "untracked",
+            },
+        )
+
+    def test_children(self):
+        for name in ("", "src", "src/lib", "t2", "t2/sub", "untr", "ign"):
+            self.assertEnginesAgree(self.abspath(name), False)
+
+        statuses = self.assertEnginesAgree(self.path, False)
+        self.assertEqual(statuses["src"], "modified")
+        self.assertEqual(statuses["t2"], "modified")
+        self.assertEqual(statuses["untr"], "untracked")
+        self.assertEqual(statuses["top"], "normal")
+
+        statuses = self.assertEnginesAgree(self.abspath("src"), False)
+        self.assertEqual(statuses["src/lib"], "modified")
+
+    def test_index_unchanged(self):
+        # Touching a file leaves stale stat data in the index, which git
+        # status refreshes if it may take optional locks
+        index = os.path.join(self.path, ".git", "index")
+        os.utime(self.abspath("top"), (0, 0))
+        stamp = os.stat(index).st_mtime_ns
+
+        for engine in self.ENGINES:
+            self.statuses(engine, self.path, True)
+        self.assertEqual(os.stat(index).st_mtime_ns, stamp)
+
+
+class TestTreeIndex(ClientTestCase):
+    def populate(self):
+        self.write("a", "dir/b", "dir/sub/c")
+        self.commit("first")
+
+    def test_tree_index(self):
+        tree_index = self.client._get_tree_index()
+        self.assertEqual(sorted(tree_index), ["a", "dir/b", "dir/sub/c"])
+        self.assertEqual(tree_index["a"][1], self.git("rev-parse", "HEAD:a").strip())
+        self.assertTrue(self.client._get_tree_index() is tree_index)
+
+    def test_path(self):
+        self.assertEqual(
+            sorted(self.client._get_tree_index(path="dir")), ["dir/b", "dir/sub/c"]
+        )
+        self.assertEqual(
+            sorted(self.client._get_tree_index(path="dir/sub/c")), ["dir/sub/c"]
+        )
+        self.assertEqual(self.client._get_tree_index(path="missing"), {})
+        self.assertEqual(self.client._get_tree_index(path="a/b"), {})
+
+    def test_new_commit(self):
+        first = self.client._get_tree_index()
+        self.write("d")
+        self.commit("second")
+        self.assertEqual(
+            sorted(self.client._get_tree_index()), ["a", "d", "dir/b", "dir/sub/c"]
+        )
+        self.assertEqual(sorted(first), ["a", "dir/b", "dir/sub/c"])
+
+    def test_size(self):
+        for i in range(TREE_INDEX_CACHE_SIZE + 2):
+            self.client._get_tree_index(path="dir%i" % i)
+        self.assertEqual(len(self.client.tree_indexes), TREE_INDEX_CACHE_SIZE)
+
+
+class TestIgnoreFiles(ClientTestCase):
+    def populate(self):
+        self.write(".git/excludes", content="*.log\n")
+        self.git("config", "core.excludesfile", self.abspath(".git/excludes"))
+
+    def is_ignored(self, name):
+        return self.client._get_ignore_matcher().is_ignored(name)
+
+    def test_order(self):
+        # .git/info/exclude comes after core.excludesfile
+        self.assertTrue(self.is_ignored("keep.log"))
+        self.write(".git/info/exclude", content="!keep.log\n")
+        self.client.ignore_matcher = None
+        self.assertFalse(self.is_ignored("keep.log"))
+        self.assertTrue(self.is_ignored("other.log"))
+
+        self.write(".git/excludes", content="!keep.log\n")
+        self.write(".git/info/exclude", content="*.log\n")
+        self.client.ignore_matcher = None
+        self.assertTrue(self.is_ignored("keep.log"))
+
+
+class TestExport(ClientTestCase):
+    def populate(self):
+        self.write("dir/file", content=b"first\n\0binary")
+        self.first = self.commit("first")
+        self.write("dir/file", content="second\n")
+        self.commit("second")
+
+    def exported(self, path, revision):
+        dest = os.path.join(self.path, ".git", "export")
+        self.client.export(self.abspath(path), dest, revision)
+        with open(os.path.join(dest, "dir", "file"), "rb") as f:
+            return f.read()
+
+    def test_file(self):
+        self.assertEqual(self.client.object_info(self.abspath("dir"))[0], "tree")
+        self.assertEqual(
+            self.client.object_info(self.abspath("dir/file"), self.first),
+            ("blob", 13),
+        )
+        self.assertEqual(self.exported("dir/file", self.first), b"first\n\0binary")
+
+    def test_directory(self):
+        self.assertEqual(self.exported("dir", "HEAD"), b"second\n")
+
+
+class TestLog(ClientTestCase):
+    def populate(self):
+        self.commits = []
+        for content in ("first\n", "second\n", "third\n"):
+            self.write("a", "b", content=content)
+            self.commits.append(self.commit(content))
+            self.write("b", content=content * 2)
+            self.commits.append(self.commit(content))
+
+    def test_log(self):
+        revisions = self.client.log()
+        self.assertEqual(
+            [revision["commit"] for revision in revisions], self.commits[::-1]
+        )
+        self.assertEqual(revisions[0]["parents"], [self.commits[-2]])
+        self.assertEqual(revisions[-1]["parents"], [])
+
+    def test_path(self):
+        # The parents are those in the log of the path
+        revisions = self.client.log(path=self.abspath("a"))
+        self.assertEqual(
+            [revision["commit"] for revision in revisions], self.commits[4::-2]
+        )
+        self.assertEqual(
+            [revision["parents"] for revision in revisions],
+            [[self.commits[2]], [self.commits[0]], []],
+        )
+
+    def test_empty(self):
+        # git log of the current branch fails without commits, which is not
+        # worth notifying about
+        client = GittyupClient(self.abspath("empty"), create=True)
+        self.addCleanup(client.close)
+        notified = []
+        client.set_callback_notify(notified.append)
+        self.assertEqual(client.log(showtype="branch"), [])
+        self.assertEqual(notified, [])
+
+
+class TestChangedPaths(ClientTestCase):
+    def populate(self):
+        self.write("a", "dir/b")
+        self.first = self.commit("first")
+        self.write("a", "dir/b", "dir/c", content="second\n")
+        self.second = self.commit("second")
+        self.write("a", content="third\n")
+        self.third = self.commit("third")
+
+    def paths(self, changes):
+        return dict(
+            (commit, sorted(change["path"] for change in paths))
+            for (commit, paths) in changes.items()
+        )
+
+    def test_changed_paths(self):
+        commits = [self.first, self.second, self.third]
+        self.assertEqual(
+            self.paths(self.client.changed_paths(commits)),
+            {
+                self.first: ["a", "dir/b"],
+                self.second: ["a", "dir/b", "dir/c"],
+                self.third: ["a"],
+            },
+        )
+
+    def test_path(self):
+        commits = [self.first, self.second, self.third]
+        for path in (self.abspath("dir"), "dir"):
+            self.assertEqual(
+                self.paths(self.client.changed_paths(commits, path)),
+                {
+                    self.first: ["dir/b"],
+                    self.second: ["dir/b", "dir/c"],
+                    self.third: [],
+                },
+            )
+
+        # The paths of the whole repository are cached apart
+        self.assertEqual(
+            self.paths(self.client.changed_paths([self.third], self.path)),
+            {self.third: ["a"]},
+        )
+
+    def test_merge(self):
+        # The side branch changes dir/c, the merged one a
+        self.git("checkout", "-q", "-b", "side", self.second)
+        self.write("dir/c", content="side\n")
+        side = self.commit("side")
+        self.git("checkout", "-q", "-")
+        self.git(*(IDENTITY + ("merge", "-q", "--no-edit", "side")))
+        merge = self.git("rev-parse", "HEAD").strip()
+
+        def paths(path):
+            changes = self.client.changed_paths([merge], path)[merge]
+            return [change["path"] for change in changes]
+
+        self.assertEqual(
+            paths(""),
+            [
+                "Diff with parent : %s " % self.third,
+                "dir/c",
+                "Diff with parent : %s " % side,
+                "a",
+            ],
+        )
+        self.assertEqual(paths("dir"), ["Diff with parent : %s " % self.third, "dir/c"])
+        self.assertEqual(paths("a"), ["Diff with parent : %s " % side, "a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+from __future__ import absolute_import
+
+#
+# tests/test_command.py
+#
+
+import unittest
+
+from rabbitvcs.vcs.git.gittyup.command import GittyupCommand
+from rabbitvcs.vcs.git.gittyup.exceptions import GittyupCommandError
+
+
+class TestGittyupCommand(unittest.TestCase):
+    def test_stream_lines(self):
+        command = GittyupCommand(["printf", "a\\nb\\r\\nc"])
+        self.assertEqual(list(command.stream()), ["a", "b", "c"])
+
+    def test_stream_records(self):
+        command = GittyupCommand(["printf", "abc\\0de\\0\\0f\\0"])
+        self.assertEqual(
+            list(command.stream(separator="\0", chunk_size=2)), ["abc", "de", "", "f"]
+        )
+
+    def test_stream_status(self):
+        command = GittyupCommand(["sh", "-c", "echo out; echo err >&2; exit 3"])
+        self.assertEqual(list(command.stream(separator="\n")), ["out"])
+        self.assertEqual(command.returncode, 3)
+        self.assertEqual(list(command.stream()), ["out", "err"])
+
+    def test_stream_error(self):
+        command = GittyupCommand(["sh", "-c", "echo out; echo err >&2; exit 3"])
+        records = command.stream(separator="\n", check=True)
+        self.assertEqual(next(records), "out")
+        with self.assertRaises(GittyupCommandError) as context:
+            next(records)
+        self.assertEqual(str(context.exception), "err")
+
+        # Without a separator, stderr is part of the output
+        records = command.stream(check=True)
+        with self.assertRaises(GittyupCommandError) as context:
+            list(records)
+        self.assertEqual(str(context.exception), "err")
+
+    def test_execute_raw(self):
+        command = GittyupCommand(["sh", "-c", "printf 'a\\0b'; echo err >&2; exit 1"])
+        self.assertEqual(command.execute_raw(), (1, b"a\0b", b"err\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
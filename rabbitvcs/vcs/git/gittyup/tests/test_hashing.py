@@ -0,0 +1,37 @@
+from __future__ import absolute_import
+
+#
+# tests/test_hashing.py
+#
+
+import unittest
+
+from rabbitvcs.vcs.git.gittyup.hashing import HASH_CHUNK_SIZE, blob_id, blob_ids
+
+from .util import TemporaryDirectoryTestCase
+
+
+class TestHashing(TemporaryDirectoryTestCase):
+    def test_blob_id(self):
+        # As given by "git hash-object"
+        self.write("hello")
+        self.write("empty", content=b"")
+        self.assertEqual(
+            blob_id(self.abspath("hello")), "ce013625030ba8dba906f756967f9e9ca394464a"
+        )
+        self.assertEqual(
+            blob_id(self.abspath("empty")), "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"
+        )
+
+    def test_blob_ids(self):
+        names = ["file%i" % i for i in range(4)]
+        self.write(*names, content=b"x" * (HASH_CHUNK_SIZE * 3 + 1))
+        paths = [self.abspath(name) for name in names]
+        ids = blob_ids(paths + [self.abspath("missing")])
+        self.assertEqual(len(set(ids[path] for path in paths)), 1)
+        self.assertEqual(ids[paths[0]], blob_id(paths[0]))
+        self.assertEqual(ids[self.abspath("missing")], None)
+
+
+if __name__ == "__main__":
+    unittest.main()
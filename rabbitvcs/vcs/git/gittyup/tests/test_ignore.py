@@ -0,0 +1,44 @@
+from __future__ import absolute_import
+
+#
+# tests/test_ignore.py
+#
+
+import unittest
+
+from rabbitvcs.vcs.git.gittyup.ignore import IgnoreMatcher
+
+from .util import TemporaryDirectoryTestCase
+
+
+class TestIgnoreMatcher(TemporaryDirectoryTestCase):
+    def setUp(self):
+        TemporaryDirectoryTestCase.setUp(self)
+        self.write(
+            ".gitignore", content="# comment\n*.log\n!keep.log\n/build/\nlib/**/tmp\n"
+        )
+        self.write("src/.gitignore", content="generated*\n\\#hash\n")
+        self.matcher = IgnoreMatcher(self.path)
+
+    def test_patterns(self):
+        self.assertTrue(self.matcher.is_ignored("a/b.log"))
+        self.assertFalse(self.matcher.is_ignored("a/keep.log"))
+        self.assertTrue(self.matcher.is_ignored("build", True))
+        self.assertFalse(self.matcher.is_ignored("build"))
+        self.assertFalse(self.matcher.is_ignored("src/build", True))
+        self.assertTrue(self.matcher.is_ignored("build/keep.log"))
+        self.assertTrue(self.matcher.is_ignored("lib/tmp"))
+        self.assertTrue(self.matcher.is_ignored("lib/a/b/tmp/c"))
+        self.assertTrue(self.matcher.is_ignored("src/generated.c"))
+        self.assertTrue(self.matcher.is_ignored("src/#hash"))
+        self.assertFalse(self.matcher.is_ignored("generated.c"))
+
+    def test_reload(self):
+        self.assertFalse(self.matcher.is_ignored("a.txt"))
+        self.write(".gitignore", content="*.txt\n# a longer file than before\n")
+        self.matcher.refresh()
+        self.assertTrue(self.matcher.is_ignored("a.txt"))
+
+
+if __name__ == "__main__":
+    unittest.main()
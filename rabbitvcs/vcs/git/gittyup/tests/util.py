@@ -5,6 +5,13 @@ from __future__ import absolute_import
 #
 
 import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+# Options giving git commands run by the tests an author
+IDENTITY = ("-c", "user.name=test", "-c", "user.email=test@test")
 
 
 def touch(fname, times=None):
@@ -16,3 +23,46 @@ def change(path):
     f = open(path, "a")
     f.write("1")
     f.close()
+
+
+class TemporaryDirectoryTestCase(unittest.TestCase):
+    """Runs each test in a new temporary directory."""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def abspath(self, name):
+        return os.path.normpath(os.path.join(self.path, name))
+
+    def write(self, *names, **kwargs):
+        """Writes each file, creating its directory if needed. The content is
+        the given text or bytes, or the name of the file by default."""
+        for name in names:
+            path = os.path.join(self.path, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+
+            content = kwargs.get("content", name + "\n")
+            with open(path, "wb" if isinstance(content, bytes) else "w") as f:
+                f.write(content)
+
+
+class RepositoryTestCase(TemporaryDirectoryTestCase):
+    """Runs each test in a new git repository, filled by populate()."""
+
+    def setUp(self):
+        TemporaryDirectoryTestCase.setUp(self)
+        self.git("init", "-q")
+        self.populate()
+
+    def populate(self):
+        pass
+
+    def git(self, *args):
+        return subprocess.check_output(("git",) + args, cwd=self.path).decode()
+
+    def commit(self, message):
+        self.git("add", "-A")
+        self.git(*(IDENTITY + ("commit", "-qm", message)))
+        return self.git("rev-parse", "HEAD").strip()
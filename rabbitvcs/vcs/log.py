@@ -39,15 +39,16 @@ class LogChangedPath(object):
 
 
 class Log(object):
-    date = None
-    revision = None
-    author = None
-    message = None
-    parents = []
-    head = False
-
-    # A list of LogChangedFiles elements
-    changed_paths = []
+    # Logs can be long, so keep each entry small
+    __slots__ = (
+        "date",
+        "revision",
+        "author",
+        "message",
+        "changed_paths",
+        "parents",
+        "head",
+    )
 
     def __init__(
         self, date, revision, author, message, changed_paths, parents=[], head=False
@@ -56,6 +57,8 @@ class Log(object):
         self.revision = revision
         self.author = author
         self.message = message
+
+        # A list of LogChangedPath elements
         self.changed_paths = changed_paths
         self.parents = parents
         self.head = head
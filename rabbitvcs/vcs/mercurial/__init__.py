@@ -35,6 +35,7 @@ from rabbitvcs.util.strings import S
 import rabbitvcs.vcs
 import rabbitvcs.vcs.status
 import rabbitvcs.vcs.log
+import rabbitvcs.vcs.roots
 import rabbitvcs.vcs.mercurial.util
 from rabbitvcs.vcs.branch import BranchEntry
 from rabbitvcs.util.log import Log
@@ -128,15 +129,12 @@ class Mercurial(object):
     def get_repository(self):
         return self.repository_path
 
-    def find_repository_path(self, path):
-        path_to_check = path
-        while path_to_check != "/" and path_to_check != "":
-            if os.path.isdir(os.path.join(path_to_check, ".hg")):
-                return path_to_check
-
-            path_to_check = os.path.split(path_to_check)[0]
+    def close(self):
+        if self.repository is not None:
+            self.repository.close()
 
-        return None
+    def find_repository_path(self, path):
+        return rabbitvcs.vcs.roots.find_repository_path(path, ".hg")
 
     def get_relative_path(self, path):
         if path == self.repository_path:
@@ -231,7 +229,7 @@ class Mercurial(object):
         if self.is_working_copy(path):
             return True
 
-        return self.find_repository_path(os.path.split(path)[0]) != ""
+        return self.find_repository_path(os.path.split(path)[0]) is not None
 
     def is_versioned(self, path):
         if self.is_working_copy(path):
@@ -0,0 +1,201 @@
+from __future__ import absolute_import
+
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Finds the working copy containing a path, by looking for administrative
+folders (eg. .git) in the path and the directories above it.
+
+The result is cached for every path looked up, and for the directories above
+it, including paths outside any working copy. A directory's entry holds the
+closest working copy root of each kind for it, so that looking up a path
+below it goes no further up. A path that is not a directory takes the roots
+of its parent directory.
+
+An entry is trusted for CHECK_INTERVAL seconds. After that it is kept as
+long as the ctime of its path is unchanged (creating or removing a folder in
+a directory changes it), without looking at the directories above it. The
+watcher calls invalidate() as soon as an administrative folder appears in a
+watched directory or is removed from it, which drops the entries of the
+directory and of everything under it. At most MAX_ENTRIES entries are kept,
+and the least recently used ones are dropped to make room for new ones.
+"""
+
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+
+# Administrative folders looked for in each directory
+ADMIN_FOLDERS = (".svn", ".git", ".hg")
+
+# Seconds during which a cached entry is trusted without checking it
+CHECK_INTERVAL = 1
+
+# Paths cached at once
+MAX_ENTRIES = 16384
+
+
+class RootResolver(object):
+    def __init__(
+        self,
+        folders=ADMIN_FOLDERS,
+        check_interval=CHECK_INTERVAL,
+        max_entries=MAX_ENTRIES,
+    ):
+        self.folders = tuple(folders)
+        self.check_interval = check_interval
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+        # The roots of the top directory, which is not looked at
+        self.no_roots = dict((folder, None) for folder in self.folders)
+
+        # Paths mapped to [time checked, ctime, roots], least recently used
+        # first. The roots map each administrative folder to the closest of
+        # the path and the directories above it holding one, or None. They
+        # are None for a path that is not a directory.
+        self.entries = OrderedDict()
+
+    def _stat(self, path):
+        """Returns (ctime, whether path is a directory)."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return (None, False)
+        return (st.st_ctime, stat.S_ISDIR(st.st_mode))
+
+    def roots(self, path, now=None):
+        """Returns a dict mapping each administrative folder to the closest of
+        path and the directories above it holding one, or None."""
+        if now is None:
+            now = time.time()
+
+        parent = os.path.dirname(path)
+        if parent == path or not path:
+            return self.no_roots
+
+        with self.lock:
+            entry = self.entries.pop(path, None)
+            if entry is not None:
+                self.entries[path] = entry
+
+        if entry is not None and now - entry[0] >= self.check_interval:
+            ctime = self._stat(path)[0]
+            if ctime is not None and ctime == entry[1]:
+                entry[0] = now
+            else:
+                entry = self._resolve(path, now, entry)
+
+        if entry is None:
+            entry = self._resolve(path, now)
+
+        if entry[2] is None:
+            return self.roots(parent, now)
+        return entry[2]
+
+    def _resolve(self, path, now, old_entry=None):
+        (ctime, is_directory) = self._stat(path)
+
+        roots = None
+        if is_directory:
+            roots = self.roots(os.path.dirname(path), now)
+            found = [
+                folder
+                for folder in self.folders
+                if os.path.isdir(os.path.join(path, folder))
+            ]
+            if found:
+                roots = dict(roots)
+                for folder in found:
+                    roots[folder] = path
+
+        if old_entry is not None and old_entry[2] != roots:
+            # The paths under path took their roots from it
+            self.invalidate(path)
+
+        entry = [now, ctime, roots]
+        with self.lock:
+            self.entries.pop(path, None)
+            self.entries[path] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        return entry
+
+    def find_root(self, path, folders=None):
+        """
+        Returns (root, folder) for the closest of path and the directories
+        above it holding one of the given administrative folders (all of them
+        by default), or (None, None).
+
+        @type   folders: list
+        @param  folders: Administrative folders to look for, in order of
+            preference when a directory holds several.
+
+        """
+
+        if folders is None:
+            folders = self.folders
+
+        roots = self.roots(path)
+        found = (None, None)
+        for folder in folders:
+            root = roots.get(folder)
+            if root is not None and (found[0] is None or len(root) > len(found[0])):
+                found = (root, folder)
+
+        return found
+
+    def invalidate(self, path=None):
+        """Makes the next lookups check path and everything under it again,
+        or every path if path is None."""
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+                return
+
+            prefix = os.path.join(path, "")
+            stale = [
+                key for key in self.entries if key == path or key.startswith(prefix)
+            ]
+            for key in stale:
+                del self.entries[key]
+
+
+resolver = RootResolver()
+
+
+def find_root(path, folders=None):
+    return resolver.find_root(path, folders)
+
+
+def find_repository_path(path, folder):
+    """Returns the root of the working copy with the given administrative
+    folder containing path, or None."""
+    return resolver.find_root(path, (folder,))[0]
+
+
+def invalidate(path=None):
+    resolver.invalidate(path)
@@ -23,7 +23,10 @@ from __future__ import absolute_import
 #
 
 import os.path
+import bisect
+import struct
 import unittest
+from collections import OrderedDict
 import six
 
 from datetime import datetime
@@ -67,7 +70,61 @@ MODIFIED_CHILD_STATUSES = [
 ]
 
 
+def summarize(single, singles):
+    """
+    Returns the summary status of a directory whose own single status is
+    single, given the set of single statuses found in it (including its own).
+    """
+
+    if status_complicated in singles:
+        return status_complicated
+    elif single in ["added", "modified", "deleted"]:
+        # These take priority over child statuses
+        return single
+    elif len(set(MODIFIED_CHILD_STATUSES) & singles):
+        return status_modified
+    else:
+        return single
+
+
+# The number of paths added to a StatusCache since its last lookup that are
+# inserted into its index one by one, rather than by sorting them all in
+INSORT_LIMIT = 64
+
+# A cached status: class, content, metadata and single status (indices into
+# StatusCache.keys), revision and author (indices into the cache's table of
+# values), and date
+RECORD = struct.Struct("<BBBBIIq")
+
+NO_DATE = -(2 ** 63)
+
+
 class StatusCache(object):
+    """
+    Caches statuses by path.
+
+    Each status is stored as a fixed-size record in a single bytearray, with
+    revisions and authors interned in a table of values. Statuses are rebuilt
+    from their record when looked up: a record takes a small fraction of the
+    memory of a Status, and few of the cached statuses are looked up at any
+    one time, so the cache does not keep the objects themselves.
+
+    The cached paths are also kept in a sorted list, so that the statuses of a
+    subtree (a contiguous range of the list) or of the children of a
+    directory can be found without looking at unrelated paths. Paths added
+    are only sorted into the list on the next lookup, and removed ones are
+    skipped until there are enough of them to be worth dropping.
+
+    For every directory, the cache counts the single statuses of the cached
+    paths under it, and updates the counts of all its parent directories (up
+    to a repository root) as statuses are added, changed and removed. The
+    summary of a directory is then found without looking at its contents.
+
+    The statuses of a whole repository can be evicted at once, which the
+    status checker does for the least recently used ones to keep all its
+    caches under cache/max_statuses statuses.
+    """
+
     keys = [
         None,
         status_normal,
@@ -86,86 +143,328 @@ class StatusCache(object):
         status_error,
     ]
 
-    authors = []
-    revisions = []
+    key_index = dict((key, index) for index, key in enumerate(keys))
 
     def __init__(self):
+        # Paths mapped to the number of their record
         self.cache = {}
+        self.records = bytearray()
+        self.free_records = []
+
+        self.values = []
+        self.value_index = {}
+
+        # Directories mapped to the number of cached paths under them with
+        # each single status, by index into keys
+        self.descendant_counts = {}
+
+        self.index = []
+        self.unsorted = []
+        self.removed = 0
+
+        # Repositories, least recently used first
+        self.repositories = OrderedDict()
+
+    def _intern(self, value):
+        try:
+            return self.value_index[value]
+        except KeyError:
+            self.value_index[value] = len(self.values)
+            self.values.append(value)
+            return self.value_index[value]
+
+    def _key(self, value):
+        """Returns the index of a simplified status in keys. Like Status does
+        with statuses it cannot simplify, unknown ones are errors."""
+        index = self.key_index.get(value)
+        if index is None:
+            index = self.key_index[status_error]
+        return index
 
     def __setitem__(self, path, status):
         try:
-            content_index = self.keys.index(status.simple_content_status())
-            metadata_index = self.keys.index(status.simple_metadata_status())
-
-            try:
-                author_index = self.authors.index(status.author)
-            except ValueError as e:
-                self.authors.append(status.author)
-                author_index = len(self.authors) - 1
-
-            try:
-                revision_index = self.revisions.index(status.revision)
-            except ValueError as e:
-                self.revisions.append(status.revision)
-                revision_index = len(self.revisions) - 1
-
-            self.cache[path] = (
-                status.__class__,
-                content_index,
-                metadata_index,
-                revision_index,
-                author_index,
-                status.date,
+            record = (
+                STATUS_TYPES.index(status.__class__),
+                self._key(status.simple_content_status()),
+                self._key(status.simple_metadata_status()),
+                self._key(status.single),
+                self._intern(status.revision),
+                self._intern(status.author),
+                NO_DATE if status.date is None else int(status.date),
             )
         except Exception as e:
             log.debug(e)
+            return
+
+        number = self.cache.get(path)
+        if number is None:
+            if self.free_records:
+                number = self.free_records.pop()
+            else:
+                number = len(self.records) // RECORD.size
+                self.records.extend(b"\0" * RECORD.size)
+            self.cache[path] = number
+            self.unsorted.append(path)
+            self._count(path, record[3], 1)
+        else:
+            old_single = self._single_index(number)
+            if old_single != record[3]:
+                self._count(path, old_single, -1)
+                self._count(path, record[3], 1)
+
+        RECORD.pack_into(self.records, number * RECORD.size, *record)
 
     def __getitem__(self, path):
         try:
-            (
-                statusclass,
-                content_index,
-                metadata_index,
-                revision_index,
-                author_index,
-                date,
-            ) = self.cache[path]
-
-            content = self.keys[content_index]
-            metadata = self.keys[metadata_index]
-            revision = self.revisions[revision_index]
-            author = self.authors[author_index]
-
-            status = Status(
-                path, content, metadata, revision=revision, author=author, date=date
-            )
-            status.__class__ = statusclass
-            return status
-        except Exception as e:
+            number = self.cache[path]
+        except KeyError as e:
             log.debug(e)
+            return None
+
+        (
+            class_index,
+            content_index,
+            metadata_index,
+            single_index,
+            revision_index,
+            author_index,
+            date,
+        ) = RECORD.unpack_from(self.records, number * RECORD.size)
+
+        # The slots are filled in from the record as is, rather than through
+        # __init__, which would work out the single status again
+        cls = STATUS_TYPES[class_index]
+        status = cls.__new__(cls)
+        status.path = path
+        status.content = self.keys[content_index]
+        status.metadata = self.keys[metadata_index]
+        status.remote_content = None
+        status.remote_metadata = None
+        status.single = self.keys[single_index]
+        status.summary = None
+        status.revision = self.values[revision_index]
+        status.author = self.values[author_index]
+        status.date = None if date == NO_DATE else date
+        return status
 
     def __delitem__(self, path):
         try:
-            del self.cache[path]
+            number = self.cache.pop(path)
         except KeyError as e:
             log.debug(e)
+            return
+
+        # The counts of path's own descendants stay, they are still cached
+        self._count(path, self._single_index(number), -1)
+        self.free_records.append(number)
+        self.removed += 1
 
     def __contains__(self, path):
         return path in self.cache
 
-    def find_path_statuses(self, path):
-        statuses = []
-        if os.path.isdir(path):
-            for key, value in list(self.cache.items()):
-                if key.startswith(path):
-                    statuses.append(self.__getitem__(key))
-        else:
-            statuses.append(self.__getitem__(path))
+    def __len__(self):
+        return len(self.cache)
+
+    def _single_index(self, number):
+        return self.records[number * RECORD.size + 3]
+
+    def _ancestors(self, path):
+        """Yields the parent directories of path, up to the root of its
+        repository if it is known."""
+        while True:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return
+            yield parent
+            if parent in self.repositories:
+                return
+            path = parent
+
+    def _count(self, path, single_index, delta):
+        for parent in self._ancestors(path):
+            counts = self.descendant_counts.get(parent)
+            if counts is None:
+                counts = self.descendant_counts[parent] = [0] * len(self.keys)
+            counts[single_index] += delta
+
+    def summary(self, path):
+        """
+        Returns the summary status of path from its own status and the counts
+        of the statuses under it, or None if path is not cached. Only the
+        cached statuses are counted, so the summary is complete if the whole
+        tree under path was cached.
+        """
 
-        return statuses
+        number = self.cache.get(path)
+        if number is None:
+            return None
+
+        single = self.keys[self._single_index(number)]
+        singles = set([single])
+        counts = self.descendant_counts.get(path)
+        if counts:
+            for index, count in enumerate(counts):
+                if count:
+                    singles.add(self.keys[index])
+
+        return summarize(single, singles)
+
+    def use_repository(self, root):
+        """Marks the repository at root as the most recently used one."""
+        self.repositories.pop(root, None)
+        self.repositories[root] = True
+
+    def repository_size(self, root):
+        """Returns about how many statuses of the repository at root are
+        cached, counting recently removed ones until the index is rebuilt."""
+        (start, end) = self._subtree_range(root)
+        return end - start + (1 if root in self.cache else 0)
+
+    def evict_repository(self, root):
+        self.repositories.pop(root, None)
+        self.remove_path_statuses(root)
+
+        if not self.cache:
+            self.records = bytearray()
+            self.free_records = []
+            self.descendant_counts = {}
+        if len(self.values) > len(self.cache):
+            self._prune_values()
+
+    def _prune_values(self):
+        """Drops the revisions and authors no cached status refers to."""
+        old_values = self.values
+        self.values = []
+        self.value_index = {}
+        for number in list(self.cache.values()):
+            offset = number * RECORD.size
+            record = list(RECORD.unpack_from(self.records, offset))
+            record[4] = self._intern(old_values[record[4]])
+            record[5] = self._intern(old_values[record[5]])
+            RECORD.pack_into(self.records, offset, *record)
+
+    def _update_index(self):
+        if self.unsorted:
+            if len(self.unsorted) <= INSORT_LIMIT:
+                for path in self.unsorted:
+                    i = bisect.bisect_left(self.index, path)
+                    if i == len(self.index) or self.index[i] != path:
+                        self.index.insert(i, path)
+            else:
+                # Sorting two sorted runs only merges them
+                self.unsorted.sort()
+                self.index.extend(self.unsorted)
+                self.index.sort()
+                self.removed = len(self.index)
+            self.unsorted = []
+
+        if self.removed > len(self.index) // 2:
+            # Drop removed paths, and paths added twice
+            index = []
+            previous = None
+            for path in self.index:
+                if path != previous and path in self.cache:
+                    index.append(path)
+                previous = path
+            self.index = index
+            self.removed = 0
+
+    def _subtree_range(self, path):
+        """Returns the (start, end) range of the index holding the paths under
+        path (but not path itself)."""
+        self._update_index()
+        # Every path under path starts with path + "/", and "0" sorts right
+        # after "/"
+        start = bisect.bisect_left(self.index, path + "/")
+        end = bisect.bisect_left(self.index, path + "0", start)
+        return (start, end)
+
+    def subtree_paths(self, path):
+        """Returns the cached paths of path and everything under it."""
+        (start, end) = self._subtree_range(path)
+        paths = [key for key in self.index[start:end] if key in self.cache]
+        if path in self.cache:
+            paths.insert(0, path)
+        return paths
+
+    def child_paths(self, path):
+        """Returns the cached paths of path and of its direct children. The
+        descendants of subdirectories are skipped over, not looked at."""
+        (start, end) = self._subtree_range(path)
+        paths = []
+        if path in self.cache:
+            paths.append(path)
+
+        prefix_length = len(path) + 1
+        i = start
+        while i < end:
+            key = self.index[i]
+            separator = key.find("/", prefix_length)
+            if separator == -1:
+                if key in self.cache:
+                    paths.append(key)
+                i += 1
+            else:
+                # A descendant of a subdirectory (which sorts before it)
+                i = bisect.bisect_left(self.index, key[:separator] + "0", i, end)
+
+        return paths
+
+    def find_path_statuses(self, path):
+        """Returns the cached statuses of path and everything under it."""
+        return [self.__getitem__(key) for key in self.subtree_paths(path)]
+
+    def find_child_statuses(self, path):
+        """Returns the cached statuses of path and its direct children."""
+        return [self.__getitem__(key) for key in self.child_paths(path)]
+
+    def remove_path_statuses(self, path):
+        """Removes the cached statuses of path and of everything under it."""
+        # Take the whole subtree off the counts of path's parents at once
+        removed_counts = list(self.descendant_counts.get(path, [0] * len(self.keys)))
+        if path in self.cache:
+            removed_counts[self._single_index(self.cache[path])] += 1
+        for parent in self._ancestors(path):
+            counts = self.descendant_counts.get(parent)
+            if counts is not None:
+                for index, count in enumerate(removed_counts):
+                    counts[index] -= count
+
+        for key in self.subtree_paths(path):
+            self.free_records.append(self.cache.pop(key))
+            self.removed += 1
+
+            if key == path:
+                continue
+
+            # Drop the counts of key and of the directories between it and
+            # path, which need not be cached themselves. Once a directory's
+            # counts are gone, so are those of the directories above it.
+            self.descendant_counts.pop(key, None)
+            parent = os.path.dirname(key)
+            while parent != path:
+                if self.descendant_counts.pop(parent, None) is None:
+                    break
+                parent = os.path.dirname(parent)
+        self.descendant_counts.pop(path, None)
 
 
 class Status(object):
+
+    # There can be hundreds of thousands of these in the checker
+    __slots__ = (
+        "path",
+        "content",
+        "metadata",
+        "remote_content",
+        "remote_metadata",
+        "single",
+        "summary",
+        "revision",
+        "author",
+        "date",
+    )
+
     @staticmethod
     def status_unknown(path):
         return Status(path, status_unknown, summary=status_unknown)
@@ -263,19 +562,7 @@ class Status(object):
         summary = status_unknown
 
         status_set = set([st.single for st in child_statuses])
-
-        if not status_set:
-            self.summary = self.single
-
-        if status_complicated in status_set:
-            self.summary = status_complicated
-        elif self.single in ["added", "modified", "deleted"]:
-            # These take priority over child statuses
-            self.summary = self.single
-        elif len(set(MODIFIED_CHILD_STATUSES) & status_set):
-            self.summary = status_modified
-        else:
-            self.summary = self.single
+        self.summary = summarize(self.single, status_set)
 
         return summary
 
@@ -301,7 +588,9 @@ class Status(object):
         )
 
     def __getstate__(self):
-        attrs = self.__dict__.copy()
+        attrs = {}
+        for key in Status.__slots__:
+            attrs[key] = getattr(self, key, None)
         # Force strings to Unicode to avoid json implicit conversion.
         for key in attrs:
             if isinstance(attrs[key], (six.string_types, six.text_type)):
@@ -314,14 +603,16 @@ class Status(object):
         del state_dict["__type__"]
         del state_dict["__module__"]
         # Store strings in native str type.
-        for key in state_dict:
-            if isinstance(state_dict[key], (six.string_types, six.text_type)):
-                state_dict[key] = str(S(state_dict[key]))
-        self.__dict__ = state_dict
+        for key, value in list(state_dict.items()):
+            if isinstance(value, (six.string_types, six.text_type)):
+                value = str(S(value))
+            setattr(self, key, value)
 
 
 class SVNStatus(Status):
 
+    __slots__ = ()
+
     vcs_type = rabbitvcs.vcs.VCS_SVN
 
     content_status_map = {
@@ -379,6 +670,8 @@ class SVNStatus(Status):
 
 class GitStatus(Status):
 
+    __slots__ = ()
+
     vcs_type = "git"
 
     content_status_map = {
@@ -401,6 +694,9 @@ class GitStatus(Status):
 
 
 class MercurialStatus(Status):
+
+    __slots__ = ()
+
     vcs_type = "mercurial"
 
     content_status_map = {
@@ -36,6 +36,7 @@ import pysvn
 import rabbitvcs.vcs
 import rabbitvcs.vcs.status
 import rabbitvcs.vcs.log
+import rabbitvcs.vcs.roots
 from rabbitvcs.util import helper
 from rabbitvcs.util.log import Log
 from rabbitvcs.util.decorators import structure_map
@@ -279,7 +280,9 @@ class SVN(object):
             if invalidate:
                 del self.cache[spath]
             else:
-                return self.cache.find_path_statuses(spath)
+                if recurse:
+                    return self.cache.find_path_statuses(spath)
+                return self.cache.find_child_statuses(spath)
 
         on_error = rabbitvcs.vcs.status.Status.status_unknown(path)
 
@@ -325,14 +328,7 @@ class SVN(object):
         return self.client.status(*pure_unicode(args), **pure_unicode(kwargs))
 
     def find_repository_path(self, path):
-        path_to_check = path
-        while path_to_check != "/" and path_to_check != "":
-            if os.path.isdir(os.path.join(path_to_check, ".svn")):
-                return path_to_check
-
-            path_to_check = os.path.split(path_to_check)[0]
-
-        return None
+        return rabbitvcs.vcs.roots.find_repository_path(path, ".svn")
 
     def status(self, path, summarize=True, invalidate=False):
         spath = S(path)
@@ -342,7 +338,7 @@ class SVN(object):
             else:
                 st = self.cache[spath]
                 if summarize:
-                    st.summary = st.single
+                    st.summary = self.cache.summary(spath)
                 return st
 
         all_statuses = self.statuses(path, recurse=summarize)